@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark comparing the legacy json wire format with the binary codec.
+
+Run with ``python benchmarks/bench_codec.py`` from the project root.
+"""
+
+from common import measure, result, show
+
+from pyquorum.message import Message, MessageType
+
+__author__ = "Henry Spanka"
+__copyright__ = "Henry Spanka"
+__license__ = "mit"
+
+
+def bench(number: int = 100000) -> list:
+    """Measures encoding and decoding of a PING message
+
+    Args:
+        number (int, optional): iterations per run. Defaults to 100000.
+
+    Returns:
+        list: benchmark results
+    """
+    message = Message(MessageType.PING, {'master': '10.0.0.1', 'quorum': True})
+    jsonFrame = bytes(message.toJson(), "utf-8")
+    binaryFrame = message.toBytes()
+
+    return [
+        result("codec.size", len(jsonFrame), "bytes", format="json"),
+        result("codec.size", len(binaryFrame), "bytes", format="binary"),
+        result("codec.encode", measure(lambda: bytes(message.toJson(), "utf-8"), number),
+               "ns/message", format="json"),
+        result("codec.decode", measure(lambda: Message.fromJson(jsonFrame), number),
+               "ns/message", format="json"),
+        result("codec.encode", measure(message.toBytes, number), "ns/message", format="binary"),
+        result("codec.decode", measure(lambda: Message.fromBytes(binaryFrame), number),
+               "ns/message", format="binary"),
+    ]
+
+
+if __name__ == "__main__":
+    show(bench())
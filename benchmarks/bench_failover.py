@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+End-to-end failover benchmark. A cluster runs on loopback addresses with real
+sockets, the leader is crashed and the time until a new leader holds the
+majority is measured.
+
+Run with ``python benchmarks/bench_failover.py`` from the project root.
+"""
+
+import logging
+import socket
+import threading
+import time
+
+from common import result, show
+
+from pyquorum.detector import PenaltyDetector, PhiAccrualDetector
+from pyquorum.host import Host
+from pyquorum.manager import QuorumManager
+from pyquorum.receiver import MessageReceiver
+from pyquorum.runner import Runner
+from pyquorum.udpclient import UdpClient
+from pyquorum.udpserver import UdpServer
+
+__author__ = "Henry Spanka"
+__copyright__ = "Henry Spanka"
+__license__ = "mit"
+
+
+class Node(object):
+    """A node of the loopback cluster
+    """
+
+    def __init__(self, ip: str, port: int, peers, interval: float, detector: str):
+        self.ip = ip
+        self.interval = interval
+        self.alive = True
+
+        def makeDetector():
+            if detector == "phi":
+                return PhiAccrualDetector(interval=interval)
+            return PenaltyDetector(interval=interval)
+
+        hosts = [Host(peer, port, makeDetector()) for peer in peers if peer != ip]
+        self.manager = QuorumManager(Host(ip, port), hosts, UdpClient(ip), Runner(None))
+        self.receiver = MessageReceiver(self.manager)
+
+        self.server = UdpServer(ip, port, self)
+        self.server.start()
+        self.thread = threading.Thread(target=self.loop, daemon=True)
+        self.thread.start()
+
+    def handle(self, ip: str, data: bytes):
+        if self.alive:
+            self.receiver.handle(ip, data)
+
+    def loop(self):
+        while self.alive:
+            self.manager.sendKeepAlives()
+            time.sleep(self.interval)
+            if self.alive:
+                self.manager.update()
+
+    def following(self):
+        m = self.manager
+        if self.alive and m.quorum and m.master is not None:
+            return m.master.ip
+        return None
+
+
+def leader(nodes):
+    """Returns the leader followed by the majority of the cluster
+    """
+    counts = {}
+    for node in nodes:
+        ip = node.following()
+        if ip is not None:
+            counts[ip] = counts.get(ip, 0) + 1
+
+    for ip, count in counts.items():
+        if count > len(nodes) // 2 and any(n.ip == ip and n.alive for n in nodes):
+            return ip
+
+    return None
+
+
+def wait(condition, timeout: float) -> bool:
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if condition():
+            return True
+        time.sleep(0.001)
+    return False
+
+
+def free_port() -> int:
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def failover(size: int, interval: float, detector: str, timeout: float = 30.0):
+    """Measures the failover of a loopback cluster
+
+    Returns:
+        tuple: seconds until the first leader was elected and until the
+        crashed leader was replaced. None if it did not happen in time.
+    """
+    port = free_port()
+    ips = ["127.0.1.{}".format(i) for i in range(1, size + 1)]
+
+    started = time.monotonic()
+    nodes = [Node(ip, port, ips, interval, detector) for ip in ips]
+
+    if not wait(lambda: leader(nodes) is not None, timeout):
+        return None, None
+    elected = time.monotonic() - started
+
+    crashed = leader(nodes)
+    for node in nodes:
+        if node.ip == crashed:
+            node.alive = False
+
+    started = time.monotonic()
+    replaced = None
+    if wait(lambda: leader(nodes) not in (None, crashed), timeout):
+        replaced = time.monotonic() - started
+
+    for node in nodes:
+        node.alive = False
+
+    return elected, replaced
+
+
+def bench(configurations=((3, 0.1, "penalty"), (3, 0.1, "phi"))) -> list:
+    """Measures the end-to-end failover time
+
+    Args:
+        configurations (tuple, optional): cluster size, interval and detector
+
+    Returns:
+        list: benchmark results
+    """
+    logging.getLogger("pyquorum").setLevel(logging.CRITICAL)
+    results = []
+
+    for size, interval, detector in configurations:
+        elected, replaced = failover(size, interval, detector)
+        params = {'hosts': size, 'interval': interval, 'detector': detector}
+
+        results.append(result("loopback.timeToQuorum",
+                              elected if elected is not None else float("nan"), "s", **params))
+        results.append(result("loopback.failover",
+                              replaced if replaced is not None else float("nan"), "s", **params))
+
+    return results
+
+
+if __name__ == "__main__":
+    show(bench())
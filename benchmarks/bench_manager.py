@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the receive dispatch and the periodic manager work as the
+cluster grows.
+
+Run with ``python benchmarks/bench_manager.py`` from the project root.
+"""
+
+import logging
+import socket
+
+from common import measure, result, show
+
+from pyquorum.detector import PenaltyDetector
+from pyquorum.host import Host
+from pyquorum.manager import QuorumManager
+from pyquorum.message import Message, MessageType
+from pyquorum.metrics import Metrics
+from pyquorum.receiver import MessageReceiver
+from pyquorum.runner import Runner
+from pyquorum.udpclient import UdpClient
+
+__author__ = "Henry Spanka"
+__copyright__ = "Henry Spanka"
+__license__ = "mit"
+
+SIZES = [3, 10, 100, 1000]
+
+
+class Clock(object):
+    """Virtual clock of the failure detectors
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def loopback(n: int) -> str:
+    """Address of the n-th node, all of 127.0.0.0/8 is routed to the loopback
+
+    Args:
+        n (int): number of the node, starting with 1
+
+    Returns:
+        str: IP address of the node
+    """
+    return "127.{}.{}.{}".format(n >> 16 & 255, n >> 8 & 255, n & 255)
+
+
+def make_manager(size: int, port: int, interval: float = 3600.0,
+                 clock: Clock = None) -> QuorumManager:
+    """Creates a manager whose peers are all up and follow it. Its keepalives
+    are sent to the loopback, where every peer is served by one sink socket.
+
+    Args:
+        size (int): number of nodes in the cluster
+        port (int): port of the sink socket
+        interval (float, optional): keepalive interval of the peers. Defaults to 3600.0, so no deadline passes.
+        clock (Clock, optional): clock of the failure detectors. Defaults to a new clock.
+
+    Returns:
+        QuorumManager: the manager
+    """
+    clock = clock if clock is not None else Clock()
+    hosts = [Host(loopback(n), port, PenaltyDetector(interval=interval, clock=clock))
+             for n in range(2, size + 1)]
+    client = UdpClient("127.0.0.1", metrics=Metrics())
+    m = QuorumManager(Host(loopback(1), port), hosts, client, Runner(None), Metrics())
+
+    for host in hosts:
+        host.unpunish()
+    m.master = m.local
+    m.votes = set(hosts)
+    m.quorum = True
+
+    return m
+
+
+def ticker(m: QuorumManager, clock: Clock, interval: float):
+    """Ticks of a manager whose peers send a keepalive every interval. The
+    deadlines of the peers pass every few ticks and are armed again.
+
+    Args:
+        m (QuorumManager): the manager
+        clock (Clock): clock of the failure detectors
+        interval (float): keepalive interval of the peers
+
+    Returns:
+        callable: a tick, including the keepalives received within it
+    """
+    def tick():
+        clock.now += interval
+        for host in m.hosts:
+            host.detector.heartbeat()
+        m.update()
+
+    return tick
+
+
+def bench(sizes=SIZES) -> list:
+    """Measures the receive dispatch, update and sendKeepAlives
+
+    Args:
+        sizes ([int], optional): cluster sizes. Defaults to SIZES.
+
+    Returns:
+        list: benchmark results
+    """
+    logging.getLogger("pyquorum").setLevel(logging.CRITICAL)
+    results = []
+
+    # receives the keepalives of all peers, datagrams that don't fit into its
+    # buffer are dropped by the kernel after they were sent
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(("0.0.0.0", 0))
+
+    for size in sizes:
+        m = make_manager(size, sink.getsockname()[1])
+        receiver = MessageReceiver(m)
+        frame = Message(MessageType.PING, {'master': m.local.ip, 'quorum': True}).toBytes()
+        ip = m.ranking[-1].ip
+
+        number = max(10, 20000 // size)
+        results += [
+            result("receiver.handle", measure(lambda: receiver.handle(ip, frame), 20000),
+                   "ns/packet", hosts=size),
+            result("manager.update", measure(m.update, number) / 1000, "us/tick", hosts=size,
+                   deadlines="idle"),
+            result("manager.sendKeepAlives", measure(m.sendKeepAlives, number) / 1000,
+                   "us/round", hosts=size),
+        ]
+        m.client.s.close()
+
+        clock = Clock()
+        m = make_manager(size, sink.getsockname()[1], 1.0, clock)
+        results.append(result("manager.update", measure(ticker(m, clock, 1.0), number) / 1000,
+                              "us/tick", hosts=size, deadlines="expiring"))
+        assert m.aliveCount() == size - 1
+        m.client.s.close()
+
+    sink.close()
+
+    return results
+
+
+if __name__ == "__main__":
+    show(bench())
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Cold start benchmark. A node joins a running loopback cluster and the time
+from its start until it follows the master is measured, once for a node
+created in this process and once for a pyquorum process, whose leadership
+status is read from its status page.
+
+Run with ``python benchmarks/bench_startup.py`` from the project root.
+"""
+
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import result, show
+from bench_failover import Node, free_port, leader, wait
+
+from pyquorum.status import StatusReader
+
+__author__ = "Henry Spanka"
+__copyright__ = "Henry Spanka"
+__license__ = "mit"
+
+
+def cluster(size: int, interval: float):
+    """Starts a loopback cluster with a free address for one more node
+
+    Returns:
+        tuple: nodes, port, addresses including the node that joins last and ip of the master
+    """
+    port = free_port()
+    ips = ["127.0.2.{}".format(i) for i in range(1, size + 2)]
+    # the node joining later has the highest address so the master doesn't change
+    nodes = [Node(ip, port, ips, interval, "penalty") for ip in ips[:-1]]
+
+    if not wait(lambda: leader(nodes) is not None, 30.0):
+        raise RuntimeError("Cluster did not elect a master")
+
+    return nodes, port, ips, leader(nodes)
+
+
+def stop(nodes):
+    for node in nodes:
+        node.alive = False
+
+
+def inProcess(size: int, interval: float, timeout: float = 30.0) -> float:
+    """Measures the time until a node created in this process follows the master
+
+    Returns:
+        float: milliseconds, NaN if the node did not join in time
+    """
+    nodes, port, ips, master = cluster(size, interval)
+
+    started = time.monotonic()
+    node = Node(ips[-1], port, ips, interval, "penalty")
+    joined = wait(lambda: node.following() == master, timeout)
+    elapsed = time.monotonic() - started
+
+    stop(nodes + [node])
+
+    return elapsed * 1000 if joined else float("nan")
+
+
+def following(path: str, master: str) -> bool:
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return False
+
+    reader = StatusReader(path)
+    try:
+        status = reader.read()
+    finally:
+        reader.close()
+
+    return status is not None and status.quorum and status.master == master
+
+
+def process(size: int, interval: float, timeout: float = 30.0) -> float:
+    """Measures the time from the start of a pyquorum process until it follows
+    the master, including the start of the interpreter
+
+    Returns:
+        float: milliseconds, NaN if the node did not join in time
+    """
+    nodes, port, ips, master = cluster(size, interval)
+    src = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+    env = dict(os.environ, PYTHONPATH=src)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "status")
+
+        started = time.monotonic()
+        p = subprocess.Popen([sys.executable, "-m", "pyquorum.app", "-b", ips[-1],
+                              "-p", str(port), "-i", str(interval), "--status-file", path]
+                             + ips[:-1], env=env, stdout=subprocess.DEVNULL,
+                             stderr=subprocess.DEVNULL)
+        joined = wait(lambda: following(path, master), timeout)
+        elapsed = time.monotonic() - started
+
+        p.terminate()
+        p.wait()
+
+    stop(nodes)
+
+    return elapsed * 1000 if joined else float("nan")
+
+
+def bench(configurations=((3, 1.0),)) -> list:
+    """Measures how fast a starting node follows the master
+
+    Args:
+        configurations (tuple, optional): cluster size and interval
+
+    Returns:
+        list: benchmark results
+    """
+    logging.getLogger("pyquorum").setLevel(logging.CRITICAL)
+    results = []
+
+    for size, interval in configurations:
+        params = {'hosts': size, 'interval': interval}
+
+        results.append(result("startup.following", inProcess(size, interval), "ms",
+                              mode="thread", **params))
+        results.append(result("startup.following", process(size, interval), "ms",
+                              mode="process", **params))
+
+    return results
+
+
+if __name__ == "__main__":
+    show(bench())
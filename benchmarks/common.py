@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Helpers shared by the benchmarks.
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+__author__ = "Henry Spanka"
+__copyright__ = "Henry Spanka"
+__license__ = "mit"
+
+
+def measure(stmt, number: int, repeat: int = 5) -> float:
+    """Measures a statement
+
+    Args:
+        stmt (callable): statement to measure
+        number (int): number of iterations per run
+        repeat (int, optional): number of runs. Defaults to 5.
+
+    Returns:
+        float: best time per iteration in nanoseconds
+    """
+    return min(timeit.repeat(stmt, number=number, repeat=repeat)) / number * 1e9
+
+
+def result(name: str, value: float, unit: str, **params) -> dict:
+    """Creates a machine-readable benchmark result
+
+    Args:
+        name (str): name of the benchmark
+        value (float): measured value
+        unit (str): unit of the value
+
+    Returns:
+        dict: the result
+    """
+    return {'name': name, 'params': params, 'value': value, 'unit': unit}
+
+
+def show(results):
+    """Prints results in a human-readable form
+
+    Args:
+        results ([dict]): benchmark results
+    """
+    for r in results:
+        params = " ".join("{}={}".format(k, v) for k, v in sorted(r['params'].items()))
+        print("{:<26} {:<42} {:>12.1f} {}".format(r['name'], params, r['value'], r['unit']))
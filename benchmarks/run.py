@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Runs all benchmarks and writes the results as json so that regressions can be
+compared between commits.
+
+Run with ``python benchmarks/run.py [-o results.json] [--quick]`` from the
+project root.
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+import bench_codec
+import bench_failover
+import bench_manager
+import bench_startup
+
+__author__ = "Henry Spanka"
+__copyright__ = "Henry Spanka"
+__license__ = "mit"
+
+
+def revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Runs the pyquorum benchmarks.")
+    parser.add_argument("-o", "--output", dest="output", help="File to write the results to")
+    parser.add_argument("--quick", dest="quick", action="store_true",
+                        help="Fewer iterations and smaller clusters")
+    args = parser.parse_args(args)
+
+    results = []
+    if args.quick:
+        results += bench_codec.bench(10000)
+        results += bench_manager.bench([3, 100])
+    else:
+        results += bench_codec.bench()
+        results += bench_manager.bench()
+    results += bench_failover.bench()
+    results += bench_startup.bench()
+
+    report = {
+        'revision': revision(),
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
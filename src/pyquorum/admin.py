@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Local administration of a running node. The node listens on a unix socket
+for one JSON request per connection and answers with one JSON line, the
+``pyquorum-admin`` command sends the requests.
+"""
+
+import argparse
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import threading
+
+from .reconfig import Reconfiguration
+
+__author__ = "Henry Spanka"
+__copyright__ = "Henry Spanka"
+__license__ = "mit"
+
+_logger = logging.getLogger(__name__)
+
+COMMANDS = ("members", "add", "remove")
+
+
+class AdminServer(threading.Thread):
+    """Unix socket server that lists and changes the members of the cluster
+    """
+
+    def __init__(self, path: str, reconfig: Reconfiguration):
+        """
+        Args:
+            path (str): path of the unix socket, replaced if it exists
+            reconfig (Reconfiguration): membership changes of the manager
+        """
+        super().__init__(daemon=True)
+
+        self.reconfig = reconfig
+        execute = self.execute
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                try:
+                    response = execute(json.loads(self.rfile.readline().decode("utf-8")))
+                except ValueError as e:
+                    response = {'ok': False, 'error': "Invalid request: {}".format(e)}
+
+                self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+        if os.path.exists(path):
+            os.unlink(path)
+
+        self.server = socketserver.ThreadingUnixStreamServer(path, Handler)
+        self.server.daemon_threads = True
+        # only the owner of the node may change the members
+        os.chmod(path, 0o600)
+
+    def execute(self, request: dict) -> dict:
+        """Executes an admin request
+
+        Args:
+            request (dict): command and the members it applies to
+
+        Returns:
+            dict: response, ok is false if the request failed
+        """
+        command = request.get("command")
+
+        if command == "members":
+            return self.reconfig.status()
+        if command in ("add", "remove"):
+            members = request.get("members") or []
+            if not members:
+                return {'ok': False, 'error': "No members given"}
+
+            _logger.warning("Admin request to {} {}".format(command, ", ".join(members)))
+            return self.reconfig.change(**{command: members})
+
+        return {'ok': False, 'error': "Unknown command {}".format(command)}
+
+    def run(self):
+        """Run the server
+        """
+        self.server.serve_forever()
+
+    def stop(self):
+        """Stops the server and removes the socket
+        """
+        self.server.shutdown()
+        self.server.server_close()
+
+        if os.path.exists(self.server.server_address):
+            os.unlink(self.server.server_address)
+
+
+def request(path: str, command: str, members=None, timeout: float = 10.0) -> dict:
+    """Sends a request to the admin socket of a node
+
+    Args:
+        path (str): path of the unix socket
+        command (str): members, add or remove
+        members (List[str], optional): "ip" or "ip:port" of the members to add or remove
+        timeout (float, optional): seconds to wait for the response. Defaults to 10.0.
+
+    Returns:
+        dict: response of the node
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(path)
+        s.sendall(json.dumps({'command': command, 'members': members or []}).encode("utf-8")
+                  + b"\n")
+
+        return json.loads(s.makefile("rb").readline().decode("utf-8"))
+
+
+def parse_args(args):
+    """Parse command line parameters
+
+    Args:
+      args ([str]): command line parameters as list of strings
+
+    Returns:
+      :obj:`argparse.Namespace`: command line parameters namespace
+    """
+    parser = argparse.ArgumentParser(
+        description="Lists and changes the members of a running pyquorum cluster.")
+    parser.add_argument("-s", "--socket", dest="socket", default="/run/pyquorum.sock",
+                        help="Admin socket of the local node")
+    parser.add_argument("command", choices=COMMANDS, help="Command to run")
+    parser.add_argument("members", nargs="*", help="Members to add or remove as ip or ip:port")
+
+    args = parser.parse_args(args)
+    if args.command != "members" and not args.members:
+        parser.error("{} requires at least one member".format(args.command))
+
+    return args
+
+
+def main(args):
+    """Main entry point allowing external calls
+
+    Args:
+      args ([str]): command line parameter list
+
+    Returns:
+      int: exit code, 1 if the request failed
+    """
+    args = parse_args(args)
+
+    try:
+        response = request(args.socket, args.command, args.members)
+    except OSError as e:
+        print("Could not reach the node at {}: {}".format(args.socket, e), file=sys.stderr)
+        return 1
+
+    print(json.dumps(response, indent=2))
+
+    return 0 if response.get("ok") else 1
+
+
+def run():
+    """Entry point for console_scripts
+    """
+    sys.exit(main(sys.argv[1:]))
+
+
+if __name__ == "__main__":
+    run()
@@ -4,18 +4,34 @@ This is the entry point for the pyquorum application.
 """
 
 import argparse
+import atexit
 import socket
 import sys
 import logging
-import time
 import signal
+import time
+from typing import List, Optional, Tuple
 
-from .udpserver import UdpServer
+from .udpserver import UdpServer, MAX_DATAGRAM
 from .udpclient import UdpClient
 from .host import Host
+from .detector import FailureDetector, PenaltyDetector, PhiAccrualDetector
 from .receiver import MessageReceiver
+from .inbox import Inbox
 from .manager import QuorumManager
-from .runner import Runner
+from .runner import Runner, StandbyRunner
+from .supervisor import Supervisor
+from .runtime import AsyncRuntime
+from .swim import SwimMembership
+from .groups import GroupMultiplexer, heartbeatFrames
+from .heartbeat import DeltaHeartbeats
+from .placement import LoadProbe, METRICS
+from .reconfig import Reconfiguration
+from .admin import AdminServer
+from .metrics import MetricsServer
+from .scheduler import Scheduler
+from .state import StateFile
+from .status import StatusPage
 
 from pyquorum import __version__
 
@@ -26,6 +42,25 @@ __license__ = "mit"
 _logger = logging.getLogger(__name__)
 
 
+def parse_signal(name: str) -> signal.Signals:
+    """Parses a signal name or number
+
+    Args:
+      name (str): signal name like SIGUSR1 or USR1, or its number
+
+    Returns:
+      signal.Signals: the signal
+    """
+    try:
+        if name.isdigit():
+            return signal.Signals(int(name))
+
+        name = name.upper()
+        return signal.Signals[name if name.startswith("SIG") else "SIG" + name]
+    except (KeyError, ValueError):
+        raise argparse.ArgumentTypeError("invalid signal: {}".format(name))
+
+
 def parse_args(args):
     """Parse command line parameters
 
@@ -68,6 +103,213 @@ def parse_args(args):
         help="Script to run on Quorum",
         type=str,
         metavar="SCRIPT")
+    parser.add_argument(
+        "--standby",
+        dest="standby",
+        help="Keep the script running in standby on followers and promote it on election",
+        action="store_true")
+    parser.add_argument(
+        "--standby-control",
+        dest="standby_control",
+        help="How the standby script is promoted and demoted",
+        choices=["signal", "pipe"],
+        default="signal")
+    parser.add_argument(
+        "--promote-signal",
+        dest="promote_signal",
+        help="Signal that promotes the standby script",
+        type=parse_signal,
+        default=signal.SIGUSR1)
+    parser.add_argument(
+        "--demote-signal",
+        dest="demote_signal",
+        help="Signal that demotes the script back to standby",
+        type=parse_signal,
+        default=signal.SIGUSR2)
+    parser.add_argument(
+        "--grace",
+        dest="grace",
+        help="Seconds the script may take to exit before it is killed",
+        type=float,
+        default=5.0)
+    parser.add_argument(
+        "--restart-backoff",
+        dest="restart_backoff",
+        help="Seconds until a crashed script is restarted, doubled on every crash",
+        type=float,
+        default=1.0)
+    parser.add_argument(
+        "--max-restarts",
+        dest="max_restarts",
+        help="Crashes within a minute after which the script is given up",
+        type=int,
+        default=3)
+    parser.add_argument(
+        "--resign-on-crash",
+        dest="resign_on_crash",
+        help="Give up the leadership while the script keeps crashing",
+        action="store_true")
+    parser.add_argument(
+        "-i",
+        "--interval",
+        dest="interval",
+        help="Seconds between two keepalive messages",
+        type=float,
+        default=1.0)
+    parser.add_argument(
+        "--detector",
+        dest="detector",
+        help="Failure detector used to mark hosts down",
+        choices=["penalty", "phi"],
+        default="penalty")
+    parser.add_argument(
+        "--phi-threshold",
+        dest="phi_threshold",
+        help="Suspicion level above which the phi detector marks a host down",
+        type=float,
+        default=8.0)
+    parser.add_argument(
+        "--swim",
+        dest="swim",
+        help="Use SWIM style gossip membership instead of all-to-all keepalives",
+        action="store_true")
+    parser.add_argument(
+        "--swim-k",
+        dest="swim_k",
+        help="Number of members asked to probe a host indirectly",
+        type=int,
+        default=3)
+    parser.add_argument(
+        "--swim-suspicion",
+        dest="swim_suspicion",
+        help="Protocol periods until a suspected host is declared down",
+        type=int,
+        default=3)
+    parser.add_argument(
+        "--delta-heartbeats",
+        dest="delta_heartbeats",
+        help="Send beacons and state changes instead of the full state with every keepalive",
+        action="store_true")
+    parser.add_argument(
+        "--digest-every",
+        dest="digest_every",
+        help="Keepalive rounds after which the full state is sent with delta heartbeats",
+        type=int,
+        default=10)
+    parser.add_argument(
+        "--priority",
+        dest="priority",
+        help="Priority of this node, the reachable node with the highest priority is elected",
+        type=int,
+        default=0)
+    parser.add_argument(
+        "--load-metric",
+        dest="load_metric",
+        help="Load sent with the keepalives, the least loaded node among equal priorities is elected",
+        choices=METRICS)
+    parser.add_argument(
+        "--load-command",
+        dest="load_command",
+        help="Shell command that prints the load for --load-metric command",
+        type=str)
+    parser.add_argument(
+        "--load-step",
+        dest="load_step",
+        help="Load difference that is considered a different load",
+        type=float,
+        default=0.25)
+    parser.add_argument(
+        "-g",
+        "--group",
+        dest="groups",
+        help="Run an election group with this name (can be given several times)",
+        action="append",
+        metavar="GROUP")
+    parser.add_argument(
+        "--state-file",
+        dest="state_file",
+        help="File the election state is kept in to rejoin quickly after a restart",
+        type=str)
+    parser.add_argument(
+        "--state-max-age",
+        dest="state_max_age",
+        help="Seconds after which a stored state is too old to be restored",
+        type=float,
+        default=10.0)
+    parser.add_argument(
+        "--status-file",
+        dest="status_file",
+        help="Memory-mapped page the leadership status is published on",
+        type=str)
+    parser.add_argument(
+        "--legacy-wire",
+        dest="legacy_wire",
+        help="Send messages in the legacy json format (for rolling upgrades)",
+        action="store_true")
+    parser.add_argument(
+        "--max-datagram",
+        dest="max_datagram",
+        help="Maximum size of a received datagram in bytes",
+        type=int,
+        default=MAX_DATAGRAM)
+    parser.add_argument(
+        "--rcvbuf",
+        dest="rcvbuf",
+        help="Size of the socket receive buffer in bytes",
+        type=int)
+    parser.add_argument(
+        "--inbox-capacity",
+        dest="inbox_capacity",
+        help="Maximum number of queued messages besides the latest ping of every peer",
+        type=int,
+        default=1024)
+    parser.add_argument(
+        "--inbox-rate",
+        dest="inbox_rate",
+        help="Packets per second accepted from a single source (default: 100, raised to fit the heartbeats of the groups)",
+        type=float)
+    parser.add_argument(
+        "--inbox-burst",
+        dest="inbox_burst",
+        help="Packets accepted from a single source in a burst (default: 200, raised to fit the heartbeats of the groups)",
+        type=float)
+    parser.add_argument(
+        "--multicast",
+        dest="multicast",
+        help="Multicast group keepalives are sent to instead of every host",
+        type=str)
+    parser.add_argument(
+        "--multicast-ttl",
+        dest="multicast_ttl",
+        help="Time to live of multicast keepalives",
+        type=int,
+        default=1)
+    parser.add_argument(
+        "--multicast-loop",
+        dest="multicast_loop",
+        help="Loop multicast keepalives back to this host (several nodes on one host)",
+        action="store_true")
+    parser.add_argument(
+        "--admin-socket",
+        dest="admin_socket",
+        help="Unix socket on which pyquorum-admin changes the members at runtime (disabled if omitted)",
+        type=str)
+    parser.add_argument(
+        "--metrics-port",
+        dest="metrics_port",
+        help="Port of the Prometheus metrics endpoint (disabled if omitted)",
+        type=int)
+    parser.add_argument(
+        "--metrics-bind",
+        dest="metrics_bind",
+        help="IP the metrics endpoint binds to",
+        type=str,
+        default="127.0.0.1")
+    parser.add_argument(
+        "--asyncio",
+        dest="asyncio",
+        help="Run the node on an asyncio event loop instead of a server thread",
+        action="store_true")
     parser.add_argument(
         "-v",
         "--verbose",
@@ -82,7 +324,27 @@ def parse_args(args):
         help="set loglevel to DEBUG",
         action="store_const",
         const=logging.DEBUG)
-    return parser.parse_args(args)
+    args = parser.parse_args(args)
+
+    if args.groups and args.swim:
+        parser.error("--group can not be combined with --swim")
+    if args.delta_heartbeats and (args.groups or args.swim):
+        parser.error("--delta-heartbeats can not be combined with --group or --swim")
+    if (args.priority or args.load_metric) and (args.groups or args.swim):
+        parser.error("--priority and --load-metric can not be combined with --group or --swim")
+    if args.load_metric == "command" and not args.load_command:
+        parser.error("--load-metric command requires --load-command")
+    if not -32768 <= args.priority <= 32767:
+        parser.error("--priority must be between -32768 and 32767")
+    if args.groups and args.state_file:
+        parser.error("--group can not be combined with --state-file")
+    if args.admin_socket and (args.groups or args.swim):
+        parser.error("--admin-socket can not be combined with --group or --swim")
+    # nodes of the previous version fail on message types they don't know
+    if args.legacy_wire and (args.swim or args.groups or args.admin_socket):
+        parser.error("--legacy-wire can not be combined with --swim, --group or --admin-socket")
+
+    return args
 
 
 def setup_logging(loglevel):
@@ -96,6 +358,102 @@ def setup_logging(loglevel):
                         format=logformat, datefmt="%Y-%m-%d %H:%M:%S")
 
 
+def inbox_limits(args) -> Tuple[float, float]:
+    """Rate and burst of packets accepted from a single source. By default a
+    peer may send the heartbeat frames of all groups twice per interval, once
+    as its keepalive and once when the state of the groups changes.
+
+    Args:
+      args (:obj:`argparse.Namespace`): command line parameters
+
+    Returns:
+      Tuple[float, float]: packets per second and packets in a burst
+    """
+    frames = 2 * heartbeatFrames(len(args.groups or []))
+
+    rate = args.inbox_rate if args.inbox_rate is not None else max(100.0, frames / args.interval)
+    burst = args.inbox_burst if args.inbox_burst is not None else max(200.0, float(frames))
+
+    return rate, burst
+
+
+def make_detector(args) -> FailureDetector:
+    """Creates a failure detector for a host
+
+    Args:
+      args (:obj:`argparse.Namespace`): command line parameters namespace
+
+    Returns:
+      FailureDetector: the configured failure detector
+    """
+    if args.detector == "phi":
+        return PhiAccrualDetector(args.phi_threshold, args.interval)
+
+    return PenaltyDetector(interval=args.interval)
+
+
+def make_runner(args, scriptArgs: Optional[List[str]] = None) -> Supervisor:
+    """Creates the supervised runner of the script
+
+    Args:
+      args (:obj:`argparse.Namespace`): command line parameters namespace
+      scriptArgs (List[str], optional): arguments passed to the script
+
+    Returns:
+      Supervisor: the configured runner
+    """
+    if not args.standby:
+        runner = Supervisor(Runner(args.script, scriptArgs), args.grace, args.restart_backoff,
+                            maxRestarts=args.max_restarts)
+    else:
+        runner = Supervisor(StandbyRunner(args.script, scriptArgs, args.promote_signal,
+                                          args.demote_signal, args.standby_control == "pipe"),
+                            args.grace, args.restart_backoff, maxRestarts=args.max_restarts)
+        # start the standby right away
+        runner.prepare()
+
+    # don't leave the script behind on shutdown
+    atexit.register(runner.close)
+
+    return runner
+
+
+def resign_on_crash(manager: QuorumManager):
+    """Lets the manager give up the leadership while its script keeps crashing
+
+    Args:
+      manager (QuorumManager): manager whose runner is supervised
+    """
+    manager.runner.onGiveUp = manager.resign
+    manager.runner.onRecover = manager.reinstate
+
+
+def load_state(args, manager: QuorumManager):
+    """Restores the state of the previous run and keeps the state file updated
+
+    Args:
+      args (:obj:`argparse.Namespace`): command line parameters namespace
+      manager (QuorumManager): the manager
+    """
+    stateFile = StateFile(args.state_file,
+                          ["{}:{}".format(host.ip, host.port) for host in manager.ranking])
+    state = stateFile.read()
+
+    manager.stateFile = stateFile
+    atexit.register(stateFile.close)
+
+    if state is None:
+        return
+
+    age = time.time() - state.savedAt
+    if 0 <= age <= args.state_max_age:
+        _logger.info("Restoring state saved {:.1f} seconds ago".format(age))
+        manager.restore(state)
+    else:
+        # the cluster moved on, only keep the term
+        manager.term = state.term
+
+
 def main(args):
     """Main entry point allowing external calls
 
@@ -108,25 +466,87 @@ def main(args):
     signal.signal(signal.SIGINT, exit_handler)
     signal.signal(signal.SIGTERM, exit_handler)
 
-    hosts = [Host(s, args.port) for s in args.servers]
+    hosts = [Host(s, args.port, make_detector(args)) for s in args.servers]
+
+    client = UdpClient(args.bind, args.legacy_wire, multicast=args.multicast,
+                       ttl=args.multicast_ttl, loop=args.multicast_loop)
+
+    if args.groups:
+        # all groups share the socket and one combined heartbeat per peer,
+        # the script receives the name of the group it was elected for
+        manager = GroupMultiplexer(Host(args.bind, args.port), hosts, client)
+        for name in args.groups:
+            group = manager.add(name, make_runner(args, [name]))
+            if args.resign_on_crash:
+                resign_on_crash(group)
+            if args.status_file:
+                group.statusPage = StatusPage("{}.{}".format(args.status_file, name))
+        handler = manager
+    else:
+        runner = make_runner(args)
+
+        manager = QuorumManager(Host(args.bind, args.port), hosts, client, runner)
+        manager.legacy = args.legacy_wire
+        # nodes of the previous version can't answer pre-votes
+        manager.preVote = not args.legacy_wire
+        if args.resign_on_crash:
+            resign_on_crash(manager)
+        if args.status_file:
+            manager.statusPage = StatusPage(args.status_file)
+            atexit.register(manager.statusPage.close)
+        if args.state_file:
+            load_state(args, manager)
+        if args.swim:
+            manager.membership = SwimMembership(manager, args.swim_k, args.swim_suspicion)
+        if args.delta_heartbeats:
+            manager.heartbeats = DeltaHeartbeats(manager, args.digest_every)
+        manager.loadStep = args.load_step
+        if args.load_metric:
+            manager.probe = LoadProbe(args.load_metric, args.load_command,
+                                      min(1.0, args.interval / 2))
+        manager.setPlacement(args.priority, manager.probe.sample() if manager.probe else None)
+        if args.admin_socket:
+            manager.reconfig = Reconfiguration(
+                manager, lambda ip, port: Host(ip, port, make_detector(args)))
+            admin = AdminServer(args.admin_socket, manager.reconfig)
+            admin.start()
+            atexit.register(admin.stop)
+        handler = MessageReceiver(manager)
+
+    # the server only queues packets, pings are coalesced per peer
+    inbox = Inbox(handler, args.inbox_capacity, *inbox_limits(args))
 
-    client = UdpClient(args.bind)
+    # hand the leadership off when the node is shut down
+    atexit.register(manager.handoff)
 
-    runner = Runner(args.script)
+    if args.metrics_port:
+        MetricsServer(args.metrics_bind, args.metrics_port).start()
 
-    manager = QuorumManager(Host(args.bind, args.port), hosts, client, runner)
-    handler = MessageReceiver(manager)
+    if args.asyncio:
+        runtime = AsyncRuntime(args.interval)
+        runtime.add(manager, inbox, args.bind, args.port)
+        if args.multicast:
+            runtime.join(inbox, args.multicast, args.bind, args.port)
+        runtime.run()
+        return
 
-    server = UdpServer(args.bind, args.port, handler)
+    inbox.start()
+    server = UdpServer(args.bind, args.port, inbox, maxDatagram=args.max_datagram,
+                       rcvbuf=args.rcvbuf, peers=args.servers)
     server.start()
 
-    # Main loop which will periodically send keep alive messages to other nodes
-    # and update the quorum manager
-    while True:
-        manager.sendKeepAlives()
-        time.sleep(1)
+    if args.multicast:
+        UdpServer(args.bind, args.port, inbox, maxDatagram=args.max_datagram,
+                  rcvbuf=args.rcvbuf, group=args.multicast, peers=args.servers).start()
 
-        manager.update()
+    # Periodically send keep alive messages to other nodes and update the
+    # quorum manager. Elections are also triggered by received messages and
+    # by the deadline of the master.
+    scheduler = Scheduler()
+    manager.scheduler = scheduler
+    scheduler.every(args.interval, manager.sendKeepAlives)
+    scheduler.every(args.interval, manager.update, args.interval)
+    scheduler.run()
 
 
 def run():
@@ -144,6 +564,7 @@ def exit_handler(sig, frame):
     """
     _logger.info("Shutting down")
 
+    # the leadership is handed off by the exit handlers
     sys.exit(0)
 
 
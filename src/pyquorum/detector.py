@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+
+import abc
+from collections import deque
+import math
+import time
+from typing import Callable, Deque, Optional, Tuple
+
+
+class FailureDetector(abc.ABC):
+    """Base failure detector interface
+    """
+
+    @abc.abstractmethod
+    def heartbeat(self):
+        """Records the arrival of a keepalive message
+        """
+        pass
+
+    @abc.abstractmethod
+    def check(self, penalty: int) -> bool:
+        """Called once per tick to decide whether the host failed
+
+        Args:
+            penalty (int): number of ticks since the last keepalive message
+
+        Returns:
+            bool: returns true if the host should be marked as down now
+        """
+        pass
+
+    def reset(self):
+        """Forgets the keepalive history, called when a host that was down
+        comes back so the outage doesn't count as an inter-arrival time
+        """
+        pass
+
+    def deadline(self) -> Optional[float]:
+        """Time at which the host will be considered failed if no further
+        keepalive message arrives
+
+        Returns:
+            Optional[float]: deadline on the clock of the detector or None if unknown
+        """
+        return None
+
+
+class PenaltyDetector(FailureDetector):
+    """Marks a host down after a fixed number of ticks without a keepalive
+    """
+
+    def __init__(self, limit: int = 3, interval: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            limit (int, optional): number of missed ticks. Defaults to 3.
+            interval (float, optional): seconds between two ticks. If omitted the deadline is unknown and the missed ticks are counted.
+            clock (Callable[[], float], optional): monotonic clock. Defaults to time.monotonic.
+        """
+        super().__init__()
+        self.limit = limit
+        self.interval = interval
+        self.clock = clock
+        self.last: Optional[float] = None
+
+    def heartbeat(self):
+        """Records the arrival of a keepalive message
+        """
+        self.last = self.clock()
+
+    def deadline(self) -> Optional[float]:
+        """Time at which the host will have missed the limit of ticks
+
+        Returns:
+            Optional[float]: deadline on the clock of the detector or None if no keepalive arrived yet or the interval is unknown
+        """
+        if self.last is None or self.interval is None:
+            return None
+
+        return self.last + self.limit * self.interval
+
+    def check(self, penalty: int) -> bool:
+        """Marks the host down once the penalty reaches the limit
+
+        Args:
+            penalty (int): number of ticks since the last keepalive message
+
+        Returns:
+            bool: returns true if the host should be marked as down now
+        """
+        return penalty == self.limit
+
+
+class PhiAccrualDetector(FailureDetector):
+    """Phi accrual failure detector based on the distribution of keepalive
+    inter-arrival times. Phi expresses the confidence that the host failed,
+    a phi of 8 means a chance of 1e-8 to be wrong.
+    """
+
+    def __init__(self, threshold: float = 8.0, interval: float = 1.0, window: int = 100,
+                 minStdDeviation: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            threshold (float, optional): phi above which the host is suspected. Defaults to 8.0.
+            interval (float, optional): expected seconds between keepalives. Defaults to 1.0.
+            window (int, optional): number of inter-arrival samples to keep. Defaults to 100.
+            minStdDeviation (float, optional): lower bound of the standard deviation. Defaults to interval / 10.
+            clock (Callable[[], float], optional): monotonic clock. Defaults to time.monotonic.
+        """
+        super().__init__()
+
+        self.threshold = threshold
+        self.interval = interval
+        self.minStdDeviation = minStdDeviation if minStdDeviation is not None else interval / 10
+        self.clock = clock
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.reset()
+
+    def reset(self):
+        """Forgets the inter-arrival times and starts over with the expected
+        interval
+        """
+        self.samples.clear()
+        self.last = None
+        self.suspected = False
+        self._sum = 0.0
+        self._squares = 0.0
+
+        # bootstrap the distribution with the expected interval
+        self._add(self.interval)
+
+    def _add(self, sample: float):
+        if len(self.samples) == self.samples.maxlen:
+            old = self.samples[0]
+            self._sum -= old
+            self._squares -= old * old
+
+        self.samples.append(sample)
+        self._sum += sample
+        self._squares += sample * sample
+
+    def heartbeat(self):
+        """Records the arrival of a keepalive message
+        """
+        now = self.clock()
+
+        if self.last is not None:
+            self._add(now - self.last)
+
+        self.last = now
+        self.suspected = False
+
+    def _distribution(self) -> Tuple[float, float]:
+        n = len(self.samples)
+        mean = self._sum / n
+        variance = max(0.0, self._squares / n - mean * mean)
+
+        return mean, max(math.sqrt(variance), self.minStdDeviation)
+
+    @staticmethod
+    def _phi(y: float) -> float:
+        # -log10 of the logistic approximation of the normal tail probability
+        x = -y * (1.5976 + 0.070566 * y * y)
+        if x < 0:
+            return (-x + math.log1p(math.exp(x))) / math.log(10)
+
+        return math.log1p(math.exp(-x)) / math.log(10)
+
+    def phi(self) -> float:
+        """Calculates the current suspicion level
+
+        Returns:
+            float: phi value of the host
+        """
+        if self.last is None:
+            return 0.0
+
+        mean, std = self._distribution()
+
+        return PhiAccrualDetector._phi((self.clock() - self.last - mean) / std)
+
+    def deadline(self) -> Optional[float]:
+        """Time at which phi will exceed the threshold
+
+        Returns:
+            Optional[float]: deadline on the clock of the detector or None if no keepalive arrived yet
+        """
+        if self.last is None:
+            return None
+
+        mean, std = self._distribution()
+
+        # phi grows monotonically with the elapsed time
+        low, high = -50.0, 100.0
+        for _ in range(60):
+            y = (low + high) / 2
+            if PhiAccrualDetector._phi(y) > self.threshold:
+                high = y
+            else:
+                low = y
+
+        return self.last + mean + high * std
+
+    def check(self, penalty: int) -> bool:
+        """Suspects the host once phi exceeds the threshold
+
+        Args:
+            penalty (int): number of ticks since the last keepalive message
+
+        Returns:
+            bool: returns true if the host should be marked as down now
+        """
+        if self.suspected or self.last is None:
+            return False
+
+        if self.phi() > self.threshold:
+            self.suspected = True
+            return True
+
+        return False
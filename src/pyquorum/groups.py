@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import math
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+import zlib
+
+from .handler import BaseHandler
+from .host import Host, HostStatus
+from .manager import QuorumManager
+from .message import GROUP_ENTRY_SIZE, GROUP_FRAME_OVERHEAD, Message, MessageType
+from .metrics import Metrics, registry
+from .runner import Runner
+from .udpclient import UdpClient
+
+_logger = logging.getLogger(__name__)
+
+# Combined heartbeats are split so a frame fits into a single ethernet frame
+MAX_GROUP_FRAME = 1400
+
+
+def heartbeatFrames(groups: int, maxFrame: int = MAX_GROUP_FRAME) -> int:
+    """Number of frames a combined heartbeat of all groups is split into
+
+    Args:
+        groups (int): number of groups
+        maxFrame (int, optional): Maximum size of a heartbeat frame in bytes. Defaults to MAX_GROUP_FRAME.
+
+    Returns:
+        int: frames sent to every peer per interval
+    """
+    perFrame = max(1, (maxFrame - GROUP_FRAME_OVERHEAD) // GROUP_ENTRY_SIZE)
+
+    return -(-groups // perFrame)
+
+
+def groupId(name: str) -> int:
+    """Derives the wire id of an election group from its name
+
+    Args:
+        name (str): name of the group
+
+    Returns:
+        int: 32 bit id of the group
+    """
+    return zlib.crc32(name.encode("utf-8"))
+
+
+class GroupClient(object):
+    """Client of a group manager. Announcements are not sent on their own but
+    collected by the multiplexer and sent as part of a combined heartbeat.
+    """
+
+    def __init__(self, multiplexer, group: int):
+        """
+        Args:
+            multiplexer (GroupMultiplexer): multiplexer the group belongs to
+            group (int): id of the group
+        """
+        super().__init__()
+        self.multiplexer = multiplexer
+        self.group = group
+
+    def encode(self, message: Message) -> Message:
+        """The state is encoded by the multiplexer
+
+        Args:
+            message (Message): Message to encode
+
+        Returns:
+            Message: the message itself
+        """
+        return message
+
+    def sendMany(self, message: Message, hosts: Iterable[Host]) -> List[Host]:
+        """Marks the state of the group as changed
+
+        Args:
+            message (Message): Message to send
+            hosts (Iterable[Host]): Hosts to send the message to
+
+        Returns:
+            List[Host]: always empty, failed sends are handled by the multiplexer
+        """
+        self.multiplexer.changed(self.group)
+
+        return []
+
+
+class GroupMultiplexer(BaseHandler):
+    """Runs many independent election groups over one socket. Every peer
+    receives one combined heartbeat carrying the state of all groups instead
+    of one keepalive per group, and the liveness of a peer is tracked once for
+    all groups. A change of the status of a peer is only passed to the groups
+    in which the peer ranks higher than this node or is the master, unless it
+    changes whether a majority is reachable.
+    """
+
+    def __init__(self, local: Host, hosts: List[Host], client: UdpClient,
+                 maxFrame: int = MAX_GROUP_FRAME, metrics: Optional[Metrics] = None):
+        """
+        Args:
+            local (Host): The local host
+            hosts (List[Host]): Other hosts that are in the cluster
+            client (UdpClient): client which is used to send the combined heartbeats
+            maxFrame (int, optional): Maximum size of a heartbeat frame in bytes. Defaults to MAX_GROUP_FRAME.
+            metrics (Metrics, optional): registry to record metrics in. Defaults to the global registry.
+        """
+        super().__init__()
+
+        self.local = local
+        self.hosts = hosts
+        self.client = client
+        self.metrics = metrics if metrics is not None else registry
+        self.groups: Dict[int, QuorumManager] = {}
+        self.lock = threading.RLock()
+        # set by the runtimes, the group managers don't use a watchdog
+        self.scheduler = None
+
+        self._byIp = {host.ip: host for host in hosts}
+        self._perFrame = max(1, (maxFrame - GROUP_FRAME_OVERHEAD) // GROUP_ENTRY_SIZE)
+        self._dirty: Set[int] = set()
+        self._majority = math.floor((len(hosts) + 1) / 2)
+        self._alive = 0
+        # groups in which a host ranks higher than this node
+        self._above: Dict[Host, List[QuorumManager]] = {}
+
+        for host in hosts:
+            self._above[host] = []
+            if host.status == HostStatus.UP:
+                self._alive += 1
+            host.listeners.append(self._statusChanged)
+
+        self.decodeErrors = self.metrics.counter(
+            "pyquorum_decode_errors_total", "Received packets that could not be decoded")
+
+        node = self.local.ip
+        self.metrics.gauge("pyquorum_alive_hosts", "Number of reachable hosts",
+                           self.aliveCount, node=node)
+        self.metrics.gauge("pyquorum_groups", "Number of election groups",
+                           lambda: len(self.groups), node=node)
+        self.metrics.gauge("pyquorum_groups_quorum", "Election groups that have quorum",
+                           lambda: sum(1 for m in self.groups.values() if m.quorum), node=node)
+        self.metrics.gauge("pyquorum_groups_master", "Election groups this node is the master of",
+                           lambda: sum(1 for m in self.groups.values()
+                                       if m.quorum and m.master is m.local), node=node)
+
+    def add(self, name: str, runner: Runner) -> QuorumManager:
+        """Adds an election group
+
+        Args:
+            name (str): name of the group, must be the same on all nodes
+            runner (Runner): runner which runs the application of the group on its master
+
+        Raises:
+            ValueError: Raised if the group id is already used by another group
+
+        Returns:
+            QuorumManager: the manager of the group
+        """
+        group = groupId(name)
+        if group in self.groups:
+            raise ValueError("Group {} collides with group {}".format(
+                name, self.groups[group].group))
+
+        # every group ranks the hosts differently so the leaders are spread
+        manager = QuorumManager(self.local, self.hosts, GroupClient(self, group), runner,
+                                self.metrics, name, seed=group, liveness=self)
+        manager.lock = self.lock
+        # combined heartbeats carry the terms but no pre-votes
+        manager.preVote = False
+        self.groups[group] = manager
+
+        for host in self.hosts:
+            if manager.outranks(host):
+                self._above[host].append(manager)
+
+        return manager
+
+    def aliveCount(self) -> int:
+        """Number of reachable hosts, shared by all groups
+
+        Returns:
+            int: Returns the number of reachable hosts
+        """
+        return self._alive
+
+    def getHost(self, ip: str) -> Host:
+        """Get a specific host's object by ip address
+
+        Args:
+            ip (str): IP address of the host
+
+        Raises:
+            Exception: Raised if the host is not part of the cluster
+
+        Returns:
+            Host: Host object of the node
+        """
+        host = self._byIp.get(ip)
+        if host is None:
+            raise Exception("Host not found")
+
+        return host
+
+    def changed(self, group: int):
+        """Marks the state of a group as changed so it is sent with the next flush
+
+        Args:
+            group (int): id of the group
+        """
+        self._dirty.add(group)
+
+    def handle(self, ip: str, data: bytes):
+        """Receives combined heartbeats
+
+        Args:
+            ip (str): IP address from which this message was received
+            data (bytes): The data that was received
+        """
+        try:
+            message = Message.fromBytes(data)
+        except Exception:
+            self.decodeErrors.inc()
+            _logger.error("Could not decode message from {}".format(ip))
+            return
+
+        if message.type != MessageType.GROUP_PING:
+            _logger.debug("Ignoring {} from {}".format(message.type.name, ip))
+            return
+
+        try:
+            host = self.getHost(ip)
+
+            with self.lock:
+                majority = self._hasMajority()
+                if host.status == HostStatus.DOWN:
+                    _logger.warning("Host {} back online".format(host.ip))
+
+                host.unpunish()
+
+                for group, ping in message.data:
+                    manager = self.groups.get(group)
+                    # the group is not configured on this node
+                    if manager is not None:
+                        manager.receive(host, ping)
+
+                # groups that are not part of this frame may be elected now
+                if self._hasMajority() != majority:
+                    for manager in self.groups.values():
+                        manager.evaluate()
+
+                self.flush()
+        except Exception:
+            _logger.error("Could not handle message from {}".format(ip))
+
+    def sendKeepAlives(self):
+        """Sends the state of all groups to all other nodes
+        """
+        with self.lock:
+            self._dirty.clear()
+            self._send(self.groups.items())
+            self.flush()
+
+    def update(self):
+        """Punishes hosts whose heartbeats are missing and runs the election of
+        all groups
+        """
+        with self.lock:
+            for host in self.hosts:
+                # keep alive messages will reset the penalty.
+                if host.punish():
+                    self._down(host)
+
+            for manager in self.groups.values():
+                manager.evaluate()
+
+            self.flush()
+
+    def handoff(self):
+        """Leaves all groups on a planned shutdown. The combined heartbeat
+        tells the other nodes right away that this node stepped down and is
+        no longer eligible.
+        """
+        with self.lock:
+            for manager in self.groups.values():
+                manager.handoff()
+
+            self.flush()
+
+    def flush(self):
+        """Sends the groups whose state changed since the last heartbeat
+        """
+        with self.lock:
+            while self._dirty:
+                dirty, self._dirty = self._dirty, set()
+                self._send((group, self.groups[group]) for group in dirty)
+
+    def _send(self, groups):
+        entries = [(group, m.state()) for group, m in groups]
+
+        failed: Set[Host] = set()
+        for start in range(0, len(entries), self._perFrame):
+            message = Message(MessageType.GROUP_PING, entries[start:start + self._perFrame])
+            failed.update(self.client.sendMany(self.client.encode(message), self.hosts))
+
+        for host in failed:
+            if host.punish():
+                self._down(host)
+
+    def _hasMajority(self) -> bool:
+        return self._alive + 1 > self._majority
+
+    def _statusChanged(self, host: Host, old: HostStatus):
+        self._alive += 1 if host.status == HostStatus.UP else -1
+
+        for manager in self._above[host]:
+            manager.statusChanged(host, old)
+
+    def _down(self, host: Host):
+        _logger.warning("Host {} is down".format(host.ip))
+
+        if self._alive + 1 == self._majority:
+            # the majority was lost, every group re-evaluates
+            affected = self.groups.values()
+        else:
+            # only reads an attribute of the groups that don't depend on the host
+            above = set(self._above[host])
+            affected = [manager for manager in self.groups.values()
+                        if manager in above or manager.master is host]
+
+        for manager in affected:
+            if manager.master is host:
+                manager.down(host)
+            else:
+                manager.evaluate()
@@ -7,11 +7,11 @@ class BaseHandler(abc.ABC):
     """Base Handler interface
     """
     @abc.abstractclassmethod
-    def handle(self, ip: str, message: str):
+    def handle(self, ip: str, message: bytes):
         """Handle method called by the server
 
         Args:
             ip (str): IP Address of the client that sent the message
-            message (str): the message sent
+            message (bytes): the message sent
         """
         pass
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from typing import Dict, Optional, Tuple
+
+from .host import Host
+from .message import Message, MessageType
+
+_logger = logging.getLogger(__name__)
+
+# fields of the election state that share the flags of a ping
+_FLAGS = ("master", "quorum", "eligible")
+# priority and load are sent together, a node without a placement sends
+# neither and a delta clears them to the defaults
+_PLACEMENT = {'priority': 0, 'load': None}
+
+
+def diff(old: dict, new: dict) -> dict:
+    """Fields of the election state that changed
+
+    Args:
+        old (dict): previous state
+        new (dict): current state
+
+    Returns:
+        dict: changed fields, fields that are sent together are always included together
+    """
+    changes = {}
+
+    if any(old.get(key) != new.get(key) for key in _FLAGS):
+        changes = {key: new[key] for key in _FLAGS if key in new}
+    if old.get("term") != new.get("term") and "term" in new:
+        changes['term'] = new["term"]
+    placement = {key: new.get(key, default) for key, default in _PLACEMENT.items()}
+    if any(old.get(key, default) != placement[key] for key, default in _PLACEMENT.items()):
+        changes.update(placement)
+
+    return changes
+
+
+class DeltaHeartbeats(object):
+    """Keepalives that only carry the election state when it changes.
+
+    Every change of the state gets a new sequence number. The keepalive of a
+    round is a DELTA with the changed fields if the state changed, a DIGEST
+    with the full state every digestEvery rounds and a BEACON with the
+    sequence number of the unchanged state otherwise. A receiver that missed
+    a change notices the gap in the sequence numbers and asks for a DIGEST
+    with a SYNC_REQUEST. Until then the keepalives of the peer still count
+    but its state is not applied.
+    """
+
+    def __init__(self, manager, digestEvery: int = 10):
+        """
+        Args:
+            manager (QuorumManager): manager whose keepalives are encoded
+            digestEvery (int, optional): rounds after which the full state is sent. Defaults to 10.
+        """
+        super().__init__()
+
+        self.manager = manager
+        self.digestEvery = digestEvery
+
+        self.seq = 0
+        self._sent: Optional[dict] = None
+        self._rounds = 0
+        # last state received from every peer with its sequence number
+        self.peers: Dict[Host, Tuple[int, dict]] = {}
+
+        labels = {'node': manager.local.ip}
+        self.resyncs = manager.metrics.counter(
+            "pyquorum_heartbeat_resyncs_total",
+            "Full states requested after a gap in the heartbeats of a peer", **labels)
+
+    def next(self, state: dict) -> Message:
+        """Keepalive of the next round
+
+        Args:
+            state (dict): current election state
+
+        Returns:
+            Message: BEACON, DELTA or DIGEST
+        """
+        self._rounds += 1
+
+        if state != self._sent:
+            previous, self._sent = self._sent, dict(state)
+            self.seq = (self.seq + 1) & 0xFFFFFFFF
+
+            if previous is not None and self._rounds < self.digestEvery:
+                return Message(MessageType.DELTA, dict(diff(previous, state), seq=self.seq))
+        elif self._rounds < self.digestEvery:
+            return Message(MessageType.BEACON, {'seq': self.seq})
+
+        return self.digest()
+
+    def digest(self) -> Message:
+        """Full state with its sequence number
+
+        Returns:
+            Message: DIGEST of the last sent state
+        """
+        self._rounds = 0
+
+        return Message(MessageType.DIGEST, dict(self._sent or self.manager.state(), seq=self.seq))
+
+    def handle(self, host: Host, message: Message):
+        """Handles the heartbeats of another node
+
+        Args:
+            host (Host): Host which sent the message
+            message (Message): BEACON, DELTA, DIGEST or SYNC_REQUEST
+        """
+        if message.type == MessageType.SYNC_REQUEST:
+            _logger.debug("Sending digest to {}".format(host.ip))
+            self.manager.client.send(host, self.digest())
+            return
+
+        data = dict(message.data)
+        seq = data.pop("seq")
+        known = self.peers.get(host)
+
+        if message.type == MessageType.DIGEST:
+            state = data
+        elif message.type == MessageType.DELTA and known is not None \
+                and known[0] == (seq - 1) & 0xFFFFFFFF:
+            state = dict(known[1])
+            if "master" in data:
+                state.pop("eligible", None)
+            state.update(data)
+        elif message.type == MessageType.BEACON and known is not None and known[0] == seq:
+            state = known[1]
+        else:
+            # the peer is alive but we missed a change of its state
+            _logger.info("Missed state {} of {}, requesting digest".format(seq, host.ip))
+            self.resyncs.inc()
+            self.manager.keepalive(host)
+            self.manager.client.send(host, Message(
+                MessageType.SYNC_REQUEST, {'seq': known[0] if known is not None else 0}))
+            return
+
+        self.peers[host] = (seq, state)
+        self.manager.ping(host, state)
@@ -2,6 +2,9 @@
 
 from enum import Enum
 import logging
+from typing import Callable, List, Optional
+
+from .detector import FailureDetector, PenaltyDetector
 
 _logger = logging.getLogger(__name__)
 
@@ -17,27 +20,46 @@ class Host(object):
     """The Host object represents a node that runs pyquorum
     """
 
-    def __init__(self, ip: str, port: int):
+    def __init__(self, ip: str, port: int, detector: Optional[FailureDetector] = None):
         """
         Args:
             ip (str): IP address of the node
             port (int): port of the node
+            detector (FailureDetector, optional): failure detector of the node. Defaults to PenaltyDetector.
         """
         super().__init__()
         self.ip = ip
         self.port = port
         self.penalty = 0
-        self.status = HostStatus.DOWN
+        self._status = HostStatus.DOWN
+        self.detector = detector if detector is not None else PenaltyDetector()
+        self.listeners: List[Callable[[Host, HostStatus], None]] = []
+
+    @property
+    def status(self) -> HostStatus:
+        """Current status of the node
+        """
+        return self._status
+
+    @status.setter
+    def status(self, status: HostStatus):
+        old = self._status
+        self._status = status
+
+        if old != status:
+            for listener in self.listeners:
+                listener(self, old)
 
     def punish(self) -> bool:
-        """Punishes a node and marks the host down if penalty > 2
+        """Punishes a node and marks the host down if the failure detector
+        considers it failed
 
         Returns:
-            bool: returns true if the host was marked as down
+            bool: returns true if the host was up and has been marked as down
         """
         self.penalty += 1
 
-        if self.penalty == 3:
+        if self.detector.check(self.penalty) and self.status == HostStatus.UP:
             self.status = HostStatus.DOWN
             return True
 
@@ -47,4 +69,9 @@ class Host(object):
         """Unpunishes a host (marks it as up)
         """
         self.penalty = 0
+        if self.status == HostStatus.DOWN:
+            # the gap of an outage is not an inter-arrival time
+            self.detector.reset()
+        # the listeners see the deadline of this keepalive
+        self.detector.heartbeat()
         self.status = HostStatus.UP
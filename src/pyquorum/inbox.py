@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple, Union
+
+from .handler import BaseHandler
+from .message import MAGIC, MessageType
+from .metrics import Metrics, registry
+
+_logger = logging.getLogger(__name__)
+
+
+class TokenBucket(object):
+    """Token bucket rate limiter
+    """
+
+    def __init__(self, rate: float, burst: float, now: float):
+        """
+        Args:
+            rate (float): tokens added per second
+            burst (float): maximum number of tokens
+            now (float): current time
+        """
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last = now
+
+    def take(self, now: float) -> bool:
+        """Takes a token
+
+        Args:
+            now (float): current time
+
+        Returns:
+            bool: Returns true if a token was available
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+        if self.tokens < 1:
+            return False
+
+        self.tokens -= 1
+        return True
+
+
+class Inbox(threading.Thread, BaseHandler):
+    """Bounded inbox between the server and the handler of the manager.
+
+    The server only queues packets, so a burst of packets doesn't block the
+    socket. Pings are coalesced per peer as only the latest state matters,
+    other messages are queued up to the capacity of the inbox. Messages are
+    handled in the order they arrived, a coalesced ping takes the place of the
+    newest one. Every source is rate limited by a token bucket, the bucket of
+    the least recently seen source is evicted once there are too many. The
+    cost of a drain is therefore bounded by the number of peers instead of the
+    packet rate.
+    """
+
+    def __init__(self, handler: BaseHandler, capacity: int = 1024, rate: float = 100.0,
+                 burst: float = 200.0, maxSources: int = 4096, metrics: Optional[Metrics] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            handler (BaseHandler): Handler the queued messages are passed to
+            capacity (int, optional): Maximum number of queued messages besides pings. Defaults to 1024.
+            rate (float, optional): Packets per second accepted from a source. Defaults to 100.0.
+            burst (float, optional): Packets accepted from a source in a burst. Defaults to 200.0.
+            maxSources (int, optional): Maximum number of tracked sources. Defaults to 4096.
+            metrics (Metrics, optional): registry to record metrics in. Defaults to the global registry.
+            clock (Callable[[], float], optional): monotonic clock. Defaults to time.monotonic.
+        """
+        super().__init__(daemon=True)
+
+        self.handler = handler
+        self.capacity = capacity
+        self.rate = rate
+        self.burst = burst
+        self.maxSources = maxSources
+        self.clock = clock
+        # called when the first message is queued, wakes up the inbox thread
+        # unless a runtime drains the inbox itself
+        self.wakeup: Callable[[], None] = self._notify
+
+        self._condition = threading.Condition()
+        # pings are keyed by the peer, other messages by a sequence number
+        self._queue: Dict[Union[str, int], Tuple[str, bytes]] = {}
+        self._sequence = itertools.count()
+        self._others = 0
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._stopped = False
+
+        metrics = metrics if metrics is not None else registry
+        self.coalesced = metrics.counter(
+            "pyquorum_packets_coalesced_total", "Pings replaced by a newer ping of the same peer")
+        self.dropped = {reason: metrics.counter(
+            "pyquorum_packets_dropped_total", "Received packets that were dropped", reason=reason)
+            for reason in ("rate", "inbox_full")}
+        self.evicted = metrics.counter(
+            "pyquorum_inbox_sources_evicted_total", "Rate limits of idle sources that were evicted")
+        metrics.gauge("pyquorum_inbox_depth", "Messages waiting in the inbox", self.depth)
+
+    def depth(self) -> int:
+        """Number of queued messages
+
+        Returns:
+            int: queued pings and other messages
+        """
+        return len(self._queue)
+
+    def handle(self, ip: str, message: bytes):
+        """Queues a received message
+
+        Args:
+            ip (str): IP address from which this message was received
+            message (bytes): The data that was received
+        """
+        with self._condition:
+            ping = self._isPing(message)
+
+            # a packet that doesn't fit doesn't use up a token of its source
+            if not ping and self._others >= self.capacity:
+                self.dropped["inbox_full"].inc()
+                return
+
+            if not self._admit(ip):
+                return
+
+            empty = not self._queue
+
+            if ping:
+                # the newer ping moves to the end of the queue
+                if self._queue.pop(ip, None) is not None:
+                    self.coalesced.inc()
+                self._queue[ip] = (ip, message)
+            else:
+                self._queue[next(self._sequence)] = (ip, message)
+                self._others += 1
+
+        if empty:
+            self.wakeup()
+
+    def drain(self) -> int:
+        """Passes all queued messages to the handler
+
+        Returns:
+            int: number of messages handled
+        """
+        with self._condition:
+            queue, self._queue = self._queue, {}
+            self._others = 0
+
+        for ip, message in queue.values():
+            self.handler.handle(ip, message)
+
+        return len(queue)
+
+    def run(self):
+        """Drains the inbox whenever messages arrive
+        """
+        while True:
+            with self._condition:
+                while not self._stopped and not self._queue:
+                    self._condition.wait()
+
+                if self._stopped:
+                    return
+
+            self.drain()
+
+    def stop(self):
+        """Stops the inbox thread
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+    def _notify(self):
+        with self._condition:
+            self._condition.notify()
+
+    def _admit(self, ip: str) -> bool:
+        now = self.clock()
+        bucket = self._buckets.get(ip)
+
+        if bucket is None:
+            # spoofed sources must not lock out members that are added later
+            if len(self._buckets) >= self.maxSources:
+                self._buckets.popitem(last=False)
+                self.evicted.inc()
+
+            bucket = self._buckets[ip] = TokenBucket(self.rate, self.burst, now)
+        else:
+            self._buckets.move_to_end(ip)
+
+        if not bucket.take(now):
+            self.dropped["rate"].inc()
+            return False
+
+        return True
+
+    @staticmethod
+    def _isPing(message: bytes) -> bool:
+        # peeks at the header of binary frames, legacy json frames are queued
+        return len(message) > 2 and message[0] == MAGIC and message[2] == MessageType.PING.value
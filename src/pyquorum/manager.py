@@ -1,14 +1,20 @@
 # -*- coding: utf-8 -*-
 
+import hashlib
+import heapq
 import logging
-from typing import List, Set
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
 
 from .host import Host, HostStatus
 from .udpclient import UdpClient
 
 from .message import Message, MessageType
+from .metrics import Histogram, Metrics, registry
 
 from .runner import Runner
+from .state import LOCAL, NO_MASTER, NodeState, StateFile
 
 import math
 
@@ -19,23 +25,353 @@ class QuorumManager(object):
     """The manager is responsible for the master election process
     """
 
-    def __init__(self, local: Host, hosts: List[Host], client: UdpClient, runner: Runner):
+    def __init__(self, local: Host, hosts: List[Host], client: UdpClient, runner: Runner,
+                 metrics: Optional[Metrics] = None, group: Optional[str] = None,
+                 seed: Optional[int] = None, liveness=None):
         """
         Args:
             local (Host): The local host where this instance of the manager runs
             hosts (List[Host]): Other hosts that are in the cluster
             client (UdpClient): client which can be used to send messages to other nodes
             runner (Runner): runner which runs an application on the master
+            metrics (Metrics, optional): registry to record metrics in. Defaults to the global registry.
+            group (str, optional): name of the election group if several groups run in one process.
+            seed (int, optional): ranks the hosts by a hash of the seed and their address instead of the address, so the groups of a process elect different nodes. Defaults to None.
+            liveness (GroupMultiplexer, optional): tracks the reachable hosts and calls statusChanged for the hosts that rank higher than this node. The manager watches the hosts itself if omitted.
         """
         super().__init__()
 
         self.local = local
-        self.hosts = hosts
+        self.group = group
+        self.seed = seed
+        self.liveness = liveness
+        self.hosts = list(hosts)
         self.client = client
         self.master = None
         self.quorum = False
         self.votes: Set[Host] = set()
         self.runner = runner
+        # optional membership protocol that replaces all-to-all keepalives
+        self.membership = None
+        # optional encoding of the keepalives as beacons and deltas
+        self.heartbeats = None
+        # optional runtime membership changes
+        self.reconfig = None
+        # optional scheduler used to mark hosts down at their deadline
+        self.scheduler = None
+        # serializes the receive path and the timers
+        self.lock = threading.RLock()
+        # a node that resigned is not elected until it is reinstated
+        self.eligible = True
+        # election term, raised by every candidate that passed the pre-vote
+        self.term = 0
+        # ask the other nodes whether they would vote before becoming candidate
+        self.preVote = True
+        self._preVoteTerm: Optional[int] = None
+        self._preVotes: Set[Host] = set()
+        # peers may still run a version that only understands pings, used
+        # during a rolling upgrade
+        self.legacy = False
+        # optional state file the election state is persisted to and status
+        # page the leadership is published on
+        self.stateFile = None
+        self.statusPage = None
+        self._persisted = None
+        # priority and load of this node sent with the keepalives. A higher
+        # priority wins the election, then a lower load in steps of loadStep,
+        # then the lower address. The load is sampled by the optional probe.
+        self.priority = 0
+        self.load: Optional[float] = None
+        self.loadStep = 0.25
+        self.probe = None
+        self._placement: Dict[Host, Tuple[int, Optional[float]]] = {}
+
+        # (ip, port) and ip keyed index of the cluster members together with
+        # incrementally maintained counters of reachable hosts
+        self._byAddress: Dict[Tuple[str, int], Host] = {}
+        self._byIp: Dict[str, Host] = {}
+        self._lower: Set[Host] = set()
+        self._ineligible: Set[Host] = set()
+        self._alive = 0
+        self._aliveLower = 0
+        # deadlines of the reachable hosts, at most one entry per host. A
+        # keepalive only moves the deadline of the detector, the entry is
+        # moved once it expires, so only hosts whose deadline passed are
+        # touched. Hosts whose detector doesn't know its deadline are
+        # punished every tick instead.
+        self._deadlines: List[Tuple[float, int, Host]] = []
+        self._armed: Set[Host] = set()
+        self._polled: Set[Host] = set()
+        self._seq = 0
+        self._expiryAt: Optional[float] = None
+        self._majority = math.floor((len(hosts) + 1) / 2)
+        # while the members change a majority of the old and of the new
+        # members is needed, as sets of peers and whether this node is a member
+        self._joint: Optional[List[Tuple[Set[Host], bool]]] = None
+
+        for host in hosts:
+            self._index(host)
+
+        # members ordered by election rank
+        self.ranking = sorted(hosts, key=lambda h: self.addressKey(h.ip))
+
+        self.clock = time.monotonic
+        self._initMetrics(metrics if metrics is not None else registry)
+
+    def _initMetrics(self, metrics: Metrics):
+        self.metrics = metrics
+        node = self.local.ip
+        # the managers of election groups share the histograms, their state is
+        # exported in aggregate by the multiplexer
+        labels = {'node': node}
+
+        self._arrivals: Dict[Host, Histogram] = {}
+        self._lastSeen: Dict[Host, float] = {}
+        self._electionStarted: Optional[float] = None
+        self._failoverStarted: Optional[float] = None
+        self._quorumSince: Optional[float] = None
+        self._quorumSeconds = 0.0
+
+        self._elections = metrics.histogram(
+            "pyquorum_election_duration_seconds",
+            "Time from the start of an election until quorum was reached", **labels)
+        self._failovers = metrics.histogram(
+            "pyquorum_failover_duration_seconds",
+            "Time from the failure of the master until quorum was reached again", **labels)
+
+        if self.liveness is not None:
+            return
+
+        metrics.gauge("pyquorum_quorum", "Whether the node has quorum",
+                      lambda: int(self.quorum), **labels)
+        metrics.gauge("pyquorum_master", "Whether the node is the master",
+                      lambda: int(self.quorum and self.master == self.local), **labels)
+        metrics.gauge("pyquorum_alive_hosts", "Number of reachable hosts",
+                      lambda: self._alive, **labels)
+        metrics.gauge("pyquorum_quorum_seconds", "Total time the node had quorum",
+                      self.quorumSeconds, **labels)
+
+    def quorumSeconds(self) -> float:
+        """Total time this node spent in quorum
+
+        Returns:
+            float: seconds in quorum
+        """
+        if self._quorumSince is None:
+            return self._quorumSeconds
+
+        return self._quorumSeconds + self.clock() - self._quorumSince
+
+    def _recordArrival(self, host: Host):
+        now = self.clock()
+        last = self._lastSeen.get(host)
+        self._lastSeen[host] = now
+
+        if last is None:
+            return
+
+        histogram = self._arrivals.get(host)
+        if histogram is None:
+            histogram = self._arrivals[host] = self.metrics.histogram(
+                "pyquorum_heartbeat_interarrival_seconds",
+                "Time between two keepalive messages of a peer", node=self.local.ip, peer=host.ip)
+
+        histogram.observe(now - last)
+
+    def _index(self, host: Host):
+        self._byAddress[(host.ip, host.port)] = host
+        self._byIp[host.ip] = host
+
+        if self.liveness is None and host.status == HostStatus.UP:
+            self.statusChanged(host, HostStatus.DOWN)
+
+        # hosts that rank higher than us win the election
+        self._rerank(host)
+        if self.liveness is None:
+            host.listeners.append(self.statusChanged)
+
+    def addHost(self, host: Host):
+        """Adds a member to the cluster
+
+        Args:
+            host (Host): the new member
+        """
+        with self.lock:
+            _logger.warning("Adding host {}".format(host.ip))
+            self.hosts.append(host)
+            self._index(host)
+            self._membersChanged()
+            self.evaluate()
+
+    def removeHost(self, host: Host):
+        """Removes a member from the cluster
+
+        Args:
+            host (Host): the member to remove
+        """
+        with self.lock:
+            _logger.warning("Removing host {}".format(host.ip))
+            # the reachable host counters are updated by the listener
+            host.status = HostStatus.DOWN
+            if self.liveness is None:
+                host.listeners.remove(self.statusChanged)
+
+            self.hosts.remove(host)
+            del self._byAddress[(host.ip, host.port)]
+            if self._byIp.get(host.ip) is host:
+                del self._byIp[host.ip]
+            self._lower.discard(host)
+            self._ineligible.discard(host)
+            self._placement.pop(host, None)
+            self._lastSeen.pop(host, None)
+            self.votes.discard(host)
+            self._preVotes.discard(host)
+            if self.heartbeats is not None:
+                self.heartbeats.peers.pop(host, None)
+
+            self._membersChanged()
+
+            if self.master is host:
+                self.down(host)
+            else:
+                self.evaluate()
+
+    def _membersChanged(self):
+        self._majority = math.floor((len(self.hosts) + 1) / 2)
+        self.ranking = sorted(self.hosts, key=lambda h: self.addressKey(h.ip))
+        self._persisted = None
+
+        # the state file is laid out for the members
+        if self.stateFile is not None:
+            self.stateFile.close()
+            self.stateFile = StateFile(self.stateFile.path, [
+                "{}:{}".format(host.ip, host.port) for host in self.ranking])
+
+    def setJoint(self, configurations: Optional[List[Tuple[Set[Host], bool]]]):
+        """Requires a majority in each of the configurations while the members
+        change
+
+        Args:
+            configurations (Optional[List[Tuple[Set[Host], bool]]]): peers of the old and the new members and whether this node is a member of each, None once the change is complete
+        """
+        with self.lock:
+            self._joint = configurations
+            self.evaluate()
+
+    def hasMajority(self, agreeing: Optional[Set[Host]] = None) -> bool:
+        """Whether this node and the agreeing hosts form a majority
+
+        Args:
+            agreeing (Set[Host], optional): hosts that agree, the reachable hosts if omitted
+
+        Returns:
+            bool: Returns true if there is a majority in every configuration
+        """
+        if self._joint is None:
+            count = self.aliveCount() if agreeing is None else len(agreeing)
+            return count + 1 > self._majority
+
+        for members, local in self._joint:
+            count = sum(1 for host in members
+                        if (host.status == HostStatus.UP if agreeing is None else host in agreeing))
+            if count + int(local) <= (len(members) + int(local)) // 2:
+                return False
+
+        return True
+
+    def statusChanged(self, host: Host, old: HostStatus):
+        """Keeps the reachable host counters up to date
+
+        Args:
+            host (Host): Host whose status changed
+            old (HostStatus): previous status of the host
+        """
+        delta = 1 if host.status == HostStatus.UP else -1
+
+        self._persisted = None
+        if host in self._lower and host not in self._ineligible:
+            self._aliveLower += delta
+
+        # the liveness of shared hosts is tracked once for all managers
+        if self.liveness is not None:
+            return
+
+        self._alive += delta
+        if host.status == HostStatus.UP:
+            self._arm(host)
+        else:
+            self._polled.discard(host)
+
+    def _arm(self, host: Host, deadline: Optional[float] = None):
+        """Watches the deadline of a host that became reachable
+
+        Args:
+            host (Host): the reachable host
+            deadline (float, optional): deadline of the host. Asks the detector if omitted.
+        """
+        if host in self._armed:
+            return
+
+        if deadline is None:
+            deadline = host.detector.deadline()
+        if deadline is None:
+            self._polled.add(host)
+            return
+
+        self._polled.discard(host)
+        self._armed.add(host)
+        self._seq += 1
+        heapq.heappush(self._deadlines, (deadline, self._seq, host))
+        self._armExpiry()
+
+    def _armExpiry(self):
+        """Schedules the expiry at the earliest deadline, so a failure is
+        noticed at its deadline instead of the next tick
+        """
+        if self.scheduler is None or self.membership is not None or not self._deadlines:
+            return
+
+        when, _, host = self._deadlines[0]
+        if self._expiryAt is not None and self._expiryAt <= when:
+            return
+
+        self._expiryAt = when
+        self.scheduler.callLater(max(0.0, when - host.detector.clock()),
+                                 lambda: self._expired(when))
+
+    def _expired(self, when: float):
+        with self.lock:
+            if self._expiryAt == when:
+                self._expiryAt = None
+
+            self.expire()
+
+    def expire(self):
+        """Marks the hosts down whose deadline passed. Hosts whose keepalives
+        moved the deadline are watched until the new deadline.
+        """
+        with self.lock:
+            while self._deadlines:
+                when, _, host = self._deadlines[0]
+                if when > host.detector.clock():
+                    break
+
+                heapq.heappop(self._deadlines)
+                self._armed.discard(host)
+
+                # removed hosts and hosts that went down are armed again once they are up
+                if host.status == HostStatus.DOWN or self._byAddress.get((host.ip, host.port)) is not host:
+                    continue
+
+                deadline = host.detector.deadline()
+                if deadline is None or deadline > host.detector.clock():
+                    self._arm(host, deadline)
+                    continue
+
+                host.status = HostStatus.DOWN
+                self.down(host)
+
+            self._armExpiry()
 
     def ping(self, host: Host, data):
         """Handles ping messages from other nodes
@@ -44,28 +380,336 @@ class QuorumManager(object):
             host (Host): Host which sent this message
             data ([type]): Payload of the ping message
         """
-        _logger.debug("Received ping from {}".format(host.ip))
+        with self.lock:
+            self.keepalive(host)
+            self.receive(host, data)
 
-        if host.status == HostStatus.DOWN:
-            _logger.warning("Host {} back online".format(host.ip))
+    def keepalive(self, host: Host):
+        """Accounts for a keepalive message of another node
 
-        host.unpunish()
+        Args:
+            host (Host): Host which sent the keepalive
+        """
+        with self.lock:
+            _logger.debug("Received ping from {}".format(host.ip))
+            self._recordArrival(host)
 
-        if not self.quorum and data["master"] and data["master"] != self.local.ip:
-            _logger.warning("Trying to join master {}".format(data["master"]))
-            self.master = self.getHost(data["master"])
+            if host.status == HostStatus.DOWN:
+                _logger.warning("Host {} back online".format(host.ip))
 
-            if data["quorum"]:
-                _logger.warning("Elected {} as master".format(data["master"]))
-                self.haveQuorum()
+            host.unpunish()
+
+            # the detector may know the deadline of the host now
+            if host in self._polled:
+                self._arm(host)
+
+    def stateRequest(self, host: Host, data):
+        """Handles the keepalive of a node that doesn't reach any other node
+        yet and answers with our state, so a node that just started knows the
+        master within one round trip
+
+        Args:
+            host (Host): Host which sent this message
+            data ([type]): Payload of the state request
+        """
+        with self.lock:
+            self.ping(host, data)
+            self.client.send(host, Message(MessageType.PING, self.state()))
+
+    def receive(self, host: Host, data):
+        """Applies the election state of another node whose keepalive was
+        already accounted for
+
+        Args:
+            host (Host): Host which sent this state
+            data ([type]): Payload of the ping message
+        """
+        with self.lock:
+            self._setEligible(host, data.get("eligible", True))
+            self._setPlacement(host, data.get("priority", 0), data.get("load"))
+
+            # nodes that don't send a term follow the current one
+            term = data.get("term", self.term)
+            if term < self.term:
+                # stale election state of a node that missed the last election,
+                # it catches up once it receives our term
+                self.votes.discard(host)
+                self.evaluate()
+                return
+
+            if term > self.term:
+                self._adoptTerm(term, data["master"])
+
+            if self.quorum and host is self.master and data["master"] != host.ip:
+                _logger.warning("Master {} stepped down".format(host.ip))
+                self._failoverStarted = self.clock()
+                self.lostQuorum()
 
-        if data["master"] == self.local.ip:
-            self.votes.add(host)
+            # peers that did not notice the failure of their master yet must not
+            # pull us back to a master we consider down
+            if not self.quorum and data["master"] and data["master"] != self.local.ip \
+                    and self.getHost(data["master"]).status == HostStatus.UP \
+                    and self.getHost(data["master"]) not in self._ineligible:
+                _logger.warning("Trying to join master {}".format(data["master"]))
+                self.master = self.getHost(data["master"])
+
+                if data["quorum"]:
+                    _logger.warning("Elected {} as master".format(data["master"]))
+                    self.haveQuorum()
+
+            if data["master"] == self.local.ip:
+                self.votes.add(host)
+            else:
+                try:
+                    self.votes.remove(host)
+                except KeyError:
+                    pass
+
+            self.evaluate()
+
+    def _adoptTerm(self, term: int, master: Optional[str]):
+        """Moves to a newer term. A master or candidate of an older term steps
+        back unless the newer term is led by the same master.
+
+        Args:
+            term (int): the newer term
+            master (Optional[str]): master of the newer term
+        """
+        _logger.info("Moving from term {} to term {}".format(self.term, term))
+        self.term = term
+        self._preVoteTerm = None
+
+        current = self.master.ip if self.master else None
+        if current is not None and current != master:
+            if self.quorum:
+                self._failoverStarted = self.clock()
+                self.lostQuorum()
+            else:
+                self.master = None
+                self.votes = set()
+
+    def preVoteRequest(self, host: Host, data):
+        """Answers whether this node would vote for a candidate. The vote is
+        only granted for a newer term and if this node doesn't follow a
+        reachable master, so a node that rejoins or lost a few keepalives
+        can't disrupt a working master.
+
+        Args:
+            host (Host): the candidate
+            data ([type]): Payload of the pre-vote request
+        """
+        with self.lock:
+            healthy = self.quorum and self.master is not None and self.master is not host \
+                and (self.master is self.local or self.master.status == HostStatus.UP)
+            granted = data["term"] > self.term and not healthy and host not in self._ineligible
+
+            self.client.send(host, Message(MessageType.PREVOTE, {
+                'term': data["term"], 'current': self.term, 'granted': granted}))
+
+    def preVoteResponse(self, host: Host, data):
+        """Counts the pre-vote of another node
+
+        Args:
+            host (Host): Host which answered
+            data ([type]): Payload of the pre-vote
+        """
+        with self.lock:
+            if data["current"] > self.term:
+                self._adoptTerm(data["current"], None if self.master is None else self.master.ip)
+
+            if data["granted"] and data["term"] == self._preVoteTerm:
+                self._preVotes.add(host)
+                self.evaluate()
+
+    def _setEligible(self, host: Host, eligible: bool):
+        if eligible == (host not in self._ineligible):
+            return
+
+        if eligible:
+            self._ineligible.discard(host)
         else:
-            try:
-                self.votes.remove(host)
-            except KeyError:
-                pass
+            _logger.warning("Host {} resigned".format(host.ip))
+            self._ineligible.add(host)
+
+        if host in self._lower and host.status == HostStatus.UP:
+            self._aliveLower += 1 if eligible else -1
+
+    def setPlacement(self, priority: int, load: Optional[float]):
+        """Sets the priority and load of this node
+
+        Args:
+            priority (int): priority of this node, higher priorities win the election
+            load (Optional[float]): load of this node, lower loads win among equal priorities
+        """
+        with self.lock:
+            if (priority, load) == (self.priority, self.load):
+                return
+
+            self.priority = priority
+            self.load = load
+
+            for host in self.hosts:
+                self._rerank(host)
+
+    def _setPlacement(self, host: Host, priority: int, load: Optional[float]):
+        if self._placement.get(host, (0, None)) == (priority, load):
+            return
+
+        self._placement[host] = (priority, load)
+        self._rerank(host)
+
+    def _rank(self, priority: int, load: Optional[float], ip: str) -> Tuple:
+        # the load is compared in steps, small changes don't move the leadership
+        step = int(load // self.loadStep) if load is not None and self.loadStep > 0 else 0
+
+        return (-priority, step, self.addressKey(ip))
+
+    def _hostRank(self, host: Host) -> Tuple:
+        priority, load = self._placement.get(host, (0, None))
+
+        return self._rank(priority, load, host.ip)
+
+    def _localRank(self) -> Tuple:
+        return self._rank(self.priority, self.load, self.local.ip)
+
+    def outranks(self, host: Host) -> bool:
+        """Whether a host ranks higher than this node, so this node doesn't
+        propose itself while the host is reachable
+
+        Args:
+            host (Host): a member
+
+        Returns:
+            bool: Returns true if the host ranks higher than this node
+        """
+        return host in self._lower
+
+    def _rerank(self, host: Host):
+        """Keeps the set of hosts that rank higher than this node and the
+        counter of the reachable ones up to date
+
+        Args:
+            host (Host): Host whose rank or the rank of this node changed
+        """
+        higher = self._hostRank(host) < self._localRank()
+        if higher == (host in self._lower):
+            return
+
+        if higher:
+            self._lower.add(host)
+        else:
+            self._lower.discard(host)
+
+        if host.status == HostStatus.UP and host not in self._ineligible:
+            self._aliveLower += 1 if higher else -1
+
+    def _outranked(self) -> bool:
+        # a reachable and eligible node with a higher priority takes over,
+        # a lower load alone doesn't move a working master
+        # hosts without a placement have the default priority
+        return any(host.status == HostStatus.UP and host not in self._ineligible
+                   and priority > self.priority
+                   for host, (priority, _) in self._placement.items())
+
+    def state(self) -> dict:
+        """Election state that is sent to the other nodes
+
+        Returns:
+            dict: payload of the ping message
+        """
+        data = {'master': self.master.ip if self.master else None, 'quorum': self.quorum,
+                'term': self.term}
+        if not self.eligible:
+            data['eligible'] = False
+        if self.priority or self.load is not None:
+            data['priority'] = self.priority
+            data['load'] = self.load
+
+        return data
+
+    def resign(self):
+        """Gives up the leadership and stops this node from being elected
+        until it is reinstated, so another node can take over
+        """
+        with self.lock:
+            _logger.warning("Resigning from the election")
+            self.eligible = False
+
+            if self.master is self.local:
+                self.lostQuorum()
+
+            if self.client is not None and self.membership is None:
+                self._announce()
+
+            self._publish()
+
+    def handoff(self):
+        """Leaves the cluster on a planned shutdown. The application is stopped
+        and the other nodes are told right away, so the next ranked node takes
+        over without waiting for the failure detector.
+        """
+        with self.lock:
+            self.eligible = False
+            successor = self.successor() if self.master is self.local else None
+
+            if self.master is self.local:
+                _logger.warning("Handing off leadership to {}".format(
+                    successor.ip if successor is not None else None))
+                self.lostQuorum()
+
+            if self.client is not None and self.legacy:
+                # nodes of the previous version only learn that we stepped down
+                self.client.sendMany(self.client.encode(
+                    Message(MessageType.PING, self.state())), self.ranking)
+            elif self.client is not None:
+                self.client.sendMany(self.client.encode(Message(MessageType.RESIGN, {
+                    'term': self.term,
+                    'successor': successor.ip if successor is not None else None})),
+                    self.ranking)
+
+            self._publish()
+
+    def successor(self) -> Optional[Host]:
+        """The node that is elected once this node leaves
+
+        Returns:
+            Optional[Host]: the reachable and eligible host with the highest rank
+        """
+        candidates = [host for host in self.ranking
+                      if host.status == HostStatus.UP and host not in self._ineligible]
+
+        return min(candidates, key=self._hostRank, default=None)
+
+    def resignation(self, host: Host, data):
+        """Handles another node leaving the cluster. It is considered down
+        right away and the successor it nominated starts the election.
+
+        Args:
+            host (Host): Host which leaves the cluster
+            data ([type]): Payload of the resign message
+        """
+        with self.lock:
+            _logger.warning("Host {} is leaving the cluster".format(host.ip))
+            self._setEligible(host, False)
+
+            if data["successor"] == self.local.ip and data["term"] >= self.term:
+                _logger.warning("Nominated as successor of {}".format(host.ip))
+                # ask for pre-votes again instead of waiting for the next tick
+                self._preVoteTerm = None
+
+            if host.status == HostStatus.UP:
+                host.status = HostStatus.DOWN
+                self.down(host)
+            else:
+                self.evaluate()
+
+    def reinstate(self):
+        """Allows this node to be elected again after it resigned
+        """
+        with self.lock:
+            _logger.warning("Rejoining the election")
+            self.eligible = True
+            self.evaluate()
 
     def down(self, host: Host):
         """Called when a node leaves the cluster. Ensures that the majority of
@@ -74,26 +718,46 @@ class QuorumManager(object):
         Args:
             host (Host): Host that left the cluster
         """
-        _logger.warning("Host {} is down".format(host.ip))
+        with self.lock:
+            _logger.warning("Host {} is down".format(host.ip))
 
-        if self.master == host:
-            self.lostQuorum()
+            if self.master == host:
+                self._failoverStarted = self.clock()
+                self.lostQuorum()
+
+            self.evaluate()
 
     def sendKeepAlives(self):
         """Sends keepalive messages to all other nodes
         """
-        for host in self.hosts:
-            message = Message(MessageType.PING, {
-                              'master': self.master.ip if self.master else None, 'quorum': self.quorum})
+        with self.lock:
+            if self.membership is not None:
+                self.membership.tick()
+                return
 
-            if not self.client.send(host, message):
-                host.punish()
+            self._announce()
+
+    def _announce(self):
+        # the payload is the same for every host so it is only encoded once.
+        # A node that doesn't reach any other node yet, such as a node that
+        # just started, asks the others to answer right away.
+        if self.aliveCount() == 0 and not self.legacy:
+            message = Message(MessageType.STATE_REQUEST, self.state())
+        elif self.heartbeats is not None:
+            message = self.heartbeats.next(self.state())
+        else:
+            message = Message(MessageType.PING, self.state())
 
-    def getHost(self, ip: str) -> Host:
+        for host in self.client.sendMany(self.client.encode(message), self.ranking):
+            if host.punish():
+                self.down(host)
+
+    def getHost(self, ip: str, port: Optional[int] = None) -> Host:
         """Get a specific host's object by ip address
 
         Args:
             ip (str): IP address of the host
+            port (int, optional): Port of the host. Matches any port if omitted.
 
         Raises:
             Exception: Raised if the host does not belong to the cluster
@@ -101,11 +765,12 @@ class QuorumManager(object):
         Returns:
             Host: Returns the host object
         """
-        for host in self.hosts:
-            if host.ip == ip:
-                return host
+        host = self._byIp.get(ip) if port is None else self._byAddress.get((ip, port))
+
+        if host is None:
+            raise Exception("Host not found")
 
-        raise Exception("Host not found")
+        return host
 
     def aliveHosts(self) -> List[Host]:
         """Filter hosts which are reachable
@@ -115,44 +780,155 @@ class QuorumManager(object):
         """
         return [host for host in self.hosts if host.status == HostStatus.UP]
 
+    def aliveCount(self) -> int:
+        """Number of reachable hosts
+
+        Returns:
+            int: Returns the number of reachable hosts
+        """
+        if self.liveness is not None:
+            return self.liveness.aliveCount()
+
+        return self._alive
+
     def update(self):
         """Monitors that keepalive messages are received within a specific time frame
         and starts the master election process if quorum is lost
         """
-        for host in self.hosts:
-            _logger.info(host)
+        # sampled without holding the lock as a probe command may take a while
+        load = self.probe.sample() if self.probe is not None else self.load
 
-            # Punish host regularly.
-            # keep alive messages will reset the penalty.
-            if host.punish():
-                self.down(host)
+        with self.lock:
+            self.setPlacement(self.priority, load)
 
-        # more than half of the nodes are reachable
-        if len(self.aliveHosts()) + 1 > math.floor((len(self.hosts) + 1) / 2):
-            if not self.quorum:
-                _logger.warning("Trying to elect new master")
+            if self.quorum and self.master is self.local and self._outranked():
+                _logger.warning("Stepping down for a node with a higher priority")
+                self.lostQuorum()
 
-                lowest = True
+            # the membership protocol detects failures itself
+            if self.membership is None:
+                self.expire()
 
-                # find a reachable node with the lowest ip address
-                for host in self.aliveHosts():
-                    if QuorumManager.compareIp(host.ip, self.local.ip):
-                        lowest = False
-                        break
+                # keep alive messages will reset the penalty.
+                for host in list(self._polled):
+                    if host.punish():
+                        self.down(host)
 
-                # we should be master
-                if lowest:
-                    self.master = self.local
+            # a pre-vote that didn't succeed is asked for again
+            self._preVoteTerm = None
+            self.evaluate()
 
-                # i am the proposed and I have more than half of the votes to be master
-                if len(self.votes) + 1 > math.floor((len(self.hosts) + 1) / 2):
-                    _logger.warning("Elected myself as new master with {} of {} votes".format(
-                        len(self.votes) + 1, len(self.hosts) + 1))
-                    self.haveQuorum()
+            if self.reconfig is not None:
+                self.reconfig.tick()
+
+            if self.stateFile is not None:
+                self.stateFile.touch()
+
+    def evaluate(self):
+        """Runs the master election. Called whenever the reachable hosts or the
+        votes change, so quorum is reached without waiting for the next tick.
+        """
+        with self.lock:
+            advertised = (self.master, self.quorum)
+
+            # more than half of the nodes are reachable
+            if self.hasMajority():
+                if not self.quorum:
+                    if self._electionStarted is None:
+                        _logger.warning("Trying to elect new master")
+                        self._electionStarted = self.clock()
+
+                    # no reachable node has a lower ip address, we should be master
+                    if self._aliveLower == 0 and self.eligible and self.master is not self.local:
+                        self._campaign()
+
+                    # i am the proposed and I have more than half of the votes to be master
+                    if self.eligible and self.master is self.local \
+                            and self.hasMajority(self.votes):
+                        _logger.warning("Elected myself as new master with {} of {} votes".format(
+                            len(self.votes) + 1, len(self.hosts) + 1))
+                        self.haveQuorum()
+            else:
+                if self.quorum:
+                    # less than half of the nodes are online but we are still master
+                    self.lostQuorum()
+
+            # tell the other nodes right away instead of at the next keepalive
+            if (self.master, self.quorum) != advertised and self.client is not None \
+                    and self.membership is None:
+                self._announce()
+
+            self._publish()
+
+    def _campaign(self):
+        """Becomes candidate for the next term once a majority granted the
+        pre-vote
+        """
+        if self._preVoteTerm is None:
+            self._preVoteTerm = self.term + 1
+            self._preVotes = set()
+
+            if self.preVote and not self.legacy and self.hosts:
+                self.client.sendMany(self.client.encode(
+                    Message(MessageType.PREVOTE_REQUEST, {'term': self._preVoteTerm})), self.ranking)
+
+        if self.preVote and not self.legacy and not self.hasMajority(self._preVotes):
+            return
+
+        self.term = self._preVoteTerm
+        self._preVoteTerm = None
+        self.master = self.local
+        _logger.warning("Proposing myself as master for term {}".format(self.term))
+
+    def _publish(self):
+        """Writes the election state to the state file and the status page if
+        it changed
+        """
+        persisted = (self.master, self.quorum, self.term)
+        if persisted == self._persisted:
+            return
+
+        self._persisted = persisted
+
+        if self.statusPage is not None:
+            self.statusPage.write(self.term, self.master.ip if self.master else None,
+                                  self.quorum, self.quorum and self.master is self.local)
+
+        if self.stateFile is None:
+            return
+
+        if self.master is None:
+            master = NO_MASTER
+        elif self.master is self.local:
+            master = LOCAL
         else:
-            if self.quorum:
-                # less than half of the nodes are online but we are still master
-                self.lostQuorum()
+            master = self.ranking.index(self.master)
+
+        self.stateFile.write(NodeState(self.term, master, self.quorum,
+                                       [host.status == HostStatus.UP for host in self.ranking]))
+
+    def restore(self, state: NodeState):
+        """Restores the state of a previous run so a restarted node rejoins
+        its master without a new election. A node that was master starts a
+        new election as its application is gone.
+
+        Args:
+            state (NodeState): state read from the state file
+        """
+        with self.lock:
+            self.term = state.term
+
+            for host, up in zip(self.ranking, state.peers):
+                if up:
+                    host.unpunish()
+
+            if state.quorum and state.master < len(self.ranking) \
+                    and self.ranking[state.master].status == HostStatus.UP:
+                self.master = self.ranking[state.master]
+                _logger.warning("Rejoining master {}".format(self.master.ip))
+                self.haveQuorum()
+
+            self.evaluate()
 
     @staticmethod
     def compareIp(ip: str, ip2: str) -> bool:
@@ -165,17 +941,76 @@ class QuorumManager(object):
         Returns:
             bool: Returns true if the first ip is lower than the second
         """
-        return list(map(int, ip.split('.'))) < list(map(int, ip2.split('.')))
+        return QuorumManager.ipKey(ip) < QuorumManager.ipKey(ip2)
+
+    def addressKey(self, ip: str) -> Tuple:
+        """Sort key of an address among the hosts of equal priority and load
+
+        Args:
+            ip (str): IP address
+
+        Returns:
+            Tuple: the key of the IP address or, with a seed, its rendezvous hash
+        """
+        if self.seed is None:
+            return QuorumManager.ipKey(ip)
+
+        # the same on all nodes, unlike the randomized hash() of strings
+        digest = hashlib.sha1("{}/{}".format(self.seed, ip).encode("utf-8")).digest()
+        return (int.from_bytes(digest[:8], "big"), QuorumManager.ipKey(ip))
+
+    @staticmethod
+    def ipKey(ip: str) -> Tuple:
+        """Sort key of an IP address used to rank hosts in the election
+
+        Args:
+            ip (str): IP address
+
+        Returns:
+            Tuple: key that orders IPv4 addresses numerically. Other names are ranked last.
+        """
+        try:
+            return tuple(map(int, ip.split('.')))
+        except ValueError:
+            return (256, ip)
 
     def haveQuorum(self):
         """Once consensus is achieved the application will be run on the master
         """
         self.quorum = True
         _logger.warning("Have Quorum")
+
+        now = self.clock()
+        if self._electionStarted is not None:
+            self._elections.observe(now - self._electionStarted)
+            self._electionStarted = None
+        if self._failoverStarted is not None:
+            self._failovers.observe(now - self._failoverStarted)
+            self._failoverStarted = None
+        if self._quorumSince is None:
+            self._quorumSince = now
+
+        self._publish()
+
         if self.master == self.local:
-            if not self.runner.run():
+            if not self.runner.run(self.fencing()):
                 _logger.warning(
                     "Could not run script. Check that it exists at the correct location and is executable")
+        elif self.runner and not self.runner.prepare():
+            _logger.warning("Could not start script in standby")
+
+    def fencing(self) -> Dict[str, str]:
+        """Environment passed to the application of the master. The term is
+        used as fencing token as it grows with every election.
+
+        Returns:
+            Dict[str, str]: environment variables
+        """
+        env = {'PYQUORUM_FENCING_TOKEN': str(self.term), 'PYQUORUM_MASTER': self.local.ip}
+        if self.group is not None:
+            env['PYQUORUM_GROUP'] = self.group
+
+        return env
 
     def lostQuorum(self):
         """When quorum is lost the application will be stopped on the master
@@ -184,5 +1019,13 @@ class QuorumManager(object):
         self.quorum = False
         self.votes = set()
         _logger.warning("Lost Quorum")
+
+        if self._quorumSince is not None:
+            self._quorumSeconds += self.clock() - self._quorumSince
+            self._quorumSince = None
+
+        # readers of the status page learn about it before the application stops
+        self._publish()
+
         if self.runner and self.runner.running:
             self.runner.stop()
@@ -5,6 +5,9 @@ from __future__ import annotations
 from .handler import BaseHandler
 import logging
 from enum import Enum
+import socket
+import struct
+from typing import Callable, Dict, Tuple, Union
 
 import json
 
@@ -15,6 +18,224 @@ class MessageType(Enum):
     """Enum of message types used in communication between nodes
     """
     PING = 1
+    PROBE = 2
+    ACK = 3
+    PROBE_REQ = 4
+    GROUP_PING = 5
+    PREVOTE_REQUEST = 6
+    PREVOTE = 7
+    BEACON = 8
+    DELTA = 9
+    DIGEST = 10
+    SYNC_REQUEST = 11
+    RESIGN = 12
+    STATE_REQUEST = 13
+    CONFIG = 14
+    CONFIG_ACK = 15
+    CONFIG_REQUEST = 16
+
+
+# Binary frame: magic, version, message type. Legacy JSON frames always start
+# with "{" so the magic byte is enough to tell both formats apart.
+MAGIC = 0xA7
+VERSION = 1
+
+_HEADER = struct.Struct("!BBB")
+_PING = struct.Struct("!B4s")
+# election term appended to a PING, older nodes ignore trailing bytes
+_TERM = struct.Struct("!I")
+# priority and load in hundredths appended after the term
+_PLACEMENT = struct.Struct("!hH")
+_NO_LOAD = 0xFFFF
+_MAX_LOAD = 0xFFFE
+
+# GROUP_PING: entry count followed by one (group id, flags, master, term) entry per group
+_GROUP_COUNT = struct.Struct("!H")
+_GROUP_ENTRY = struct.Struct("!I")
+
+_FLAG_QUORUM = 0x01
+_FLAG_MASTER = 0x02
+_FLAG_INELIGIBLE = 0x04
+
+_NO_MASTER = bytes(4)
+
+
+def _packAddress(ip: str) -> bytes:
+    # inet_aton would also accept short forms like "10.1" and turn them into another address
+    try:
+        return socket.inet_pton(socket.AF_INET, ip)
+    except OSError:
+        raise ValueError("{} is not an IPv4 address".format(ip))
+
+
+def _packPing(data) -> bytes:
+    flags = _FLAG_QUORUM if data["quorum"] else 0
+    master = _NO_MASTER
+
+    if data["master"]:
+        flags |= _FLAG_MASTER
+        master = _packAddress(data["master"])
+
+    if not data.get("eligible", True):
+        flags |= _FLAG_INELIGIBLE
+
+    if "priority" in data:
+        return _PING.pack(flags, master) + _TERM.pack(data["term"]) + _packPlacement(data)
+
+    if "term" in data:
+        return _PING.pack(flags, master) + _TERM.pack(data["term"])
+
+    return _PING.pack(flags, master)
+
+
+def _unpackPing(body: memoryview):
+    data = _unpackFlags(body)
+
+    if len(body) >= _PING.size + _TERM.size:
+        data['term'], = _TERM.unpack_from(body, _PING.size)
+
+    if len(body) >= _PING.size + _TERM.size + _PLACEMENT.size:
+        data.update(_unpackPlacement(body, _PING.size + _TERM.size))
+
+    return data
+
+
+def _packPlacement(data) -> bytes:
+    load = data.get("load")
+    # a load probe command may report any value, the wire carries 0 to 655.34
+    load = _NO_LOAD if load is None else min(max(0, int(round(load * 100))), _MAX_LOAD)
+
+    return _PLACEMENT.pack(data["priority"], load)
+
+
+def _unpackPlacement(body: memoryview, offset: int):
+    priority, load = _PLACEMENT.unpack_from(body, offset)
+
+    return {'priority': priority, 'load': None if load == _NO_LOAD else load / 100}
+
+
+def _unpackFlags(body: memoryview):
+    flags, master = _PING.unpack_from(body)
+
+    data = {
+        'master': socket.inet_ntoa(master) if flags & _FLAG_MASTER else None,
+        'quorum': bool(flags & _FLAG_QUORUM)
+    }
+
+    # only present if set, older nodes don't send it
+    if flags & _FLAG_INELIGIBLE:
+        data['eligible'] = False
+
+    return data
+
+
+def _packGroupPing(data) -> bytes:
+    parts = [_GROUP_COUNT.pack(len(data))]
+    for group, ping in data:
+        parts.append(_GROUP_ENTRY.pack(group))
+        # entries have a fixed size, placement is not sent per group
+        parts.append(_packPing({key: ping[key] for key in ("master", "quorum", "eligible")
+                                if key in ping}))
+        parts.append(_TERM.pack(ping.get("term", 0)))
+
+    return b"".join(parts)
+
+
+def _unpackGroupPing(body: memoryview):
+    count, = _GROUP_COUNT.unpack_from(body)
+    size = GROUP_ENTRY_SIZE
+
+    if len(body) < _GROUP_COUNT.size + count * size:
+        raise ValueError("Truncated group ping")
+
+    data = []
+    for offset in range(_GROUP_COUNT.size, _GROUP_COUNT.size + count * size, size):
+        group, = _GROUP_ENTRY.unpack_from(body, offset)
+        data.append((group, _unpackPing(body[offset + _GROUP_ENTRY.size:offset + size])))
+
+    return data
+
+
+# BEACON and SYNC_REQUEST: sequence number of the state. DELTA and DIGEST:
+# sequence number and a mask of the fields that follow
+_SEQ = struct.Struct("!I")
+_MASK = struct.Struct("!B")
+
+_FIELD_FLAGS = 0x01
+_FIELD_TERM = 0x02
+_FIELD_PLACEMENT = 0x04
+
+
+def _packSeq(data) -> bytes:
+    return _SEQ.pack(data["seq"])
+
+
+def _unpackSeq(body: memoryview):
+    seq, = _SEQ.unpack_from(body)
+
+    return {'seq': seq}
+
+
+def _packState(data) -> bytes:
+    mask = (_FIELD_FLAGS if "master" in data else 0) | (_FIELD_TERM if "term" in data else 0) \
+        | (_FIELD_PLACEMENT if "priority" in data else 0)
+    parts = [_SEQ.pack(data["seq"]), _MASK.pack(mask)]
+
+    if mask & _FIELD_FLAGS:
+        parts.append(_packPing({'master': data["master"], 'quorum': data["quorum"],
+                                'eligible': data.get("eligible", True)}))
+    if mask & _FIELD_TERM:
+        parts.append(_TERM.pack(data["term"]))
+    if mask & _FIELD_PLACEMENT:
+        parts.append(_packPlacement(data))
+
+    return b"".join(parts)
+
+
+def _unpackState(body: memoryview):
+    seq, = _SEQ.unpack_from(body)
+    mask, = _MASK.unpack_from(body, _SEQ.size)
+    offset = _SEQ.size + _MASK.size
+
+    data = {'seq': seq}
+    if mask & _FIELD_FLAGS:
+        data.update(_unpackFlags(body[offset:]))
+        offset += _PING.size
+    if mask & _FIELD_TERM:
+        data['term'], = _TERM.unpack_from(body, offset)
+        offset += _TERM.size
+    if mask & _FIELD_PLACEMENT:
+        data.update(_unpackPlacement(body, offset))
+
+    return data
+
+
+# Encoded size of one GROUP_PING entry and of the frame without entries
+GROUP_ENTRY_SIZE = _GROUP_ENTRY.size + _PING.size + _TERM.size
+GROUP_FRAME_OVERHEAD = _HEADER.size + _GROUP_COUNT.size
+
+
+def _packJson(data) -> bytes:
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def _unpackJson(body: memoryview):
+    return json.loads(bytes(body))
+
+
+# Fixed struct layouts for hot path messages. Types without a layout carry
+# their payload as a compact JSON body inside the binary frame.
+_LAYOUTS: Dict[MessageType, Tuple[Callable, Callable]] = {
+    MessageType.PING: (_packPing, _unpackPing),
+    MessageType.STATE_REQUEST: (_packPing, _unpackPing),
+    MessageType.GROUP_PING: (_packGroupPing, _unpackGroupPing),
+    MessageType.BEACON: (_packSeq, _unpackSeq),
+    MessageType.DELTA: (_packState, _unpackState),
+    MessageType.DIGEST: (_packState, _unpackState),
+    MessageType.SYNC_REQUEST: (_packSeq, _unpackSeq),
+}
+
+_TYPES = {t.value: t for t in MessageType}
 
 
 class Message(object):
@@ -34,7 +255,7 @@ class Message(object):
         return json.dumps({'type': self.type.value, 'data': json.dumps(self.data)})
 
     @staticmethod
-    def fromJson(data: str) -> Message:
+    def fromJson(data: Union[str, bytes]) -> Message:
         """Converts a string to a message object
 
         Args:
@@ -46,3 +267,48 @@ class Message(object):
         d = json.loads(data)
 
         return Message(MessageType(d["type"]), json.loads(d["data"]))
+
+    def toBytes(self) -> bytes:
+        """Converts a message to its binary wire representation
+
+        Returns:
+            bytes: versioned binary frame of the message, a json frame if the
+                data doesn't fit the binary layout, such as a master named by a
+                hostname or a field out of the range of the layout
+        """
+        pack, _ = _LAYOUTS.get(self.type, (_packJson, _unpackJson))
+
+        try:
+            body = pack(self.data)
+        except (ValueError, struct.error):
+            return bytes(self.toJson(), "utf-8")
+
+        return _HEADER.pack(MAGIC, VERSION, self.type.value) + body
+
+    @staticmethod
+    def fromBytes(data: Union[str, bytes]) -> Message:
+        """Converts a received frame to a message object. Frames in the legacy
+        json format are detected and decoded as well.
+
+        Args:
+            data (bytes): binary or json representation of the message
+
+        Raises:
+            ValueError: Raised if the frame uses an unsupported version
+
+        Returns:
+            Message: converted message object
+        """
+        if isinstance(data, str) or not data or data[0] != MAGIC:
+            return Message.fromJson(data)
+
+        view = memoryview(data)
+        _, version, t = _HEADER.unpack_from(view)
+
+        if version > VERSION:
+            raise ValueError("Unsupported message version {}".format(version))
+
+        messageType = _TYPES[t]
+        _, unpack = _LAYOUTS.get(messageType, (_packJson, _unpackJson))
+
+        return Message(messageType, unpack(view[_HEADER.size:]))
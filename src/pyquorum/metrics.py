@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import logging
+import math
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+_logger = logging.getLogger(__name__)
+
+# Default histogram buckets in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter(object):
+    """Monotonically increasing counter
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        """Increments the counter
+
+        Args:
+            amount (int, optional): amount to add. Defaults to 1.
+        """
+        self.value += amount
+
+
+class Histogram(object):
+    """Histogram with fixed buckets
+    """
+
+    def __init__(self, buckets: Sequence[float] = BUCKETS):
+        """
+        Args:
+            buckets (Sequence[float], optional): upper bounds of the buckets. Defaults to BUCKETS.
+        """
+        super().__init__()
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        """Records a value
+
+        Args:
+            value (float): the observed value
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Gauge(object):
+    """Value that is read from a callback when the metrics are collected
+    """
+
+    def __init__(self, read: Callable[[], float]):
+        """
+        Args:
+            read (Callable[[], float]): returns the current value
+        """
+        super().__init__()
+        self.read = read
+
+
+def _labels(labels: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    pairs = ['{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+             for k, v in labels]
+    if extra:
+        pairs.append(extra)
+
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics(object):
+    """Registry of metrics that are exported in the Prometheus text format.
+    Collecting is just an attribute increment, the export format is only
+    rendered when the metrics are scraped.
+    """
+
+    def __init__(self):
+        super().__init__()
+        # name -> (type, help, labels -> metric)
+        self.families: Dict[str, Tuple[str, str, Dict[tuple, object]]] = {}
+
+    def _get(self, kind: str, name: str, description: str, labels: dict, factory):
+        family = self.families.get(name)
+        if family is None:
+            family = self.families[name] = (kind, description, {})
+
+        key = tuple(sorted(labels.items()))
+        metric = family[2].get(key)
+        if metric is None:
+            metric = family[2][key] = factory()
+
+        return metric
+
+    def counter(self, name: str, description: str, **labels) -> Counter:
+        """Gets or creates a counter
+
+        Args:
+            name (str): name of the metric
+            description (str): help text of the metric
+
+        Returns:
+            Counter: the counter for the given labels
+        """
+        return self._get("counter", name, description, labels, Counter)
+
+    def histogram(self, name: str, description: str, buckets: Sequence[float] = BUCKETS,
+                  **labels) -> Histogram:
+        """Gets or creates a histogram
+
+        Args:
+            name (str): name of the metric
+            description (str): help text of the metric
+            buckets (Sequence[float], optional): upper bounds of the buckets. Defaults to BUCKETS.
+
+        Returns:
+            Histogram: the histogram for the given labels
+        """
+        return self._get("histogram", name, description, labels, lambda: Histogram(buckets))
+
+    def gauge(self, name: str, description: str, read: Callable[[], float], **labels) -> Gauge:
+        """Registers a gauge, replacing a gauge with the same labels
+
+        Args:
+            name (str): name of the metric
+            description (str): help text of the metric
+            read (Callable[[], float]): returns the current value
+
+        Returns:
+            Gauge: the gauge
+        """
+        gauge = self._get("gauge", name, description, labels, lambda: Gauge(read))
+        gauge.read = read
+
+        return gauge
+
+    def render(self) -> str:
+        """Renders all metrics in the Prometheus text format
+
+        Returns:
+            str: the exposition text
+        """
+        lines: List[str] = []
+
+        for name, (kind, description, metrics) in sorted(self.families.items()):
+            lines.append("# HELP {} {}".format(name, description))
+            lines.append("# TYPE {} {}".format(name, kind))
+
+            for labels, metric in sorted(metrics.items()):
+                if kind == "counter":
+                    lines.append("{}{} {}".format(name, _labels(labels), _number(metric.value)))
+                elif kind == "gauge":
+                    lines.append("{}{} {}".format(name, _labels(labels), _number(metric.read())))
+                else:
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets + (math.inf,), metric.counts):
+                        cumulative += count
+                        lines.append("{}_bucket{} {}".format(
+                            name, _labels(labels, 'le="{}"'.format(_number(bound))), cumulative))
+                    lines.append("{}_sum{} {}".format(name, _labels(labels), _number(metric.sum)))
+                    lines.append("{}_count{} {}".format(name, _labels(labels), metric.count))
+
+        return "\n".join(lines) + "\n"
+
+
+# Registry used by the components unless another one is passed in
+registry = Metrics()
+
+
+class MetricsServer(threading.Thread):
+    """HTTP server that exposes the metrics on /metrics
+    """
+
+    def __init__(self, bind: str, port: int, metrics: Optional[Metrics] = None):
+        """
+        Args:
+            bind (str): IP address to bind to
+            port (int): Port to bind to
+            metrics (Metrics, optional): metrics to export. Defaults to the global registry.
+        """
+        super().__init__(daemon=True)
+
+        exported = metrics if metrics is not None else registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+
+                body = exported.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                _logger.debug(format % args)
+
+        self.httpd = ThreadingHTTPServer((bind, port), Handler)
+        self.httpd.daemon_threads = True
+
+    def run(self):
+        """Run the server
+        """
+        self.httpd.serve_forever()
+
+    def stop(self):
+        """Stops the server
+        """
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+Minimal ctypes shim for the batched datagram syscalls of Linux.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import socket
+import sys
+from typing import Iterator, Sequence, Tuple
+
+
+class _Iovec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p),
+                ("iov_len", ctypes.c_size_t)]
+
+
+class _SockaddrIn(ctypes.Structure):
+    _fields_ = [("sin_family", ctypes.c_ushort),
+                ("sin_port", ctypes.c_ushort),
+                ("sin_addr", ctypes.c_ubyte * 4),
+                ("sin_zero", ctypes.c_ubyte * 8)]
+
+
+class _Msghdr(ctypes.Structure):
+    _fields_ = [("msg_name", ctypes.c_void_p),
+                ("msg_namelen", ctypes.c_uint32),
+                ("msg_iov", ctypes.POINTER(_Iovec)),
+                ("msg_iovlen", ctypes.c_size_t),
+                ("msg_control", ctypes.c_void_p),
+                ("msg_controllen", ctypes.c_size_t),
+                ("msg_flags", ctypes.c_int)]
+
+
+class _Mmsghdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _Msghdr),
+                ("msg_len", ctypes.c_uint)]
+
+
+def _load():
+    if not sys.platform.startswith("linux"):
+        return None
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        libc.sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p,
+                                  ctypes.c_uint, ctypes.c_int]
+        libc.sendmmsg.restype = ctypes.c_int
+        libc.recvmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p,
+                                  ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+        libc.recvmmsg.restype = ctypes.c_int
+    except (OSError, AttributeError):
+        return None
+
+    return libc
+
+
+_libc = _load()
+
+# Maximum number of messages passed to the kernel in a single call
+UIO_MAXIOV = 1024
+
+# Return once at least one message was received
+MSG_WAITFORONE = 0x10000
+MSG_TRUNC = 0x20
+
+SENDMMSG_AVAILABLE = _libc is not None
+RECVMMSG_AVAILABLE = _libc is not None
+
+
+class SendBatch(object):
+    """Pre-built message vector that sends one payload to many IPv4 destinations
+    """
+
+    def __init__(self, addresses: Sequence[Tuple[str, int]]):
+        """
+        Args:
+            addresses (Sequence[Tuple[str, int]]): IPv4 destinations
+
+        Raises:
+            OSError: Raised if a destination is not an IPv4 address
+        """
+        super().__init__()
+
+        n = len(addresses)
+        self.iov = _Iovec()
+        self.names = (_SockaddrIn * n)()
+        self.vector = (_Mmsghdr * n)()
+
+        for i, (ip, port) in enumerate(addresses):
+            name = self.names[i]
+            name.sin_family = socket.AF_INET
+            name.sin_port = socket.htons(port)
+            name.sin_addr[:] = socket.inet_aton(ip)
+
+            hdr = self.vector[i].msg_hdr
+            hdr.msg_name = ctypes.addressof(name)
+            hdr.msg_namelen = ctypes.sizeof(_SockaddrIn)
+            hdr.msg_iov = ctypes.pointer(self.iov)
+            hdr.msg_iovlen = 1
+
+    def __len__(self) -> int:
+        return len(self.vector)
+
+    def send(self, fd: int, payload: bytes, offset: int = 0) -> int:
+        """Sends the payload to the destinations starting at offset
+
+        Args:
+            fd (int): file descriptor of the socket
+            payload (bytes): data to send to every destination
+            offset (int, optional): index of the first destination. Defaults to 0.
+
+        Raises:
+            OSError: Raised if sending to the first destination failed
+
+        Returns:
+            int: number of destinations the payload was sent to
+        """
+        buf = ctypes.create_string_buffer(payload, len(payload))
+        self.iov.iov_base = ctypes.addressof(buf)
+        self.iov.iov_len = len(payload)
+
+        count = min(len(self.vector) - offset, UIO_MAXIOV)
+        sent = _libc.sendmmsg(fd, ctypes.addressof(self.vector) + offset * ctypes.sizeof(_Mmsghdr),
+                              count, 0)
+
+        if sent < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+        return sent
+
+
+class RecvBatch(object):
+    """Pre-allocated message vector that receives several datagrams per call
+    """
+
+    def __init__(self, count: int, size: int):
+        """
+        Args:
+            count (int): maximum number of datagrams received per call
+            size (int): maximum size of a datagram
+        """
+        super().__init__()
+
+        self.size = size
+        self.buffers = (ctypes.c_char * (size * count))()
+        self.iovs = (_Iovec * count)()
+        self.names = (_SockaddrIn * count)()
+        self.vector = (_Mmsghdr * count)()
+        self.received = 0
+
+        base = ctypes.addressof(self.buffers)
+        for i in range(count):
+            self.iovs[i].iov_base = base + i * size
+            self.iovs[i].iov_len = size
+
+            hdr = self.vector[i].msg_hdr
+            hdr.msg_name = ctypes.addressof(self.names[i])
+            hdr.msg_iov = ctypes.pointer(self.iovs[i])
+            hdr.msg_iovlen = 1
+
+    def recv(self, fd: int) -> int:
+        """Blocks until at least one datagram was received and drains the
+        socket up to the size of the vector
+
+        Args:
+            fd (int): file descriptor of the socket
+
+        Raises:
+            OSError: Raised if the syscall failed
+
+        Returns:
+            int: number of datagrams received
+        """
+        for message in self.vector:
+            message.msg_hdr.msg_namelen = ctypes.sizeof(_SockaddrIn)
+            message.msg_hdr.msg_flags = 0
+
+        received = _libc.recvmmsg(fd, ctypes.addressof(self.vector), len(self.vector),
+                                  MSG_WAITFORONE, None)
+
+        if received < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+        self.received = received
+        return received
+
+    def datagrams(self) -> Iterator[Tuple[Tuple[str, int], bytes, bool]]:
+        """Iterates over the datagrams of the last call to recv
+
+        Returns:
+            Iterator[Tuple[Tuple[str, int], bytes, bool]]: sender address, data and
+            whether the datagram was truncated
+        """
+        view = memoryview(self.buffers).cast("B")
+
+        for i in range(self.received):
+            message = self.vector[i]
+            name = self.names[i]
+            offset = i * self.size
+
+            addr = (socket.inet_ntoa(bytes(name.sin_addr)), socket.ntohs(name.sin_port))
+            data = bytes(view[offset:offset + message.msg_len])
+
+            yield addr, data, bool(message.msg_hdr.msg_flags & MSG_TRUNC)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import subprocess
+from typing import Optional
+
+_logger = logging.getLogger(__name__)
+
+METRICS = ("loadavg", "memory", "command")
+
+
+class LoadProbe(object):
+    """Samples the load of this node, which is sent with the keepalives so
+    the least loaded node is elected. Lower values are better.
+    """
+
+    def __init__(self, metric: str = "loadavg", command: Optional[str] = None,
+                 timeout: float = 1.0):
+        """
+        Args:
+            metric (str, optional): loadavg (per cpu), memory (used fraction) or command. Defaults to "loadavg".
+            command (str, optional): shell command that prints the load for the command metric. Defaults to None.
+            timeout (float, optional): seconds the command may take. Defaults to 1.0.
+
+        Raises:
+            ValueError: Raised if the metric is unknown or the command metric has no command
+        """
+        super().__init__()
+
+        if metric not in METRICS:
+            raise ValueError("Unknown load metric {}".format(metric))
+        if metric == "command" and not command:
+            raise ValueError("The command load metric requires a command")
+
+        self.metric = metric
+        self.command = command
+        self.timeout = timeout
+
+    def sample(self) -> Optional[float]:
+        """Samples the current load
+
+        Returns:
+            Optional[float]: the load or None if it could not be sampled
+        """
+        try:
+            return getattr(self, "_" + self.metric)()
+        except (OSError, ValueError, IndexError, KeyError, subprocess.SubprocessError) as e:
+            _logger.warning("Could not sample the {} load: {}".format(self.metric, e))
+            return None
+
+    @staticmethod
+    def _loadavg() -> float:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+
+    @staticmethod
+    def _memory() -> float:
+        info = {}
+        with open("/proc/meminfo") as f:
+            for line in f:
+                key, value = line.split(":", 1)
+                info[key] = int(value.split()[0])
+
+        return 1.0 - info["MemAvailable"] / info["MemTotal"]
+
+    def _command(self) -> float:
+        result = subprocess.run(self.command, shell=True, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, timeout=self.timeout, check=True)
+
+        return float(result.stdout.split()[0])
@@ -2,37 +2,66 @@
 
 from .handler import BaseHandler
 import logging
-
-import json
+from typing import Optional
 
 from .manager import QuorumManager
 from .message import Message, MessageType
+from .metrics import Metrics, registry
 
 _logger = logging.getLogger(__name__)
 
+_HEARTBEATS = (MessageType.BEACON, MessageType.DELTA, MessageType.DIGEST,
+               MessageType.SYNC_REQUEST)
+_CONFIG = (MessageType.CONFIG, MessageType.CONFIG_ACK, MessageType.CONFIG_REQUEST)
+
 
 class MessageReceiver(BaseHandler):
     """Handles incoming messages
     """
 
-    def __init__(self, manager: QuorumManager):
+    def __init__(self, manager: QuorumManager, metrics: Optional[Metrics] = None):
         super().__init__()
 
         self.manager = manager
+        metrics = metrics if metrics is not None else registry
+        self.decodeErrors = metrics.counter(
+            "pyquorum_decode_errors_total", "Received packets that could not be decoded")
 
-    def handle(self, ip: str, data: str):
+    def handle(self, ip: str, data: bytes):
         """Receives incoming messages
 
         Args:
             ip (str): IP address from which this message was received
-            data (str): The data that was received
+            data (bytes): The data that was received
         """
-        message = Message.fromJson(data)
+        try:
+            message = Message.fromBytes(data)
+        except Exception:
+            self.decodeErrors.inc()
+            _logger.error("Could not decode message from {}".format(ip))
+            return
 
         try:
             host = self.manager.getHost(ip)
 
-            if message.type == MessageType.PING:
-                self.manager.ping(host, message.data)
+            with self.manager.lock:
+                if message.type == MessageType.PING:
+                    self.manager.ping(host, message.data)
+                elif message.type == MessageType.STATE_REQUEST:
+                    self.manager.stateRequest(host, message.data)
+                elif message.type == MessageType.PREVOTE_REQUEST:
+                    self.manager.preVoteRequest(host, message.data)
+                elif message.type == MessageType.PREVOTE:
+                    self.manager.preVoteResponse(host, message.data)
+                elif message.type == MessageType.RESIGN:
+                    self.manager.resignation(host, message.data)
+                elif message.type in _HEARTBEATS:
+                    if self.manager.heartbeats is not None:
+                        self.manager.heartbeats.handle(host, message)
+                elif message.type in _CONFIG:
+                    if self.manager.reconfig is not None:
+                        self.manager.reconfig.handle(host, message)
+                elif self.manager.membership is not None:
+                    self.manager.membership.handle(host, message)
         except Exception:
             _logger.error("Could not handle message from {}".format(ip))
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .host import Host, HostStatus
+from .message import Message, MessageType
+
+_logger = logging.getLogger(__name__)
+
+
+def address(host: Host) -> str:
+    """Address of a member as used in the member lists
+
+    Args:
+        host (Host): the member
+
+    Returns:
+        str: "ip:port" of the member
+    """
+    return "{}:{}".format(host.ip, host.port)
+
+
+class Reconfiguration(object):
+    """Changes the members of a running cluster through the master.
+
+    A change moves the cluster through a joint configuration of the old and
+    the new members, in which the election and the quorum need a majority of
+    both (joint consensus). The master sends the joint configuration to all
+    nodes and, once a majority of the old and of the new members acknowledged
+    it, the final configuration with only the new members. Nodes that are no
+    longer members stop taking part in the election.
+
+    Every configuration is identified by the term of the master that proposed
+    it and a version that is raised with every step, and a node always adopts
+    the newer one. Its acknowledgement carries its own configuration, so a new
+    master that missed a change learns it from its followers and completes it.
+    """
+
+    def __init__(self, manager, hostFactory: Callable[[str, int], Host], retransmits: int = 3):
+        """
+        Args:
+            manager (QuorumManager): manager whose members are changed
+            hostFactory (Callable[[str, int], Host]): creates the host of a new member from its ip and port
+            retransmits (int, optional): times the final configuration is sent to removed members. Defaults to 3.
+        """
+        super().__init__()
+
+        self.manager = manager
+        self.hostFactory = hostFactory
+        self.retransmits = retransmits
+
+        # term of the master that proposed the configuration and its version
+        self.term = 0
+        self.version = 0
+        self.members = sorted([address(manager.local)] + [address(host) for host in manager.hosts])
+        # members before the change while the joint configuration is in effect
+        self.old: Optional[List[str]] = None
+
+        self._acks: Dict[Host, Tuple[int, int]] = {}
+        self._departed: Dict[Host, int] = {}
+
+    def key(self) -> Tuple[int, int]:
+        """Identifies the configuration, newer configurations have a higher key
+
+        Returns:
+            Tuple[int, int]: term and version
+        """
+        return (self.term, self.version)
+
+    def status(self) -> dict:
+        """Current configuration
+
+        Returns:
+            dict: version, members, old members during a change and the master
+        """
+        with self.manager.lock:
+            master = self.manager.master
+            return {'ok': True, 'version': self.version, 'members': self.members,
+                    'old': self.old, 'master': master.ip if master is not None else None}
+
+    def change(self, add: Optional[List[str]] = None, remove: Optional[List[str]] = None) -> dict:
+        """Adds and removes members. The change is proposed by the master,
+        other nodes forward it to their master.
+
+        Args:
+            add (List[str], optional): "ip" or "ip:port" of the members to add
+            remove (List[str], optional): "ip" or "ip:port" of the members to remove
+
+        Returns:
+            dict: outcome of the change
+        """
+        add = [self.normalize(member) for member in add or []]
+        remove = [self.normalize(member) for member in remove or []]
+
+        with self.manager.lock:
+            if self._leading():
+                return self.propose(add, remove)
+
+            master = self.manager.master
+            if master is None or not self.manager.quorum:
+                return {'ok': False, 'error': "There is no master to change the members"}
+
+            _logger.info("Forwarding membership change to {}".format(master.ip))
+            self.manager.client.send(master, Message(MessageType.CONFIG_REQUEST,
+                                                     {'add': add, 'remove': remove}))
+
+            return {'ok': True, 'forwarded': master.ip}
+
+    def propose(self, add: List[str], remove: List[str]) -> dict:
+        """Enters the joint configuration of a change on the master
+
+        Args:
+            add (List[str]): "ip:port" of the members to add
+            remove (List[str]): "ip:port" of the members to remove
+
+        Returns:
+            dict: outcome of the change
+        """
+        with self.manager.lock:
+            if self.old is not None:
+                return {'ok': False, 'error': "A membership change is in progress"}
+            if address(self.manager.local) in remove:
+                return {'ok': False,
+                        'error': "The master can't remove itself, hand the leadership off first"}
+
+            members = sorted((set(self.members) - set(remove)) | set(add))
+            if members != self.members:
+                _logger.warning("Changing members from {} to {}".format(
+                    ", ".join(self.members), ", ".join(members)))
+                self._apply(max(self.term, self.manager.term), self.version + 1,
+                            members, self.members)
+                self._send(self.manager.hosts)
+                self._advance()
+
+            return self.status()
+
+    def handle(self, host: Host, message: Message):
+        """Handles the configuration messages of another node
+
+        Args:
+            host (Host): Host which sent the message
+            message (Message): CONFIG, CONFIG_ACK or CONFIG_REQUEST
+        """
+        data = message.data
+
+        if message.type == MessageType.CONFIG_REQUEST:
+            if not self._leading():
+                _logger.warning("Ignoring membership change of {} as I am not master".format(
+                    host.ip))
+                return
+
+            result = self.propose(data["add"], data["remove"])
+            if not result["ok"]:
+                _logger.warning("Membership change of {} failed: {}".format(
+                    host.ip, result["error"]))
+            return
+
+        self._learn(data)
+
+        if message.type == MessageType.CONFIG:
+            self.manager.client.send(host, self._message(MessageType.CONFIG_ACK))
+        else:
+            self._acks[host] = (data["term"], data["version"])
+            self._advance()
+
+    def tick(self):
+        """Completes a change once enough members acknowledged it and sends the
+        configuration to members that don't have it yet. Called by the manager
+        every interval.
+        """
+        with self.manager.lock:
+            if not self._leading():
+                return
+
+            # a member that was down may have restarted with an older configuration
+            for host in list(self._acks):
+                if host.status == HostStatus.DOWN:
+                    del self._acks[host]
+
+            self._advance()
+            self._send([host for host in self.manager.hosts
+                        if host.status == HostStatus.UP and self._acks.get(host) != self.key()])
+
+            for host, left in list(self._departed.items()):
+                self._send([host])
+                if left > 1:
+                    self._departed[host] = left - 1
+                else:
+                    del self._departed[host]
+
+    def normalize(self, member: str) -> str:
+        """Adds the port of this node to a member without one
+
+        Args:
+            member (str): "ip" or "ip:port"
+
+        Returns:
+            str: "ip:port"
+        """
+        ip, _, port = member.partition(":")
+
+        return "{}:{}".format(ip, int(port) if port else self.manager.local.port)
+
+    def _leading(self) -> bool:
+        return self.manager.quorum and self.manager.master is self.manager.local
+
+    def _message(self, kind: MessageType) -> Message:
+        return Message(kind, {'term': self.term, 'version': self.version,
+                              'members': self.members, 'old': self.old})
+
+    def _send(self, hosts: List[Host]):
+        if hosts:
+            self.manager.client.sendMany(self.manager.client.encode(
+                self._message(MessageType.CONFIG)), hosts)
+
+    def _learn(self, data: dict):
+        if (data["term"], data["version"]) <= self.key():
+            return
+
+        _logger.warning("Adopting members {} of version {}".format(
+            ", ".join(data["members"]), data["version"]))
+        self._apply(data["term"], data["version"], data["members"], data["old"])
+
+    def _advance(self):
+        # the change is complete once a majority of the old and of the new
+        # members acknowledged the joint configuration
+        if self.old is None or not self._leading():
+            return
+
+        acked = {host for host, key in self._acks.items() if key == self.key()}
+        if not self.manager.hasMajority(acked):
+            return
+
+        previous = list(self.manager.hosts)
+        self._apply(self.term, self.version + 1, self.members, None)
+        _logger.warning("Membership change to version {} complete".format(self.version))
+
+        for host in previous:
+            if host not in self.manager.hosts:
+                self._departed[host] = self.retransmits - 1
+        self._send(previous)
+
+    def _apply(self, term: int, version: int, members: List[str], old: Optional[List[str]]):
+        manager = self.manager
+        local = address(manager.local)
+
+        self.term = term
+        self.version = version
+        self.members = sorted(members)
+        self.old = sorted(old) if old is not None else None
+
+        removed = old is None and local not in members
+        wanted = set() if removed else set(members) | set(old or [])
+        wanted.discard(local)
+
+        # a node that is no longer a member must not elect itself once it
+        # doesn't see any other node
+        if removed and manager.eligible:
+            _logger.warning("Removed from the cluster")
+            manager.eligible = False
+            if manager.quorum:
+                manager.lostQuorum()
+
+        current = {address(host): host for host in manager.hosts}
+        for member in sorted(wanted - set(current)):
+            ip, port = member.rsplit(":", 1)
+            manager.addHost(self.hostFactory(ip, int(port)))
+        for member in sorted(set(current) - wanted):
+            manager.removeHost(current[member])
+            self._acks.pop(current[member], None)
+
+        if self.old is None:
+            manager.setJoint(None)
+        else:
+            byAddress = {address(host): host for host in manager.hosts}
+            manager.setJoint([({byAddress[m] for m in configuration if m != local},
+                               local in configuration) for configuration in (self.old, self.members)])
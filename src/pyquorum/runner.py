@@ -1,33 +1,56 @@
 # -*- coding: utf-8 -*-
 
+import logging
+import os
+import signal
 import subprocess
-from typing import Optional
+from typing import Dict, List, Optional
+
+_logger = logging.getLogger(__name__)
 
 
 class Runner:
     """Runs application code
     """
 
-    def __init__(self, script: str):
+    # whether the process keeps running after stop()
+    demotes = False
+
+    def __init__(self, script: str, args: Optional[List[str]] = None):
         """
         Args:
             script (str): Path to an executable script
+            args (List[str], optional): Arguments passed to the script. Defaults to None.
         """
         super().__init__()
 
         self.script = script
+        self.args = args if args is not None else []
         self.p: Optional[subprocess.Popen[bytes]] = None
         self.running = False
 
-    def run(self) -> bool:
+    def prepare(self) -> bool:
+        """Prepares the application before this node is elected. The plain
+        runner starts the application only once it is elected.
+
+        Returns:
+            bool: Returns true if the application is prepared
+        """
+        return True
+
+    def run(self, env: Optional[Dict[str, str]] = None) -> bool:
         """Runs the application
 
+        Args:
+            env (Dict[str, str], optional): Variables added to the environment of the script. Defaults to None.
+
         Returns:
             bool: Returns true if the script was started successfully
         """
         if self.script != None:
             try:
-                self.p = subprocess.Popen(self.script)
+                self.p = subprocess.Popen([self.script] + self.args,
+                                          env=dict(os.environ, **env) if env else None)
                 self.running = True
             except (FileNotFoundError, PermissionError):
                 return False
@@ -40,3 +63,116 @@ class Runner:
         if self.p:
             self.p.terminate()
         self.running = False
+
+
+class StandbyRunner(Runner):
+    """Keeps the application running in standby on followers and promotes it
+    once this node is elected, so a failover does not include the startup
+    time of the application.
+
+    The standby script is started with PYQUORUM_STANDBY=1 in its environment
+    (0 if it had to be started on election). It is promoted and demoted either
+    with signals or, in pipe mode, with "promote" and "demote" lines written
+    to its stdin. In pipe mode the promote line carries the variables passed
+    to run() as KEY=VALUE pairs.
+    """
+
+    def __init__(self, script: str, args: Optional[List[str]] = None,
+                 promote: signal.Signals = signal.SIGUSR1, demote: signal.Signals = signal.SIGUSR2,
+                 pipe: bool = False):
+        """
+        Args:
+            script (str): Path to an executable script
+            args (List[str], optional): Arguments passed to the script. Defaults to None.
+            promote (signal.Signals, optional): Signal that promotes the application. Defaults to SIGUSR1.
+            demote (signal.Signals, optional): Signal that demotes the application. Defaults to SIGUSR2.
+            pipe (bool, optional): Control the application through its stdin instead of signals. Defaults to False.
+        """
+        super().__init__(script, args)
+
+        self.demotes = True
+        self.promote = promote
+        self.demote = demote
+        self.pipe = pipe
+
+    def prepare(self) -> bool:
+        """Starts the application in standby unless it is already running
+
+        Returns:
+            bool: Returns true if the application is running
+        """
+        if self.script is None or self._alive():
+            return True
+
+        if not self._start(True):
+            return False
+
+        _logger.info("Started {} in standby".format(self.script))
+        return True
+
+    def run(self, env: Optional[Dict[str, str]] = None) -> bool:
+        """Promotes the application. If no standby process is running the
+        application is started as the active instance right away.
+
+        Args:
+            env (Dict[str, str], optional): Variables passed to the application. Defaults to None.
+
+        Returns:
+            bool: Returns true if the application was promoted
+        """
+        env = env or {}
+
+        if self.script is not None:
+            if self._alive():
+                command = " ".join(["promote"] + ["{}={}".format(k, v) for k, v in env.items()])
+                if not self._control(command, self.promote):
+                    return False
+            elif not self._start(False, env):
+                return False
+
+        self.running = True
+        return True
+
+    def stop(self):
+        """Demotes the application back to standby
+        """
+        if self._alive():
+            self._control("demote", self.demote)
+
+        self.running = False
+
+    def close(self):
+        """Terminates the application
+        """
+        if self.p is not None:
+            self.p.terminate()
+            self.p = None
+
+        self.running = False
+
+    def _alive(self) -> bool:
+        return self.p is not None and self.p.poll() is None
+
+    def _start(self, standby: bool, extra: Optional[Dict[str, str]] = None) -> bool:
+        env = dict(os.environ, PYQUORUM_STANDBY="1" if standby else "0", **(extra or {}))
+        try:
+            self.p = subprocess.Popen([self.script] + self.args, env=env,
+                                      stdin=subprocess.PIPE if self.pipe else None)
+        except (FileNotFoundError, PermissionError):
+            self.p = None
+            return False
+
+        return True
+
+    def _control(self, command: str, sig: signal.Signals) -> bool:
+        try:
+            if self.pipe:
+                self.p.stdin.write("{}\n".format(command).encode("utf-8"))
+                self.p.stdin.flush()
+            else:
+                self.p.send_signal(sig)
+        except OSError:
+            _logger.warning("Could not {} {}".format(command.split()[0], self.script))
+            return False
+
+        return True
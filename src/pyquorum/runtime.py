@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from .handler import BaseHandler
+from .inbox import Inbox
+from .manager import QuorumManager
+from .udpserver import multicastSocket
+
+_logger = logging.getLogger(__name__)
+
+
+class DatagramHandlerProtocol(asyncio.DatagramProtocol):
+    """Datagram protocol that passes received messages to a handler
+    """
+
+    def __init__(self, handler: BaseHandler, own: Optional[str] = None):
+        """
+        Args:
+            handler (BaseHandler): Handler to call when a message is received
+            own (str, optional): Address whose datagrams are ignored, such as looped back multicast. Defaults to None.
+        """
+        super().__init__()
+        self.handler = handler
+        self.own = own
+
+    def datagram_received(self, data: bytes, addr):
+        """Called by the event loop when a datagram is received
+
+        Args:
+            data (bytes): The data that was received
+            addr (tuple): Address of the sender
+        """
+        if addr[0] == self.own:
+            return
+
+        if data:
+            self.handler.handle(addr[0], data)
+        else:
+            _logger.warning("Received invalid data from {}".format(addr))
+
+    def error_received(self, exc: Exception):
+        """Called by the event loop when a send or receive operation fails
+
+        Args:
+            exc (Exception): the error that occurred
+        """
+        _logger.warning("Socket error: {}".format(exc))
+
+
+class LoopScheduler(object):
+    """Adapts the event loop to the scheduler interface of the manager
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        """
+        Args:
+            loop (asyncio.AbstractEventLoop): the event loop
+        """
+        super().__init__()
+        self.loop = loop
+
+    def callLater(self, delay: float, callback) -> asyncio.TimerHandle:
+        """Schedules a callback after a delay
+
+        Args:
+            delay (float): seconds from now
+            callback (Callable[[], None]): function to call
+
+        Returns:
+            asyncio.TimerHandle: handle that can be used to cancel the callback
+        """
+        return self.loop.call_later(delay, callback)
+
+
+class AsyncRuntime(object):
+    """Runs the receive path, the keepalive sender and the election tick of
+    one or more managers on a single event loop
+    """
+
+    def __init__(self, interval: float = 1.0):
+        """
+        Args:
+            interval (float, optional): Seconds between two keepalive rounds. Defaults to 1.0.
+        """
+        super().__init__()
+
+        self.interval = interval
+        self.managers: List[QuorumManager] = []
+        self.endpoints: List[Tuple[str, int, BaseHandler]] = []
+        self.groups: List[Tuple[str, str, int, BaseHandler]] = []
+        self.transports: List[asyncio.DatagramTransport] = []
+
+    def add(self, manager: QuorumManager, handler: BaseHandler, bind: str, port: int):
+        """Adds a manager to the runtime
+
+        Args:
+            manager (QuorumManager): manager to drive
+            handler (BaseHandler): handler that receives messages for the manager
+            bind (str): IP address to bind to
+            port (int): Port to bind to
+        """
+        self.managers.append(manager)
+        self.endpoints.append((bind, port, handler))
+
+    def join(self, handler: BaseHandler, group: str, interface: str, port: int):
+        """Receives the datagrams sent to a multicast group
+
+        Args:
+            handler (BaseHandler): handler that receives the messages
+            group (str): multicast group address
+            interface (str): IP address of the interface the group is joined on
+            port (int): Port to bind to
+        """
+        self.groups.append((group, interface, port, handler))
+
+    async def start(self):
+        """Opens the datagram endpoints of all managers
+        """
+        loop = asyncio.get_running_loop()
+
+        for bind, port, handler in self.endpoints:
+            if isinstance(handler, Inbox):
+                # drained on the loop instead of the thread of the inbox
+                handler.wakeup = lambda h=handler: loop.call_soon(h.drain)
+
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda h=handler: DatagramHandlerProtocol(h), local_addr=(bind, port))
+            self.transports.append(transport)
+
+        for group, interface, port, handler in self.groups:
+            try:
+                sock = multicastSocket(group, port, interface)
+            except OSError as e:
+                _logger.warning("Could not join multicast group {}: {}".format(group, e))
+                continue
+
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda h=handler, i=interface: DatagramHandlerProtocol(h, i), sock=sock)
+            self.transports.append(transport)
+
+    def close(self):
+        """Closes all datagram endpoints
+        """
+        for transport in self.transports:
+            transport.close()
+
+        self.transports = []
+
+    def tick(self):
+        """Sends keepalives and runs the election of every manager once
+        """
+        for manager in self.managers:
+            manager.update()
+            manager.sendKeepAlives()
+
+    async def serve(self, rounds: Optional[int] = None):
+        """Drives all managers at a fixed rate
+
+        Args:
+            rounds (int, optional): Number of rounds to run. Runs forever if omitted.
+        """
+        loop = asyncio.get_running_loop()
+
+        await self.start()
+
+        scheduler = LoopScheduler(loop)
+        for manager in self.managers:
+            manager.scheduler = scheduler
+
+        try:
+            for manager in self.managers:
+                manager.sendKeepAlives()
+
+            deadline = loop.time()
+            while rounds is None or rounds > 0:
+                deadline += self.interval
+                await asyncio.sleep(max(0, deadline - loop.time()))
+
+                self.tick()
+
+                if rounds is not None:
+                    rounds -= 1
+        finally:
+            self.close()
+
+    def run(self):
+        """Runs the event loop forever
+        """
+        asyncio.run(self.serve())
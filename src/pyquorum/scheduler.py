@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+import heapq
+import logging
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+_logger = logging.getLogger(__name__)
+
+
+class Timer(object):
+    """Handle of a scheduled callback
+    """
+
+    def __init__(self, when: float, callback: Callable[[], None]):
+        """
+        Args:
+            when (float): deadline on the scheduler clock
+            callback (Callable[[], None]): function to call
+        """
+        super().__init__()
+        self.when = when
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        """Cancels the timer
+        """
+        self.cancelled = True
+
+
+class Scheduler(object):
+    """Runs callbacks at their deadline. Timers can be scheduled from any
+    thread, the callbacks run on the thread that calls run().
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            clock (Callable[[], float], optional): monotonic clock. Defaults to time.monotonic.
+        """
+        super().__init__()
+
+        self.clock = clock
+        self._timers: List[Tuple[float, int, Timer]] = []
+        self._seq = 0
+        self._condition = threading.Condition()
+        self._stopped = False
+
+    def callAt(self, when: float, callback: Callable[[], None]) -> Timer:
+        """Schedules a callback at a deadline
+
+        Args:
+            when (float): deadline on the scheduler clock
+            callback (Callable[[], None]): function to call
+
+        Returns:
+            Timer: handle that can be used to cancel the callback
+        """
+        timer = Timer(when, callback)
+
+        with self._condition:
+            self._seq += 1
+            heapq.heappush(self._timers, (when, self._seq, timer))
+
+            # wake up the runner if this is the new earliest deadline
+            if self._timers[0][2] is timer:
+                self._condition.notify()
+
+        return timer
+
+    def callLater(self, delay: float, callback: Callable[[], None]) -> Timer:
+        """Schedules a callback after a delay
+
+        Args:
+            delay (float): seconds from now
+            callback (Callable[[], None]): function to call
+
+        Returns:
+            Timer: handle that can be used to cancel the callback
+        """
+        return self.callAt(self.clock() + delay, callback)
+
+    def every(self, interval: float, callback: Callable[[], None], delay: float = 0.0):
+        """Runs a callback periodically at fixed deadlines, so the period does
+        not drift by the time the callback takes
+
+        Args:
+            interval (float): seconds between two calls
+            callback (Callable[[], None]): function to call
+            delay (float, optional): seconds until the first call. Defaults to 0.0.
+        """
+        def periodic(when: float):
+            # scheduled first so a callback that raises doesn't stop the timer
+            following = when + interval
+            self.callAt(following, lambda: periodic(following))
+            callback()
+
+        first = self.clock() + delay
+        self.callAt(first, lambda: periodic(first))
+
+    def runPending(self) -> Optional[float]:
+        """Runs all callbacks whose deadline passed
+
+        Returns:
+            Optional[float]: the next deadline or None if no timer is scheduled
+        """
+        while True:
+            with self._condition:
+                if not self._timers:
+                    return None
+
+                when, _, timer = self._timers[0]
+                if when > self.clock():
+                    return when
+
+                heapq.heappop(self._timers)
+
+            if not timer.cancelled:
+                try:
+                    timer.callback()
+                except Exception:
+                    _logger.exception("Scheduled callback failed")
+
+    def run(self):
+        """Runs callbacks at their deadlines until stop() is called
+        """
+        while not self._stopped:
+            deadline = self.runPending()
+
+            with self._condition:
+                if self._stopped:
+                    break
+
+                if self._timers and self._timers[0][0] != deadline:
+                    # an earlier timer was added while the callbacks ran
+                    continue
+
+                timeout = None if deadline is None else max(0.0, deadline - self.clock())
+                self._condition.wait(timeout)
+
+    def stop(self):
+        """Stops the scheduler
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
@@ -0,0 +1,512 @@
+# -*- coding: utf-8 -*-
+"""
+Deterministic in-process cluster simulator. Many managers run against an
+in-memory network on a virtual clock, so thousands of simulated seconds can be
+run per wall clock second.
+"""
+
+import argparse
+import heapq
+import json
+import logging
+import random
+import sys
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .detector import PenaltyDetector, PhiAccrualDetector
+from .host import Host
+from .manager import QuorumManager
+from .message import Message
+from .metrics import Metrics
+from .receiver import MessageReceiver
+from .runner import Runner
+from .swim import SwimMembership
+
+__author__ = "Henry Spanka"
+__copyright__ = "Henry Spanka"
+__license__ = "mit"
+
+_logger = logging.getLogger(__name__)
+
+
+class VirtualClock(object):
+    """Clock that only advances when the simulation processes an event
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class SimulatedNetwork(object):
+    """In-memory network with seeded packet loss, latency and partitions
+    """
+
+    def __init__(self, simulation, loss: float = 0.0, latency: Tuple[float, float] = (0.001, 0.005)):
+        """
+        Args:
+            simulation (Simulation): simulation that schedules deliveries
+            loss (float, optional): probability that a packet is dropped. Defaults to 0.0.
+            latency (Tuple[float, float], optional): range of the one way latency in seconds.
+                Defaults to (0.001, 0.005).
+        """
+        super().__init__()
+
+        self.simulation = simulation
+        self.loss = loss
+        self.latency = latency
+        self.groups: Dict[str, int] = {}
+        self.sent = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def partition(self, *groups: Iterable[str]):
+        """Splits the network. Nodes can only reach nodes of the same group,
+        nodes that are not part of any group are isolated.
+
+        Args:
+            groups (Iterable[str]): IP addresses of the nodes of each group
+        """
+        self.groups = {}
+        for i, group in enumerate(groups):
+            for ip in group:
+                self.groups[ip] = i
+
+    def heal(self):
+        """Removes all partitions
+        """
+        self.groups = {}
+
+    def reachable(self, src: str, dst: str) -> bool:
+        """Checks whether a packet can travel between two nodes
+
+        Args:
+            src (str): IP address of the sender
+            dst (str): IP address of the receiver
+
+        Returns:
+            bool: returns true if both nodes are in the same partition
+        """
+        if not self.groups:
+            return True
+
+        return self.groups.get(src, -1) == self.groups.get(dst, -2)
+
+    def transmit(self, src: str, dst: str, payload: bytes):
+        """Sends a packet
+
+        Args:
+            src (str): IP address of the sender
+            dst (str): IP address of the receiver
+            payload (bytes): encoded message
+        """
+        self.sent += 1
+
+        rng = self.simulation.rng
+        if not self.reachable(src, dst) or (self.loss and rng.random() < self.loss):
+            self.dropped += 1
+            return
+
+        self.simulation.schedule(rng.uniform(*self.latency),
+                                 lambda: self.simulation.deliver(src, dst, payload))
+
+
+class SimulatedClient(object):
+    """Drop-in replacement of the UdpClient that sends through the simulated network
+    """
+
+    def __init__(self, network: SimulatedNetwork, ip: str):
+        """
+        Args:
+            network (SimulatedNetwork): network to send packets through
+            ip (str): IP address of the sending node
+        """
+        super().__init__()
+        self.network = network
+        self.ip = ip
+
+    def encode(self, message: Message) -> bytes:
+        """Encodes a message in the binary wire format
+
+        Args:
+            message (Message): Message to encode
+
+        Returns:
+            bytes: the encoded message
+        """
+        return message.toBytes()
+
+    def send(self, host: Host, message: Message) -> bool:
+        """Sends a message to the given host
+
+        Args:
+            host (Host): Host to send a message to
+            message (Message): Message to send
+
+        Returns:
+            bool: always true as the simulated network accepts every packet
+        """
+        self.network.transmit(self.ip, host.ip, message.toBytes())
+        return True
+
+    def sendMany(self, payload: bytes, hosts: Iterable[Host]) -> List[Host]:
+        """Sends the same encoded message to several hosts
+
+        Args:
+            payload (bytes): Encoded message to send
+            hosts (Iterable[Host]): Hosts to send the message to
+
+        Returns:
+            List[Host]: always empty as the simulated network accepts every packet
+        """
+        for host in hosts:
+            self.network.transmit(self.ip, host.ip, payload)
+
+        return []
+
+
+class SimulatedNode(object):
+    """A single pyquorum node of the simulation
+    """
+
+    def __init__(self, ip: str, manager: QuorumManager):
+        """
+        Args:
+            ip (str): IP address of the node
+            manager (QuorumManager): manager of the node
+        """
+        super().__init__()
+        self.ip = ip
+        self.manager = manager
+        self.receiver = MessageReceiver(manager, manager.metrics)
+        self.alive = True
+        self.following: Optional[str] = None
+
+
+class NodeScheduler(object):
+    """Scheduler interface of a single node, the timers of a crashed node
+    don't fire
+    """
+
+    def __init__(self, simulation, node: SimulatedNode):
+        """
+        Args:
+            simulation (Simulation): simulation that runs the timers
+            node (SimulatedNode): node the timers belong to
+        """
+        super().__init__()
+        self.simulation = simulation
+        self.node = node
+
+    def callLater(self, delay: float, callback: Callable[[], None]):
+        """Schedules a callback on the virtual clock
+
+        Args:
+            delay (float): seconds from now
+            callback (Callable[[], None]): function to call
+        """
+        node = self.node
+        self.simulation.schedule(delay, lambda: callback() if node.alive else None)
+
+
+class Simulation(object):
+    """Runs a cluster of managers on a virtual clock
+    """
+
+    def __init__(self, nodes: int = 5, interval: float = 1.0, seed: int = 0, loss: float = 0.0,
+                 latency: Tuple[float, float] = (0.001, 0.005), detector: str = "penalty",
+                 phiThreshold: float = 8.0, swim: bool = False):
+        """
+        Args:
+            nodes (int, optional): number of nodes in the cluster. Defaults to 5.
+            interval (float, optional): seconds between two keepalive rounds. Defaults to 1.0.
+            seed (int, optional): seed of the random number generator. Defaults to 0.
+            loss (float, optional): probability that a packet is dropped. Defaults to 0.0.
+            latency (Tuple[float, float], optional): range of the one way latency in seconds.
+                Defaults to (0.001, 0.005).
+            detector (str, optional): failure detector, penalty or phi. Defaults to "penalty".
+            phiThreshold (float, optional): threshold of the phi detector. Defaults to 8.0.
+            swim (bool, optional): use SWIM membership. Defaults to False.
+        """
+        super().__init__()
+
+        self.interval = interval
+        self.detector = detector
+        self.phiThreshold = phiThreshold
+        self.swim = swim
+
+        self.rng = random.Random(seed)
+        self.clock = VirtualClock()
+        self.network = SimulatedNetwork(self, loss, latency)
+
+        self._events: List[Tuple[float, int, Callable[[], None]]] = []
+        self._seq = 0
+
+        self.ips = ["10.0.{}.{}".format(i // 250, i % 250 + 1) for i in range(nodes)]
+        self.nodes: Dict[str, SimulatedNode] = {}
+        self.followers: Dict[str, int] = {}
+        self.leader: Optional[str] = None
+        self.leaders: List[Tuple[float, Optional[str]]] = []
+        self.crashes: List[Tuple[float, str]] = []
+
+        for ip in self.ips:
+            self._boot(ip)
+
+    def _makeDetector(self):
+        if self.detector == "phi":
+            return PhiAccrualDetector(self.phiThreshold, self.interval, clock=self.clock)
+
+        return PenaltyDetector(interval=self.interval, clock=self.clock)
+
+    def _boot(self, ip: str):
+        hosts = [Host(other, 0, self._makeDetector()) for other in self.ips if other != ip]
+        manager = QuorumManager(Host(ip, 0), hosts, SimulatedClient(self.network, ip), Runner(None),
+                                Metrics())
+        manager.clock = self.clock
+
+        if self.swim:
+            manager.membership = SwimMembership(manager, rng=random.Random(self.rng.random()))
+
+        node = SimulatedNode(ip, manager)
+        self.nodes[ip] = node
+        manager.scheduler = NodeScheduler(self, node)
+
+        # nodes don't start in lockstep
+        self.schedule(self.rng.uniform(0, self.interval), lambda: self._tick(node))
+
+    def schedule(self, delay: float, callback: Callable[[], None]):
+        """Schedules a callback on the virtual clock
+
+        Args:
+            delay (float): seconds from now
+            callback (Callable[[], None]): function to call
+        """
+        self._seq += 1
+        heapq.heappush(self._events, (self.clock.now + delay, self._seq, callback))
+
+    def callLater(self, delay: float, callback: Callable[[], None]):
+        """Scheduler interface used by the managers
+
+        Args:
+            delay (float): seconds from now
+            callback (Callable[[], None]): function to call
+        """
+        self.schedule(delay, callback)
+
+    def _tick(self, node: SimulatedNode):
+        if not node.alive or self.nodes.get(node.ip) is not node:
+            return
+
+        node.manager.update()
+        node.manager.sendKeepAlives()
+        self._observe(node)
+
+        self.schedule(self.interval, lambda: self._tick(node))
+
+    def deliver(self, src: str, dst: str, payload: bytes):
+        """Delivers a packet to a node
+
+        Args:
+            src (str): IP address of the sender
+            dst (str): IP address of the receiver
+            payload (bytes): encoded message
+        """
+        node = self.nodes.get(dst)
+        if node is None or not node.alive or not self.network.reachable(src, dst):
+            self.network.dropped += 1
+            return
+
+        self.network.delivered += 1
+        node.receiver.handle(src, payload)
+        self._observe(node)
+
+    def _observe(self, node: SimulatedNode):
+        """Tracks which master a node follows and whether a leader holds the
+        majority of the cluster
+        """
+        manager = node.manager
+        following = None
+        if node.alive and manager.quorum and manager.master is not None:
+            following = manager.master.ip
+
+        if following == node.following:
+            return
+
+        if node.following is not None:
+            self.followers[node.following] -= 1
+        if following is not None:
+            self.followers[following] = self.followers.get(following, 0) + 1
+        node.following = following
+
+        majority = len(self.ips) // 2 + 1
+
+        if self.leader is not None:
+            if self.followers.get(self.leader, 0) < majority or not self.nodes[self.leader].alive:
+                self._setLeader(None)
+
+        if self.leader is None and following is not None and self.nodes[following].alive \
+                and self.followers[following] >= majority:
+            self._setLeader(following)
+
+    def _setLeader(self, ip: Optional[str]):
+        self.leader = ip
+        self.leaders.append((self.clock.now, ip))
+
+    def run(self, duration: float):
+        """Processes events for the given simulated time
+
+        Args:
+            duration (float): simulated seconds
+        """
+        self.runUntil(lambda: False, duration)
+
+    def runUntil(self, condition: Callable[[], bool], timeout: float) -> bool:
+        """Processes events until a condition is met
+
+        Args:
+            condition (Callable[[], bool]): checked after every event
+            timeout (float): maximum simulated seconds
+
+        Returns:
+            bool: returns true if the condition was met
+        """
+        end = self.clock.now + timeout
+
+        while self._events and self._events[0][0] <= end:
+            when, _, callback = heapq.heappop(self._events)
+            self.clock.now = when
+            callback()
+
+            if condition():
+                return True
+
+        self.clock.now = end
+        return False
+
+    def crash(self, ip: str):
+        """Crashes a node
+
+        Args:
+            ip (str): IP address of the node
+        """
+        node = self.nodes[ip]
+        node.alive = False
+        self.crashes.append((self.clock.now, ip))
+        self._observe(node)
+
+    def restart(self, ip: str):
+        """Restarts a crashed node with fresh state
+
+        Args:
+            ip (str): IP address of the node
+        """
+        old = self.nodes[ip]
+        old.alive = False
+        self._observe(old)
+
+        self._boot(ip)
+
+    def report(self) -> dict:
+        """Summarizes the simulation
+
+        Returns:
+            dict: time to the first quorum, failover durations and message counters
+        """
+        first = next((when for when, ip in self.leaders if ip is not None), None)
+
+        failovers = []
+        for crashed, ip in self.crashes:
+            recovered = next((when for when, leader in self.leaders
+                              if when >= crashed and leader is not None and leader != ip), None)
+            if recovered is not None:
+                failovers.append(recovered - crashed)
+
+        return {
+            'nodes': len(self.ips),
+            'simulatedSeconds': self.clock.now,
+            'timeToQuorum': first,
+            'failovers': failovers,
+            'leaderChanges': len([ip for _, ip in self.leaders if ip is not None]),
+            'messagesSent': self.network.sent,
+            'messagesDelivered': self.network.delivered,
+            'messagesDropped': self.network.dropped
+        }
+
+
+def parse_args(args):
+    """Parse command line parameters
+
+    Args:
+      args ([str]): command line parameters as list of strings
+
+    Returns:
+      :obj:`argparse.Namespace`: command line parameters namespace
+    """
+    parser = argparse.ArgumentParser(
+        description="Simulates a pyquorum cluster on a virtual clock.")
+    parser.add_argument("-n", "--nodes", dest="nodes", type=int, default=5,
+                        help="Number of nodes")
+    parser.add_argument("--seed", dest="seed", type=int, default=0,
+                        help="Seed of the random number generator")
+    parser.add_argument("-i", "--interval", dest="interval", type=float, default=1.0,
+                        help="Seconds between two keepalive messages")
+    parser.add_argument("--loss", dest="loss", type=float, default=0.0,
+                        help="Probability that a packet is dropped")
+    parser.add_argument("--latency", dest="latency", type=float, nargs=2, default=[0.001, 0.005],
+                        metavar=("MIN", "MAX"), help="Range of the one way latency in seconds")
+    parser.add_argument("--detector", dest="detector", choices=["penalty", "phi"], default="penalty",
+                        help="Failure detector used to mark hosts down")
+    parser.add_argument("--phi-threshold", dest="phi_threshold", type=float, default=8.0,
+                        help="Suspicion level above which the phi detector marks a host down")
+    parser.add_argument("--swim", dest="swim", action="store_true",
+                        help="Use SWIM style gossip membership")
+    parser.add_argument("--failovers", dest="failovers", type=int, default=3,
+                        help="Number of times the leader is crashed")
+    parser.add_argument("--timeout", dest="timeout", type=float, default=600.0,
+                        help="Simulated seconds to wait for a leader")
+    return parser.parse_args(args)
+
+
+def main(args):
+    """Runs a simulation that elects a leader and crashes it repeatedly
+
+    Args:
+      args ([str]): command line parameter list
+    """
+    args = parse_args(args)
+
+    # the managers log every state change
+    logging.getLogger("pyquorum").setLevel(logging.CRITICAL)
+
+    simulation = Simulation(args.nodes, args.interval, args.seed, args.loss, tuple(args.latency),
+                            args.detector, args.phi_threshold, args.swim)
+    started = time.perf_counter()
+
+    simulation.runUntil(lambda: simulation.leader is not None, args.timeout)
+    for _ in range(args.failovers):
+        if simulation.leader is None:
+            break
+
+        crashed = simulation.leader
+        simulation.crash(crashed)
+        simulation.runUntil(lambda: simulation.leader not in (None, crashed), args.timeout)
+        simulation.restart(crashed)
+
+    report = simulation.report()
+    report['wallSeconds'] = time.perf_counter() - started
+
+    print(json.dumps(report, indent=2))
+
+
+def run():
+    """Entry point for console_scripts
+    """
+    main(sys.argv[1:])
+
+
+if __name__ == "__main__":
+    run()
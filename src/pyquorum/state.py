@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import mmap
+import os
+import struct
+import time
+from typing import Callable, List, Optional
+import zlib
+
+_logger = logging.getLogger(__name__)
+
+MAGIC = b"PQST"
+VERSION = 1
+
+# magic, version, flags, number of peers, sequence, member hash, term,
+# saved at (wall clock), master index
+_HEADER = struct.Struct("!4sBBHIIQdH")
+_SEQ = struct.Struct("!I")
+_SEQ_OFFSET = 8
+_SAVED_AT = struct.Struct("!d")
+_SAVED_AT_OFFSET = 24
+
+_FLAG_QUORUM = 0x01
+
+# master index of the local node and of no master
+LOCAL = 0xFFFE
+NO_MASTER = 0xFFFF
+
+
+def memberHash(members: List[str]) -> int:
+    """Hash of the cluster members a state file belongs to
+
+    Args:
+        members (List[str]): "ip:port" of the peers in election order
+
+    Returns:
+        int: 32 bit hash
+    """
+    return zlib.crc32(",".join(members).encode("utf-8"))
+
+
+class NodeState(object):
+    """Snapshot of the election state of a node
+    """
+
+    def __init__(self, term: int, master: int, quorum: bool, peers: List[bool],
+                 savedAt: float = 0.0):
+        """
+        Args:
+            term (int): election term
+            master (int): index of the master in the peer list, LOCAL or NO_MASTER
+            quorum (bool): whether the node had quorum
+            peers (List[bool]): reachability of the peers in election order
+            savedAt (float, optional): wall clock time of the last update. Defaults to 0.0.
+        """
+        super().__init__()
+        self.term = term
+        self.master = master
+        self.quorum = quorum
+        self.peers = peers
+        self.savedAt = savedAt
+
+
+class StateFile(object):
+    """State of a node kept in a memory-mapped file so a restarted node can
+    rejoin the cluster without a new election.
+
+    Updates are written in place into the mapping and left to the kernel to
+    write back, the file is never fsynced. A sequence number that is odd
+    while an update is in progress (a seqlock) lets readers detect torn
+    updates, for example after a crash in the middle of a write.
+    """
+
+    def __init__(self, path: str, members: List[str], clock: Callable[[], float] = time.time):
+        """
+        Args:
+            path (str): path of the state file, created if it doesn't exist
+            members (List[str]): "ip:port" of the peers in election order
+            clock (Callable[[], float], optional): wall clock. Defaults to time.time.
+        """
+        super().__init__()
+
+        self.path = path
+        self.count = len(members)
+        self.members = memberHash(members)
+        self.clock = clock
+        self.size = _HEADER.size + self.count
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size != self.size:
+                os.ftruncate(fd, self.size)
+            self.map = mmap.mmap(fd, self.size)
+        finally:
+            os.close(fd)
+
+    def read(self) -> Optional[NodeState]:
+        """Reads the stored state
+
+        Returns:
+            Optional[NodeState]: the state or None if the file is empty, torn or belongs to another cluster
+        """
+        for _ in range(3):
+            seq, = _SEQ.unpack_from(self.map, _SEQ_OFFSET)
+            data = bytes(self.map)
+
+            if seq % 2 == 0 and _SEQ.unpack_from(self.map, _SEQ_OFFSET)[0] == seq:
+                break
+        else:
+            _logger.warning("State file {} is inconsistent".format(self.path))
+            return None
+
+        magic, version, flags, count, _, members, term, savedAt, master = \
+            _HEADER.unpack_from(data)
+
+        if magic != MAGIC or version != VERSION or count != self.count \
+                or members != self.members:
+            return None
+
+        peers = [status == 1 for status in data[_HEADER.size:]]
+
+        return NodeState(term, master, bool(flags & _FLAG_QUORUM), peers, savedAt)
+
+    def write(self, state: NodeState):
+        """Stores a state in place
+
+        Args:
+            state (NodeState): the state to store
+        """
+        seq = self._begin()
+
+        _HEADER.pack_into(self.map, 0, MAGIC, VERSION, _FLAG_QUORUM if state.quorum else 0,
+                          self.count, seq, self.members, state.term, self.clock(),
+                          state.master)
+        self.map[_HEADER.size:] = bytes(1 if up else 0 for up in state.peers)
+
+        self._end(seq)
+
+    def touch(self):
+        """Updates the time of the stored state
+        """
+        seq = self._begin()
+        _SAVED_AT.pack_into(self.map, _SAVED_AT_OFFSET, self.clock())
+        self._end(seq)
+
+    def close(self):
+        """Writes the state back and unmaps the file
+        """
+        if self.map.closed:
+            return
+
+        self.map.flush()
+        self.map.close()
+
+    def _begin(self) -> int:
+        # odd while the update is in progress, stays odd after a torn update
+        seq = _SEQ.unpack_from(self.map, _SEQ_OFFSET)[0] | 1
+        _SEQ.pack_into(self.map, _SEQ_OFFSET, seq)
+
+        return seq
+
+    def _end(self, seq: int):
+        _SEQ.pack_into(self.map, _SEQ_OFFSET, (seq + 1) & 0xFFFFFFFF)
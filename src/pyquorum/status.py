@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Leadership status page shared with local processes through a memory-mapped
+file. Readers map the file and read it without system calls or locks.
+
+Layout (network byte order, 96 bytes):
+
+    offset  size  field
+    0       4     magic "PQSP"
+    4       1     version
+    5       1     flags (0x01 quorum, 0x02 this node is the master)
+    6       2     reserved
+    8       8     sequence, odd while the page is updated
+    16      8     term of the master, used as fencing token
+    24      8     wall clock time of the last update
+    32      64    ip address of the master, NUL padded, empty without master
+
+A reader copies the page between two reads of the sequence and retries if
+the sequence was odd or changed in between.
+"""
+
+import logging
+import mmap
+import os
+import struct
+import time
+from typing import Callable, Optional
+
+_logger = logging.getLogger(__name__)
+
+MAGIC = b"PQSP"
+VERSION = 1
+
+_PAGE = struct.Struct("!4sBBHQQd64s")
+_SEQ = struct.Struct("!Q")
+_SEQ_OFFSET = 8
+
+FLAG_QUORUM = 0x01
+FLAG_MASTER = 0x02
+
+
+class Status(object):
+    """Leadership status read from a status page
+    """
+
+    def __init__(self, term: int, master: Optional[str], quorum: bool, leader: bool,
+                 updatedAt: float):
+        """
+        Args:
+            term (int): term of the master, used as fencing token
+            master (Optional[str]): ip address of the master
+            quorum (bool): whether the node has quorum
+            leader (bool): whether the node is the master
+            updatedAt (float): wall clock time of the last update
+        """
+        super().__init__()
+        self.term = term
+        self.master = master
+        self.quorum = quorum
+        self.leader = leader
+        self.updatedAt = updatedAt
+
+
+class StatusPage(object):
+    """Writer of the status page
+    """
+
+    def __init__(self, path: str, clock: Callable[[], float] = time.time):
+        """
+        Args:
+            path (str): path of the page, /dev/shm keeps it in memory
+            clock (Callable[[], float], optional): wall clock. Defaults to time.time.
+        """
+        super().__init__()
+
+        self.path = path
+        self.clock = clock
+        self._seq = 0
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, _PAGE.size)
+            self.map = mmap.mmap(fd, _PAGE.size)
+        finally:
+            os.close(fd)
+
+        self.write(0, None, False, False)
+
+    def write(self, term: int, master: Optional[str], quorum: bool, leader: bool):
+        """Publishes the leadership status
+
+        Args:
+            term (int): term of the master, used as fencing token
+            master (Optional[str]): ip address of the master
+            quorum (bool): whether the node has quorum
+            leader (bool): whether the node is the master
+        """
+        flags = (FLAG_QUORUM if quorum else 0) | (FLAG_MASTER if leader else 0)
+
+        self._seq += 1
+        _SEQ.pack_into(self.map, _SEQ_OFFSET, self._seq)
+        _PAGE.pack_into(self.map, 0, MAGIC, VERSION, flags, 0, self._seq, term, self.clock(),
+                        (master or "").encode("utf-8"))
+        self._seq += 1
+        _SEQ.pack_into(self.map, _SEQ_OFFSET, self._seq)
+
+    def close(self):
+        """Marks the page as without master and unmaps it
+        """
+        self.write(0, None, False, False)
+        self.map.close()
+
+
+class StatusReader(object):
+    """Reads the status page published by a pyquorum process
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): path of the page
+        """
+        super().__init__()
+
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), _PAGE.size, access=mmap.ACCESS_READ)
+
+    def read(self, retries: int = 100) -> Optional[Status]:
+        """Reads a consistent copy of the page
+
+        Args:
+            retries (int, optional): attempts while the page is updated. Defaults to 100.
+
+        Returns:
+            Optional[Status]: the status or None if no consistent copy could be read
+        """
+        for _ in range(retries):
+            seq, = _SEQ.unpack_from(self.map, _SEQ_OFFSET)
+            if seq % 2:
+                continue
+
+            page = self.map[:_PAGE.size]
+            if _SEQ.unpack_from(self.map, _SEQ_OFFSET)[0] != seq:
+                continue
+
+            magic, version, flags, _, _, term, updatedAt, master = _PAGE.unpack(page)
+            if magic != MAGIC or version != VERSION:
+                return None
+
+            master = master.rstrip(b"\0").decode("utf-8") or None
+
+            return Status(term, master, bool(flags & FLAG_QUORUM), bool(flags & FLAG_MASTER),
+                          updatedAt)
+
+        return None
+
+    def close(self):
+        """Unmaps the page
+        """
+        self.map.close()
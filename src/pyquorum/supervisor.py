@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+
+from collections import deque
+import logging
+import subprocess
+import threading
+import time
+from typing import Callable, Deque, Dict, Optional
+
+from .runner import Runner
+
+_logger = logging.getLogger(__name__)
+
+
+class Supervisor(object):
+    """Supervises the process of a runner without blocking the election.
+
+    Every process is reaped by a watcher thread. A process that exits on its
+    own is restarted with exponential backoff. If it crashes more than
+    maxRestarts times within window seconds the supervisor gives up, calls
+    onGiveUp so the node can resign, and calls onRecover once the crashes
+    have expired. If the node is still master at that point the process is
+    started again. A process that does not exit within the grace period after
+    it was stopped is killed.
+
+    The supervisor has the same interface as a runner and is passed to the
+    manager instead of the runner.
+    """
+
+    def __init__(self, runner: Runner, grace: float = 5.0, backoff: float = 1.0,
+                 maxBackoff: float = 30.0, maxRestarts: int = 3, window: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            runner (Runner): runner to supervise
+            grace (float, optional): Seconds a stopped process may take to exit before it is killed. Defaults to 5.0.
+            backoff (float, optional): Delay of the first restart in seconds. Defaults to 1.0.
+            maxBackoff (float, optional): Maximum delay of a restart in seconds. Defaults to 30.0.
+            maxRestarts (int, optional): Crashes within the window before giving up. Defaults to 3.
+            window (float, optional): Seconds a crash is remembered. Defaults to 60.0.
+            clock (Callable[[], float], optional): monotonic clock. Defaults to time.monotonic.
+        """
+        super().__init__()
+
+        self.runner = runner
+        self.grace = grace
+        self.backoff = backoff
+        self.maxBackoff = maxBackoff
+        self.maxRestarts = maxRestarts
+        self.window = window
+        self.clock = clock
+        self.onGiveUp: Optional[Callable[[], None]] = None
+        self.onRecover: Optional[Callable[[], None]] = None
+
+        self.crashes: Deque[float] = deque()
+        self.gaveUp = False
+        # whether the manager wants the application to run as master
+        self._active = False
+        self._lock = threading.RLock()
+        self._watched: Optional[subprocess.Popen] = None
+        self._timer: Optional[threading.Timer] = None
+        self._env: Optional[Dict[str, str]] = None
+
+    @property
+    def running(self) -> bool:
+        """Whether the application is running as master
+        """
+        return self.runner.running
+
+    def prepare(self) -> bool:
+        """Prepares the application of the runner
+
+        Returns:
+            bool: Returns true if the application is prepared
+        """
+        with self._lock:
+            if self.gaveUp:
+                return True
+
+            prepared = self.runner.prepare()
+            self._watch()
+
+            return prepared
+
+    def run(self, env: Optional[Dict[str, str]] = None) -> bool:
+        """Runs the application of the runner
+
+        Args:
+            env (Dict[str, str], optional): Variables passed to the application, also used for restarts. Defaults to None.
+
+        Returns:
+            bool: Returns true if the script was started successfully
+        """
+        with self._lock:
+            self._cancel()
+            self._env = env
+            self._active = True
+            started = self.runner.run(env)
+            self._watch()
+
+            return started
+
+    def stop(self):
+        """Stops the application and kills it if it does not exit within the
+        grace period
+        """
+        with self._lock:
+            self._cancel()
+            self._active = False
+            process = self.runner.p
+            self.runner.stop()
+
+            if process is not None and not self.runner.demotes:
+                self._start(threading.Timer(self.grace, self._kill, (process,)))
+
+    def close(self):
+        """Terminates the application for good. Waits for it to exit and kills
+        it if it does not exit within the grace period.
+        """
+        with self._lock:
+            self._cancel()
+            self._active = False
+            self._watched = None
+            process = self.runner.p
+
+            close = getattr(self.runner, "close", None)
+            if close is not None:
+                close()
+            else:
+                self.runner.stop()
+
+        if process is None:
+            return
+
+        try:
+            process.wait(self.grace)
+        except subprocess.TimeoutExpired:
+            self._kill(process)
+            process.wait()
+
+    def _watch(self):
+        process = self.runner.p
+        if process is None or process is self._watched:
+            return
+
+        self._watched = process
+        threading.Thread(target=self._wait, args=(process,), daemon=True).start()
+
+    def _wait(self, process: subprocess.Popen):
+        # waiting reaps the child so it doesn't stay around as a zombie
+        code = process.wait()
+
+        with self._lock:
+            if process is not self._watched:
+                return
+
+            self._watched = None
+
+            if self.runner.running:
+                _logger.warning("Script exited with code {} while master".format(code))
+            elif self.runner.demotes and self.runner.p is process:
+                _logger.warning("Standby script exited with code {}".format(code))
+            else:
+                # terminated by stop()
+                return
+
+            gaveUp = self._crashed()
+
+        # called without holding the lock as the manager calls back into the supervisor
+        if gaveUp and self.onGiveUp is not None:
+            self.onGiveUp()
+
+    def _crashed(self) -> bool:
+        now = self.clock()
+        self.crashes.append(now)
+        while self.crashes and self.crashes[0] < now - self.window:
+            self.crashes.popleft()
+
+        if len(self.crashes) > self.maxRestarts:
+            _logger.error("Script crashed {} times within {} seconds, giving up".format(
+                len(self.crashes), self.window))
+            self.gaveUp = True
+            self.runner.running = False
+            self._timer = self._start(threading.Timer(self.window, self._recover))
+            return True
+
+        delay = min(self.backoff * 2 ** (len(self.crashes) - 1), self.maxBackoff)
+        _logger.warning("Restarting script in {:.1f} seconds".format(delay))
+        self._timer = self._start(threading.Timer(delay, self._restart))
+        return False
+
+    def _restart(self):
+        with self._lock:
+            self._timer = None
+
+            if self.runner.running:
+                self.runner.run(self._env)
+            elif self.runner.demotes:
+                self.runner.prepare()
+
+            self._watch()
+
+    def _recover(self):
+        with self._lock:
+            self._timer = None
+            self.gaveUp = False
+            self.crashes.clear()
+
+            # the node didn't resign and is still master
+            if self._active and not self.runner.running:
+                _logger.warning("Script crashes expired, starting it again")
+                self.runner.run(self._env)
+                self._watch()
+            elif self.runner.demotes and not self.runner.running:
+                self.runner.prepare()
+                self._watch()
+
+        if self.onRecover is not None:
+            _logger.warning("Script crashes expired, rejoining the election")
+            self.onRecover()
+
+    def _kill(self, process: subprocess.Popen):
+        if process.poll() is None:
+            _logger.warning("Script did not exit within {} seconds, killing it".format(self.grace))
+            process.kill()
+
+    @staticmethod
+    def _start(timer: threading.Timer) -> threading.Timer:
+        timer.daemon = True
+        timer.start()
+
+        return timer
+
+    def _cancel(self):
+        if self._timer is not None and not self.gaveUp:
+            self._timer.cancel()
+            self._timer = None
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+
+from enum import Enum
+import logging
+import math
+import random
+from typing import Dict, List, Optional
+
+from .host import Host, HostStatus
+from .message import Message, MessageType
+
+_logger = logging.getLogger(__name__)
+
+
+class MemberState(Enum):
+    """State of a member as disseminated by the gossip protocol
+    """
+    ALIVE = 0
+    SUSPECT = 1
+    DEAD = 2
+
+
+class Probe(object):
+    """A probe of a single member that is in flight
+    """
+
+    def __init__(self, seq: int, target: Host):
+        """
+        Args:
+            seq (int): sequence number of the probe
+            target (Host): probed member
+        """
+        super().__init__()
+        self.seq = seq
+        self.target = target
+        self.indirect = False
+        self.acked = False
+
+
+class SwimMembership(object):
+    """SWIM style membership. Every protocol period a single member is probed,
+    members that don't answer are probed indirectly through k other members
+    and finally suspected. Membership updates are piggybacked on the probes.
+    """
+
+    def __init__(self, manager, k: int = 3, suspicion: int = 3, maxUpdates: int = 6,
+                 rng: Optional[random.Random] = None):
+        """
+        Args:
+            manager (QuorumManager): manager whose hosts are monitored
+            k (int, optional): number of members asked to probe indirectly. Defaults to 3.
+            suspicion (int, optional): protocol periods until a suspect is declared dead. Defaults to 3.
+            maxUpdates (int, optional): maximum number of updates per message. Defaults to 6.
+            rng (random.Random, optional): random number generator. Defaults to a new instance.
+        """
+        super().__init__()
+
+        self.manager = manager
+        self.k = k
+        self.suspicion = suspicion
+        self.maxUpdates = maxUpdates
+        self.rng = rng if rng is not None else random.Random()
+
+        self.incarnation = 0
+        self.seq = 0
+        self.probe: Optional[Probe] = None
+        self.targets: List[Host] = []
+
+        self.incarnations: Dict[Host, int] = {}
+        self.suspects: Dict[Host, int] = {}
+        # relayed probes: local sequence number -> (requester, requester sequence number, target)
+        self.relays: Dict[int, tuple] = {}
+        # updates to disseminate: ip -> [state, incarnation, remaining transmissions]
+        self.updates: Dict[str, list] = {}
+
+    def _nextSeq(self) -> int:
+        self.seq += 1
+        return self.seq
+
+    def _limit(self) -> int:
+        return 3 * math.ceil(math.log2(len(self.manager.hosts) + 2))
+
+    def _gossip(self, ip: str, state: MemberState, incarnation: int):
+        self.updates[ip] = [state, incarnation, self._limit()]
+
+    def _piggyback(self) -> list:
+        """Selects the updates that were sent the least number of times
+
+        Returns:
+            list: updates to add to the next message
+        """
+        selected = sorted(self.updates.items(), key=lambda u: -u[1][2])[:self.maxUpdates]
+        updates = []
+
+        for ip, update in selected:
+            updates.append([ip, update[0].value, update[1]])
+
+            update[2] -= 1
+            if update[2] <= 0:
+                del self.updates[ip]
+
+        return updates
+
+    def _payload(self, seq: int, **kwargs) -> dict:
+        data = {
+            'seq': seq,
+            'inc': self.incarnation,
+            'updates': self._piggyback()
+        }
+        data.update(self.manager.state())
+        data.update(kwargs)
+
+        return data
+
+    def _send(self, host: Host, t: MessageType, data: dict):
+        self.manager.client.send(host, Message(t, data))
+
+    def _nextTarget(self) -> Optional[Host]:
+        # round robin over a shuffled member list so every member is probed
+        # within a bounded time
+        if not self.targets:
+            self.targets = list(self.manager.hosts)
+            self.rng.shuffle(self.targets)
+
+        return self.targets.pop() if self.targets else None
+
+    def tick(self):
+        """Runs one protocol period
+        """
+        self._expireSuspects()
+
+        probe = self.probe
+        if probe is not None and not probe.acked:
+            if not probe.indirect:
+                self._probeIndirect(probe)
+                return
+
+            self._suspect(probe.target)
+
+        self.relays = {}
+        self.probe = None
+
+        target = self._nextTarget()
+        if target is not None:
+            self.probe = Probe(self._nextSeq(), target)
+            self._send(target, MessageType.PROBE, self._payload(self.probe.seq))
+
+    def _probeIndirect(self, probe: Probe):
+        probe.indirect = True
+
+        helpers = [h for h in self.manager.hosts
+                   if h is not probe.target and h.status == HostStatus.UP]
+        for helper in self.rng.sample(helpers, min(self.k, len(helpers))):
+            self._send(helper, MessageType.PROBE_REQ, self._payload(
+                probe.seq, target=probe.target.ip, port=probe.target.port))
+
+    def _expireSuspects(self):
+        for host in list(self.suspects):
+            self.suspects[host] -= 1
+
+            if self.suspects[host] <= 0:
+                del self.suspects[host]
+                self._gossip(host.ip, MemberState.DEAD, self.incarnations.get(host, 0))
+                self._down(host)
+
+    def _suspect(self, host: Host):
+        if host.status == HostStatus.DOWN or host in self.suspects:
+            return
+
+        _logger.info("Suspecting host {}".format(host.ip))
+        self.suspects[host] = self.suspicion
+        self._gossip(host.ip, MemberState.SUSPECT, self.incarnations.get(host, 0))
+
+    def _alive(self, host: Host):
+        self.suspects.pop(host, None)
+
+        if host.status == HostStatus.DOWN:
+            _logger.warning("Host {} back online".format(host.ip))
+            host.unpunish()
+
+    def _down(self, host: Host):
+        if host.status == HostStatus.UP:
+            host.status = HostStatus.DOWN
+            self.manager.down(host)
+
+    def handle(self, host: Host, message: Message):
+        """Handles membership messages of other nodes
+
+        Args:
+            host (Host): Host which sent this message
+            message (Message): received message
+        """
+        data = message.data
+
+        # direct contact with a member proves that it is alive
+        self.incarnations[host] = max(self.incarnations.get(host, 0), data["inc"])
+        self._merge(data["updates"])
+        self.manager.ping(host, data)
+        self._alive(host)
+
+        if message.type == MessageType.PROBE:
+            self._send(host, MessageType.ACK, self._payload(data["seq"]))
+        elif message.type == MessageType.PROBE_REQ:
+            target = self.manager.getHost(data["target"], data["port"])
+
+            seq = self._nextSeq()
+            self.relays[seq] = (host, data["seq"], target)
+            self._send(target, MessageType.PROBE, self._payload(seq))
+        elif message.type == MessageType.ACK:
+            self._ack(host, data)
+
+    def _ack(self, host: Host, data: dict):
+        target = host
+        if "target" in data:
+            # acknowledgement of an indirect probe relayed by a helper
+            target = self.manager.getHost(data["target"], data["port"])
+            self._alive(target)
+
+        probe = self.probe
+        if probe is not None and probe.seq == data["seq"] and probe.target is target:
+            probe.acked = True
+
+        relay = self.relays.pop(data["seq"], None)
+        if relay is not None:
+            requester, seq, target = relay
+            self._send(requester, MessageType.ACK, self._payload(
+                seq, target=target.ip, port=target.port))
+
+    def _merge(self, updates: list):
+        for ip, state, incarnation in updates:
+            state = MemberState(state)
+
+            if ip == self.manager.local.ip:
+                if state != MemberState.ALIVE and incarnation >= self.incarnation:
+                    # refute the suspicion with a newer incarnation
+                    self.incarnation = incarnation + 1
+                    self._gossip(ip, MemberState.ALIVE, self.incarnation)
+                continue
+
+            try:
+                host = self.manager.getHost(ip)
+            except Exception:
+                continue
+
+            known = self.incarnations.get(host, 0)
+
+            if state == MemberState.ALIVE:
+                if incarnation > known:
+                    self.incarnations[host] = incarnation
+                    self._alive(host)
+                    self._gossip(ip, state, incarnation)
+            elif state == MemberState.SUSPECT:
+                if incarnation >= known and host.status == HostStatus.UP and host not in self.suspects:
+                    self.incarnations[host] = incarnation
+                    self.suspects[host] = self.suspicion
+                    self._gossip(ip, state, incarnation)
+            elif incarnation >= known and host.status == HostStatus.UP:
+                self.incarnations[host] = incarnation
+                self.suspects.pop(host, None)
+                self._gossip(ip, state, incarnation)
+                self._down(host)
@@ -2,10 +2,14 @@
 
 import logging
 import socket
+import struct
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from .host import Host
+from .metrics import Counter, Metrics, registry
 
 from .message import Message
+from . import mmsg
 
 _logger = logging.getLogger(__name__)
 
@@ -14,16 +18,56 @@ class UdpClient(object):
     """UDP network client that sends messages across the network
     """
 
-    def __init__(self, ip: str):
+    def __init__(self, ip: str, legacy: bool = False, batch: bool = True,
+                 metrics: Optional[Metrics] = None, multicast: Optional[str] = None,
+                 ttl: int = 1, loop: bool = False):
         """
         Args:
             ip (str): IP to listen to
+            legacy (bool, optional): Send messages in the legacy json format. Defaults to False.
+            batch (bool, optional): Use sendmmsg for bulk sends where available. Defaults to True.
+            metrics (Metrics, optional): registry to record metrics in. Defaults to the global registry.
+            multicast (str, optional): Multicast group bulk sends are sent to. Defaults to None.
+            ttl (int, optional): Time to live of multicast datagrams. Defaults to 1.
+            loop (bool, optional): Loop multicast datagrams back to this host. Defaults to False.
         """
         super().__init__()
 
+        self.metrics = metrics if metrics is not None else registry
+        self._counters: Dict[Host, Tuple[Counter, Counter]] = {}
+        self.legacy = legacy
+        self.batch = batch and mmsg.SENDMMSG_AVAILABLE
         self.s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.s.bind((ip, 0))
 
+        self.multicast = multicast
+        if multicast is not None:
+            try:
+                self.s.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+                self.s.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, int(loop))
+                self.s.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(ip))
+            except OSError as e:
+                _logger.warning("Multicast is unavailable, sending unicast: {}".format(e))
+                self.multicast = None
+
+        # message vector of the last bulk send, reused while the destinations don't change
+        self._hosts: List[Host] = []
+        self._vector: Optional[mmsg.SendBatch] = None
+
+    def encode(self, message: Message) -> bytes:
+        """Encodes a message in the configured wire format
+
+        Args:
+            message (Message): Message to encode
+
+        Returns:
+            bytes: the encoded message
+        """
+        if self.legacy:
+            return bytes(message.toJson(), "utf-8")
+
+        return message.toBytes()
+
     def send(self, host: Host, message: Message) -> bool:
         """Sends a message to the given host
 
@@ -35,11 +79,102 @@ class UdpClient(object):
             bool: Returns true if the message was sent. This does not mean that it reached the destination.
         """
         try:
-            self.s.sendto(bytes(message.toJson(), "utf-8"),
-                          (host.ip, host.port))
+            sent = self._sendRaw(self.encode(message), host)
+        except (ValueError, struct.error) as e:
+            _logger.warning("Could not encode message to {}:{}: {}".format(host.ip, host.port, e))
+            sent = False
+
+        self._count(host, sent)
+
+        return sent
+
+    def sendMany(self, payload: bytes, hosts: Iterable[Host]) -> List[Host]:
+        """Sends the same encoded message to several hosts
+
+        Args:
+            payload (bytes): Encoded message to send
+            hosts (Iterable[Host]): Hosts to send the message to
+
+        Returns:
+            List[Host]: Returns the hosts the message could not be sent to
+        """
+        hosts = list(hosts)
+
+        if self.multicast is not None and self._sendGroup(payload, hosts):
+            for host in hosts:
+                self._count(host, True)
+
+            return []
+
+        vector = self._batchFor(hosts) if self.batch else None
+
+        if vector is None:
+            failed = [host for host in hosts if not self._sendRaw(payload, host)]
+        else:
+            failed = []
+            offset = 0
+            while offset < len(hosts):
+                try:
+                    offset += vector.send(self.s.fileno(), payload, offset)
+                except OSError:
+                    # sendmmsg stops at the first failing destination
+                    self._warn(hosts[offset])
+                    failed.append(hosts[offset])
+                    offset += 1
+
+        for host in hosts:
+            self._count(host, not failed or host not in failed)
+
+        return failed
+
+    def _count(self, host: Host, sent: bool):
+        counters = self._counters.get(host)
+        if counters is None:
+            labels = {'peer': "{}:{}".format(host.ip, host.port)}
+            counters = self._counters[host] = (
+                self.metrics.counter("pyquorum_packets_sent_total",
+                                     "Packets sent to a peer", **labels),
+                self.metrics.counter("pyquorum_send_errors_total",
+                                     "Packets that could not be sent to a peer", **labels))
+
+        counters[0 if sent else 1].inc()
+
+    def _sendGroup(self, payload: bytes, hosts: List[Host]) -> bool:
+        # a single datagram reaches all hosts if they listen on the same port
+        ports = {host.port for host in hosts}
+        if len(ports) != 1:
+            return False
+
+        try:
+            self.s.sendto(payload, (self.multicast, ports.pop()))
+        except OSError as e:
+            _logger.warning("Failed to send to multicast group {}, sending unicast: {}".format(
+                self.multicast, e))
+            self.multicast = None
+            return False
+
+        return True
+
+    def _batchFor(self, hosts: List[Host]) -> Optional[mmsg.SendBatch]:
+        if self._vector is None or self._hosts != hosts:
+            try:
+                self._vector = mmsg.SendBatch([(h.ip, h.port) for h in hosts])
+            except OSError:
+                # not all destinations are IPv4 addresses
+                self._vector = None
+            self._hosts = hosts
+
+        return self._vector
+
+    def _sendRaw(self, payload: bytes, host: Host) -> bool:
+        try:
+            self.s.sendto(payload, (host.ip, host.port))
         except OSError:
-            _logger.warning(
-                "Failed to send healthcheck to {}:{}".format(host.ip, host.port))
+            self._warn(host)
             return False
 
         return True
+
+    def _warn(self, host: Host):
+        _logger.warning(
+            "Failed to send healthcheck to {}:{}".format(host.ip, host.port))
@@ -3,27 +3,83 @@
 import logging
 import socket
 import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 from .handler import BaseHandler
+from .metrics import Counter, Metrics, registry
+from . import mmsg
 
 _logger = logging.getLogger(__name__)
 
+# Largest payload of an IPv4 UDP datagram
+MAX_DATAGRAM = 65507
+
+
+def multicastSocket(group: str, port: int, interface: str) -> socket.socket:
+    """Opens a socket that receives the datagrams sent to a multicast group
+
+    Args:
+        group (str): multicast group address
+        port (int): Port to bind to
+        interface (str): IP address of the interface the group is joined on
+
+    Raises:
+        OSError: Raised if the group can not be joined
+
+    Returns:
+        socket.socket: the bound socket
+    """
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        # nodes sharing a machine receive the group on the same port
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        s.bind((group, port))
+        s.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP,
+                     socket.inet_aton(group) + socket.inet_aton(interface))
+    except OSError:
+        s.close()
+        raise
+
+    return s
+
 
 class UdpServer(threading.Thread):
     """UDP servers that receives messages from the network
     """
 
-    def __init__(self, bind: str, port: int, handler: BaseHandler):
+    def __init__(self, bind: str, port: int, handler: BaseHandler, maxDatagram: int = MAX_DATAGRAM,
+                 rcvbuf: Optional[int] = None, batch: int = 16, metrics: Optional[Metrics] = None,
+                 group: Optional[str] = None, peers: Optional[Iterable[str]] = None):
         """
         Args:
             bind (str): IP address to bind to
             port (int): Port to bind to
             handler (BaseHandler): Handler to call when a message is received
+            maxDatagram (int, optional): Maximum size of a datagram. Defaults to MAX_DATAGRAM.
+            rcvbuf (int, optional): Size of the socket receive buffer. Defaults to the system default.
+            batch (int, optional): Maximum number of datagrams received per wakeup. Defaults to 16.
+            metrics (Metrics, optional): registry to record metrics in. Defaults to the global registry.
+            group (str, optional): Multicast group to receive from, joined on the interface of bind. Defaults to None.
+            peers (Iterable[str], optional): IP addresses whose packets are counted by peer, others are counted as unknown. Defaults to None.
         """
         super().__init__(daemon=True)
         self.bind = bind
+        self.group = group
         self.port = port
         self.handler = handler
+        self.maxDatagram = maxDatagram
+        self.rcvbuf = rcvbuf
+        self.batch = batch
+        self.peers = set(peers or [])
+        self._vector: Optional[mmsg.RecvBatch] = None
+        self._pool: List[memoryview] = []
+
+        self.metrics = metrics if metrics is not None else registry
+        self._received: Dict[str, Counter] = {}
+        self._truncated = self.metrics.counter(
+            "pyquorum_packets_dropped_total", "Received packets that were dropped", reason="truncated")
+        self._empty = self.metrics.counter(
+            "pyquorum_packets_dropped_total", "Received packets that were dropped", reason="empty")
 
     def run(self):
         """Run the server
@@ -36,17 +92,81 @@ class UdpServer(threading.Thread):
         Args:
             forever (bool, optional): Whether the server should listen indefinitely. Defaults to True.
         """
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        s.bind((self.bind, self.port))
+        if self.group is not None:
+            try:
+                s = multicastSocket(self.group, self.port, self.bind)
+            except OSError as e:
+                _logger.warning("Could not join multicast group {}: {}".format(self.group, e))
+                return
+        else:
+            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            s.bind((self.bind, self.port))
 
-        while True:
-            # accept connections from outside
-            data, addr = s.recvfrom(1024)  # buffer size is 1024 bytes
+        if self.rcvbuf:
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+
+        # our own keepalives are looped back if multicast loopback is enabled
+        own = self.bind if self.group is not None else None
+
+        receive = self._recvmmsg if mmsg.RECVMMSG_AVAILABLE else self._recvfrom
 
-            if data:
-                self.handler.handle(addr[0], data.decode("utf-8"))
-            else:
-                _logger.warning("Received invalid data from {}".format(addr))
+        while True:
+            try:
+                for addr, data, truncated in receive(s):
+                    if addr[0] == own:
+                        continue
+                    elif truncated:
+                        self._truncated.inc()
+                        _logger.warning("Dropped truncated datagram from {}".format(addr))
+                    elif data:
+                        self._count(addr[0])
+                        self.handler.handle(addr[0], data)
+                    else:
+                        self._empty.inc()
+                        _logger.warning("Received invalid data from {}".format(addr))
+            except InterruptedError:
+                pass
 
             if not forever:
                 break
+
+    def _count(self, ip: str):
+        # a label per source would let spoofed packets grow the registry
+        peer = ip if ip in self.peers else "unknown"
+        counter = self._received.get(peer)
+        if counter is None:
+            counter = self._received[peer] = self.metrics.counter(
+                "pyquorum_packets_received_total", "Packets received from a peer", peer=peer)
+
+        counter.inc()
+
+    def _recvmmsg(self, s: socket.socket) -> Iterator[Tuple[Tuple[str, int], bytes, bool]]:
+        if self._vector is None:
+            self._vector = mmsg.RecvBatch(self.batch, self.maxDatagram)
+
+        self._vector.recv(s.fileno())
+        return self._vector.datagrams()
+
+    def _recvfrom(self, s: socket.socket) -> Iterator[Tuple[Tuple[str, int], bytes, bool]]:
+        if not self._pool:
+            # one spare byte tells a datagram that was truncated from one that
+            # filled the buffer
+            self._pool = [memoryview(bytearray(self.maxDatagram + 1)) for _ in range(self.batch)]
+
+        # block for the first datagram and drain whatever else is queued
+        # without blocking
+        flags = 0
+        received = []
+        for buf in self._pool:
+            try:
+                n, addr = s.recvfrom_into(buf, 0, flags)
+            except BlockingIOError:
+                break
+
+            received.append((addr, n, buf))
+
+            flags = getattr(socket, "MSG_DONTWAIT", None)
+            if flags is None:
+                break
+
+        return ((addr, bytes(buf[:n]), n > self.maxDatagram) for addr, n, buf in received)
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import stat
+
+import pytest
+
+from pyquorum.admin import AdminServer, main, parse_args, request
+
+__author__ = "Henry Spanka"
+__copyright__ = "Henry Spanka"
+__license__ = "mit"
+
+
+@pytest.fixture
+def server(mocker, tmp_path):
+    reconfig = mocker.MagicMock()
+    reconfig.status.return_value = {'ok': True, 'version': 0, 'members': ["127.0.0.1:10000"],
+                                    'old': None, 'master': "127.0.0.1"}
+    reconfig.change.return_value = {'ok': True, 'forwarded': "127.0.0.1"}
+
+    s = AdminServer(str(tmp_path / "admin.sock"), reconfig)
+    s.start()
+    yield s
+    s.stop()
+
+
+def test_members(server):
+    path = server.server.server_address
+
+    assert request(path, "members")["members"] == ["127.0.0.1:10000"]
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+
+def test_add_and_remove(server):
+    path = server.server.server_address
+
+    assert request(path, "add", ["127.0.0.4"]) == {'ok': True, 'forwarded': "127.0.0.1"}
+    server.reconfig.change.assert_called_with(add=["127.0.0.4"])
+
+    request(path, "remove", ["127.0.0.2:10000"])
+    server.reconfig.change.assert_called_with(remove=["127.0.0.2:10000"])
+
+
+def test_invalid_requests(server):
+    assert server.execute({'command': "add", 'members': []}) == {
+        'ok': False, 'error': "No members given"}
+    assert not server.execute({'command': "drop"})["ok"]
+    server.reconfig.change.assert_not_called()
+
+
+def test_main(server, capsys):
+    path = server.server.server_address
+
+    assert main(["-s", path, "add", "127.0.0.4"]) == 0
+    assert json.loads(capsys.readouterr().out)["forwarded"] == "127.0.0.1"
+
+    server.reconfig.change.return_value = {'ok': False, 'error': "A membership change is in progress"}
+    assert main(["-s", path, "remove", "127.0.0.2"]) == 1
+
+    assert main(["-s", path + ".missing", "members"]) == 1
+
+
+def test_members_are_required():
+    with pytest.raises(SystemExit):
+        parse_args(["add"])
+
+    assert parse_args(["members"]).members == []
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from pyquorum.app import inbox_limits, parse_args
+from pyquorum.groups import GroupMultiplexer, heartbeatFrames
+from pyquorum.host import Host
+from pyquorum.inbox import Inbox
+from pyquorum.metrics import Metrics
+
+__author__ = "Henry Spanka"
+__copyright__ = "Henry Spanka"
+__license__ = "mit"
+
+
+class Group(object):
+    def state(self):
+        return {'master': None, 'quorum': False, 'term': 0}
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize("option", [["--swim"], ["-g", "a"], ["--admin-socket", "/run/q.sock"]])
+def test_legacy_wire_only_sends_pings(option):
+    with pytest.raises(SystemExit):
+        parse_args(["--legacy-wire"] + option + ["127.0.0.2"])
+
+    assert parse_args(option + ["127.0.0.2"]).legacy_wire is False
+
+
+def test_inbox_limits_default():
+    assert inbox_limits(parse_args(["127.0.0.2"])) == (100.0, 200.0)
+    assert inbox_limits(parse_args(["--inbox-rate", "5", "--inbox-burst", "10",
+                                    "-g", "a", "127.0.0.2"])) == (5.0, 10.0)
+
+
+def test_inbox_fits_group_heartbeats(mocker):
+    args = parse_args(["-i", "0.5", "-g", "partition-0", "127.0.0.2"])
+    # argparse takes seconds for 10,000 options
+    args.groups = ["partition-{}".format(i) for i in range(10000)]
+
+    frames = heartbeatFrames(len(args.groups))
+    assert frames == 94
+
+    # the frames a multiplexer of that size sends in one round
+    mux = GroupMultiplexer(Host("127.0.0.2", 10000), [Host("127.0.0.1", 10000)],
+                           mocker.MagicMock(), metrics=Metrics())
+    mux.client.sendMany.return_value = []
+    mux.client.encode.side_effect = lambda m: m.toBytes()
+    mux._send((i, Group()) for i in range(10000))
+    payloads = [c.args[0] for c in mux.client.sendMany.call_args_list]
+    assert len(payloads) == frames
+
+    clock = Clock()
+    metrics = Metrics()
+    inbox = Inbox(mocker.MagicMock(), 1024, *inbox_limits(args), metrics=metrics, clock=clock)
+    inbox.wakeup = mocker.MagicMock()
+
+    # a keepalive round and a round of changed groups every interval
+    for _ in range(20):
+        for payload in payloads + payloads:
+            inbox.handle("127.0.0.2", payload)
+        inbox.drain()
+        clock.now += args.interval
+
+    assert 'pyquorum_packets_dropped_total{reason="rate"} 0' in metrics.render()
+    assert inbox.handler.handle.call_count == 20 * 2 * frames
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+import socket
+
+import pytest
+from pyquorum.udpclient import UdpClient
+from pyquorum.host import Host
+from pyquorum.message import Message, MessageType
+
+__author__ = "Henry Spanka"
+__copyright__ = "Henry Spanka"
+__license__ = "mit"
+
+
+def test_encode_binary():
+    c = UdpClient("127.0.0.1")
+    m = Message(MessageType.PING, {'master': None, 'quorum': False})
+
+    assert c.encode(m) == m.toBytes()
+
+
+def test_encode_legacy():
+    c = UdpClient("127.0.0.1", legacy=True)
+    m = Message(MessageType.PING, {'master': None, 'quorum': False})
+
+    assert c.encode(m) == bytes(m.toJson(), "utf-8")
+
+
+def test_send_hostname_master():
+    r = make_receivers(1)[0]
+    c = UdpClient("127.0.0.1")
+
+    assert c.send(Host("127.0.0.1", r.getsockname()[1]),
+                  Message(MessageType.PING, {'master': "localhost", 'quorum': True}))
+    assert Message.fromBytes(r.recv(1024)).data == {'master': "localhost", 'quorum': True}
+
+
+def test_send_encode_error(caplog):
+    c = UdpClient("127.0.0.1", legacy=True)
+    data = {'seq': 1}
+    data['self'] = data
+
+    assert not c.send(Host("127.0.0.1", 9), Message(MessageType.BEACON, data))
+    assert "Could not encode message to 127.0.0.1:9" in caplog.text
+
+
+def make_receivers(n):
+    receivers = []
+    for _ in range(n):
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        s.bind(("127.0.0.1", 0))
+        s.settimeout(1)
+        receivers.append(s)
+    return receivers
+
+
+@pytest.mark.parametrize("batch", [True, False])
+def test_send_many(batch):
+    receivers = make_receivers(3)
+    hosts = [Host("127.0.0.1", r.getsockname()[1]) for r in receivers]
+
+    c = UdpClient("127.0.0.1", batch=batch)
+
+    for _ in range(2):
+        assert c.sendMany(b"payload", hosts) == []
+        for r in receivers:
+            assert r.recvfrom(1024)[0] == b"payload"
+
+    for r in receivers:
+        r.close()
+
+
+@pytest.mark.parametrize("batch", [True, False])
+def test_send_many_failure(batch, caplog):
+    receivers = make_receivers(2)
+    bad = Host("255.255.255.255", 10000)
+    hosts = [Host("127.0.0.1", receivers[0].getsockname()[1]), bad,
+             Host("127.0.0.1", receivers[1].getsockname()[1])]
+
+    c = UdpClient("127.0.0.1", batch=batch)
+
+    assert c.sendMany(b"payload", hosts) == [bad]
+    for r in receivers:
+        assert r.recvfrom(1024)[0] == b"payload"
+    assert "Failed to send healthcheck to 255.255.255.255:10000" in caplog.text
+
+    for r in receivers:
+        r.close()
+
+
+def test_send_many_hostname():
+    receiver = make_receivers(1)[0]
+    hosts = [Host("localhost", receiver.getsockname()[1])]
+
+    c = UdpClient("127.0.0.1")
+
+    assert c.sendMany(b"payload", hosts) == []
+    assert receiver.recvfrom(1024)[0] == b"payload"
+    receiver.close()
+
+
+def test_send_many_multicast(mocker):
+    c = UdpClient("127.0.0.1", multicast="239.255.42.99", loop=True)
+    s = mocker.patch.object(c, "s")
+    hosts = [Host("127.0.0.2", 10000), Host("127.0.0.3", 10000)]
+
+    assert c.sendMany(b"payload", hosts) == []
+    s.sendto.assert_called_once_with(b"payload", ("239.255.42.99", 10000))
+
+
+def test_send_many_multicast_fallback(mocker, caplog):
+    receivers = make_receivers(2)
+    hosts = [Host("127.0.0.1", r.getsockname()[1]) for r in receivers]
+
+    # the hosts listen on different ports, a single datagram can't reach them
+    c = UdpClient("127.0.0.1", multicast="239.255.42.99")
+    assert c.sendMany(b"payload", hosts) == []
+    for r in receivers:
+        assert r.recvfrom(1024)[0] == b"payload"
+    assert c.multicast == "239.255.42.99"
+
+    c.batch = False
+    s = mocker.patch.object(c, "s")
+    s.sendto.side_effect = [OSError("unreachable"), None, None]
+    assert c.sendMany(b"payload", [Host("127.0.0.2", 10000), Host("127.0.0.3", 10000)]) == []
+    assert c.multicast is None
+    assert s.sendto.call_args_list == [
+        mocker.call(b"payload", ("239.255.42.99", 10000)),
+        mocker.call(b"payload", ("127.0.0.2", 10000)),
+        mocker.call(b"payload", ("127.0.0.3", 10000))]
+    assert "Failed to send to multicast group 239.255.42.99" in caplog.text
+
+    for r in receivers:
+        r.close()
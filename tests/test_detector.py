@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+from pyquorum.detector import PenaltyDetector, PhiAccrualDetector
+from pyquorum.host import Host, HostStatus
+
+__author__ = "Henry Spanka"
+__copyright__ = "Henry Spanka"
+__license__ = "mit"
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_penalty_detector():
+    d = PenaltyDetector()
+
+    assert not d.check(1)
+    assert not d.check(2)
+    assert d.check(3)
+    assert not d.check(4)
+
+
+def test_phi_no_heartbeat():
+    d = PhiAccrualDetector(clock=Clock())
+
+    assert d.phi() == 0.0
+    assert not d.check(10)
+
+
+def test_phi_regular_heartbeats():
+    clock = Clock()
+    d = PhiAccrualDetector(threshold=8.0, interval=0.1, clock=clock)
+
+    for _ in range(20):
+        d.heartbeat()
+        clock.now += 0.1
+
+    assert d.phi() < 1.0
+    assert not d.check(1)
+
+    clock.now += 0.5
+    assert d.phi() > 8.0
+    assert d.check(2)
+    assert not d.check(3)
+
+    d.heartbeat()
+    assert not d.suspected
+
+
+def test_phi_jitter_tolerance():
+    clock = Clock()
+    d = PhiAccrualDetector(threshold=8.0, interval=1.0, clock=clock)
+
+    for i in range(50):
+        d.heartbeat()
+        clock.now += 0.5 if i % 2 else 1.5
+
+    clock.now += 0.5
+    assert not d.check(1)
+
+
+def test_host_uses_detector():
+    clock = Clock()
+    h = Host("127.0.0.2", 10000, PhiAccrualDetector(interval=0.1, clock=clock))
+
+    h.unpunish()
+    assert h.status == HostStatus.UP
+
+    clock.now += 5
+    assert h.punish()
+    assert h.status == HostStatus.DOWN
+
+
+def test_outage_is_not_a_sample():
+    clock = Clock()
+    h = Host("127.0.0.2", 10000, PhiAccrualDetector(interval=1.0, clock=clock))
+
+    for _ in range(10):
+        h.unpunish()
+        clock.now += 1.0
+    expected = h.detector.deadline() - h.detector.last
+
+    h.status = HostStatus.DOWN
+    clock.now += 30.0
+    h.unpunish()
+
+    assert max(h.detector.samples) < 2.0
+    assert h.detector.deadline() - h.detector.last == pytest.approx(expected, abs=0.5)
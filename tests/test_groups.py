@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+from pyquorum.groups import GroupMultiplexer, groupId
+from pyquorum.host import Host, HostStatus
+from pyquorum.message import Message, MessageType
+from pyquorum.metrics import Metrics
+from pyquorum.runner import Runner
+
+__author__ = "Henry Spanka"
+__copyright__ = "Henry Spanka"
+__license__ = "mit"
+
+
+def make_multiplexer(mocker, maxFrame=1400):
+    client = mocker.MagicMock()
+    client.encode.side_effect = lambda m: m.toBytes()
+    client.sendMany.return_value = []
+
+    hosts = [Host("127.0.0.2", 10000), Host("127.0.0.3", 10000)]
+    return GroupMultiplexer(Host("127.0.0.1", 10000), hosts, client, maxFrame, Metrics())
+
+
+def group_ping(entries):
+    return Message(MessageType.GROUP_PING, entries).toBytes()
+
+
+def test_group_id():
+    assert groupId("orders-0") == groupId("orders-0")
+    assert groupId("orders-0") != groupId("orders-1")
+
+
+def test_add_collision(mocker):
+    mux = make_multiplexer(mocker)
+    mux.add("a", Runner(None))
+
+    with pytest.raises(ValueError):
+        mux.add("a", Runner(None))
+
+
+def test_combined_heartbeat(mocker):
+    mux = make_multiplexer(mocker)
+    for i in range(100):
+        mux.add("partition-{}".format(i), Runner(None))
+
+    mux.sendKeepAlives()
+
+    # one frame carries the state of all groups to every peer
+    mux.client.sendMany.assert_called_once()
+    payload, hosts = mux.client.sendMany.call_args[0]
+    assert hosts == mux.hosts
+    assert len(Message.fromBytes(payload).data) == 100
+
+
+def test_heartbeat_split_into_frames(mocker):
+    mux = make_multiplexer(mocker, maxFrame=5 + 10 * 13)
+    for i in range(25):
+        mux.add("partition-{}".format(i), Runner(None))
+
+    mux.sendKeepAlives()
+
+    frames = [Message.fromBytes(c[0][0]).data for c in mux.client.sendMany.call_args_list]
+    assert [len(f) for f in frames] == [10, 10, 5]
+
+
+def test_elects_per_group(mocker):
+    mux = make_multiplexer(mocker)
+    a = mux.add("a", Runner(None))
+    b = mux.add("b", Runner(None))
+    host = mux.getHost("127.0.0.2")
+
+    # the peer votes for us in group a and follows 127.0.0.3 in group b
+    mux.handle("127.0.0.2", group_ping([
+        (groupId("a"), {'master': '127.0.0.1', 'quorum': False}),
+        (groupId("b"), {'master': '127.0.0.3', 'quorum': False}),
+    ]))
+
+    assert host.status == HostStatus.UP
+    assert a.master is a.local and a.quorum
+    assert not b.quorum
+
+    # the new state of the groups is announced in one combined frame
+    mux.client.sendMany.assert_called_once()
+    sent = dict(Message.fromBytes(mux.client.sendMany.call_args[0][0]).data)
+    assert sent[groupId("a")] == {'master': '127.0.0.1', 'quorum': True, 'term': 1}
+
+
+def test_leaders_are_spread(mocker):
+    ips = ["127.0.0.1", "127.0.0.2", "127.0.0.3"]
+    leaders = {}
+
+    for ip in ips:
+        mux = GroupMultiplexer(Host(ip, 10000), [Host(peer, 10000) for peer in ips if peer != ip],
+                               mocker.MagicMock(), metrics=Metrics())
+        for i in range(30):
+            manager = mux.add("partition-{}".format(i), Runner(None))
+            leaders.setdefault(i, set()).add(min(ips, key=manager.addressKey))
+
+    # all nodes agree on the leader of a group and every node leads some groups
+    assert all(len(leader) == 1 for leader in leaders.values())
+    assert {leader.pop() for leader in leaders.values()} == set(ips)
+
+
+def test_status_change_reaches_dependent_groups(mocker):
+    mux = make_multiplexer(mocker)
+    managers = [mux.add("partition-{}".format(i), Runner(None)) for i in range(30)]
+    peer = mux.getHost("127.0.0.2")
+    above = [m for m in managers if m.outranks(peer)]
+    assert 0 < len(above) < len(managers)
+
+    # one listener per host instead of one per group
+    assert len(peer.listeners) == 1
+
+    spies = {m: mocker.spy(m, 'statusChanged') for m in managers}
+    peer.unpunish()
+
+    assert mux.aliveCount() == 1
+    assert all(m.aliveCount() == 1 for m in managers)
+    assert [m for m in managers if spies[m].called] == above
+    assert all(m._aliveLower == 1 for m in above)
+
+
+def test_down_evaluates_dependent_groups(mocker):
+    mux = GroupMultiplexer(Host("127.0.0.1", 10000), [Host("127.0.0.{}".format(i), 10000)
+                                                      for i in range(2, 6)],
+                           mocker.MagicMock(), metrics=Metrics())
+    mux.client.sendMany.return_value = []
+    managers = [mux.add("partition-{}".format(i), Runner(None)) for i in range(30)]
+    for host in mux.hosts:
+        host.unpunish()
+
+    peer = mux.getHost("127.0.0.2")
+    spies = {m: mocker.spy(m, 'evaluate') for m in managers}
+    peer.status = HostStatus.DOWN
+    mux._down(peer)
+
+    # 4 of 5 nodes are still reachable
+    assert [m for m in managers if spies[m].called] == [m for m in managers if m.outranks(peer)]
+
+
+def test_aggregate_gauges(mocker):
+    mux = make_multiplexer(mocker)
+    a = mux.add("a", Runner(None))
+    mux.add("b", Runner(None))
+
+    mux.handle("127.0.0.2", group_ping([(groupId("a"), {'master': '127.0.0.1', 'quorum': False})]))
+    assert a.master is a.local and a.quorum
+
+    rendered = mux.metrics.render()
+    assert 'pyquorum_groups{node="127.0.0.1"} 2' in rendered
+    assert 'pyquorum_groups_master{node="127.0.0.1"} 1' in rendered
+    assert 'pyquorum_alive_hosts{node="127.0.0.1"} 1' in rendered
+    assert "group=" not in rendered
+
+
+def test_unknown_group_ignored(mocker):
+    mux = make_multiplexer(mocker)
+    a = mux.add("a", Runner(None))
+
+    mux.handle("127.0.0.2", group_ping([(groupId("z"), {'master': '127.0.0.2', 'quorum': True})]))
+
+    # the peer is reachable, but its master of group z isn't joined in group a
+    assert mux.getHost("127.0.0.2").status == HostStatus.UP
+    assert a.master is not mux.getHost("127.0.0.2")
+
+
+def test_peer_down_fails_over_groups(mocker):
+    mux = make_multiplexer(mocker)
+    a = mux.add("a", Runner(None))
+    b = mux.add("b", Runner(None))
+    peer = mux.getHost("127.0.0.2")
+
+    mux.handle("127.0.0.2", group_ping([
+        (groupId("a"), {'master': '127.0.0.2', 'quorum': True}),
+        (groupId("b"), {'master': '127.0.0.2', 'quorum': True}),
+    ]))
+    assert a.master is peer and a.quorum
+    assert b.master is peer and b.quorum
+
+    for _ in range(3):
+        mux.update()
+
+    assert peer.status == HostStatus.DOWN
+    assert not a.quorum
+    assert not b.quorum
+
+
+def test_ignores_plain_ping(mocker, caplog):
+    mux = make_multiplexer(mocker)
+    mux.add("a", Runner(None))
+
+    mux.handle("127.0.0.2", Message(MessageType.PING, {'master': None, 'quorum': False}).toBytes())
+
+    assert mux.getHost("127.0.0.2").status == HostStatus.DOWN
+
+
+def test_decode_error(mocker, caplog):
+    mux = make_multiplexer(mocker)
+
+    mux.handle("127.0.0.2", b"\xa7\x01\x05\x00")
+
+    assert mux.decodeErrors.value == 1
+    assert "Could not decode message from 127.0.0.2" in caplog.text
+
+
+def test_handoff(mocker):
+    mux = make_multiplexer(mocker)
+    a = mux.add("a", Runner(None))
+    b = mux.add("b", Runner(None))
+
+    mux.handle("127.0.0.2", group_ping([
+        (groupId("a"), {'master': '127.0.0.1', 'quorum': False}),
+    ]))
+    assert a.master is a.local and a.quorum
+    mux.client.sendMany.reset_mock()
+
+    mux.handoff()
+
+    assert not a.quorum and not a.eligible and not b.eligible
+    mux.client.sendMany.assert_called_once()
+    sent = dict(Message.fromBytes(mux.client.sendMany.call_args[0][0]).data)
+    assert sent[groupId("a")] == {'master': None, 'quorum': False, 'term': 1, 'eligible': False}
+    assert sent[groupId("b")]['eligible'] is False
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+from pyquorum.heartbeat import DeltaHeartbeats, diff
+from pyquorum.host import Host, HostStatus
+from pyquorum.manager import QuorumManager
+from pyquorum.message import Message, MessageType
+from pyquorum.metrics import Metrics
+
+__author__ = "Henry Spanka"
+__copyright__ = "Henry Spanka"
+__license__ = "mit"
+
+
+def make_manager(mocker):
+    m = QuorumManager(Host("127.0.0.4", 10000), [Host("127.0.0.2", 10000)],
+                      mocker.MagicMock(), mocker.MagicMock(), Metrics())
+    m.preVote = False
+    m.heartbeats = DeltaHeartbeats(m, digestEvery=3)
+
+    return m
+
+
+def wire(message):
+    return Message.fromBytes(message.toBytes())
+
+
+def test_diff():
+    old = {'master': None, 'quorum': False, 'term': 1}
+
+    assert diff(old, old) == {}
+    assert diff(old, dict(old, term=2)) == {'term': 2}
+    assert diff(old, dict(old, quorum=True)) == {'master': None, 'quorum': True}
+    assert diff(dict(old, eligible=False), old) == {'master': None, 'quorum': False}
+    assert diff(dict(old, priority=1, load=0.5), dict(old, priority=1, load=0.75)) == \
+        {'priority': 1, 'load': 0.75}
+    # a placement that is no longer sent is cleared
+    assert diff(dict(old, priority=1, load=0.5), old) == {'priority': 0, 'load': None}
+    assert diff(dict(old, priority=0, load=None), old) == {}
+
+
+def test_sender_sends_digest_beacons_and_deltas(mocker):
+    h = make_manager(mocker).heartbeats
+    state = {'master': None, 'quorum': False, 'term': 0}
+
+    m = h.next(state)
+    assert m.type == MessageType.DIGEST
+    assert m.data == dict(state, seq=1)
+
+    m = h.next(state)
+    assert m.type == MessageType.BEACON
+    assert m.data == {'seq': 1}
+
+    m = h.next(dict(state, term=1))
+    assert m.type == MessageType.DELTA
+    assert m.data == {'seq': 2, 'term': 1}
+
+    # the full state is sent every third round
+    assert h.next(dict(state, term=1)).type == MessageType.DIGEST
+    assert h.next(dict(state, term=1)).type == MessageType.BEACON
+
+
+def test_announce_uses_heartbeats(mocker):
+    m = make_manager(mocker)
+    m.client.sendMany.return_value = []
+    m.getHost("127.0.0.2").unpunish()
+
+    m.sendKeepAlives()
+    m.sendKeepAlives()
+
+    types = [c.args[0].type for c in m.client.encode.call_args_list]
+    assert types == [MessageType.DIGEST, MessageType.BEACON]
+
+
+def test_receiver_applies_states(mocker):
+    m = make_manager(mocker)
+    host = m.getHost("127.0.0.2")
+    sender = DeltaHeartbeats(make_manager(mocker))
+    spy = mocker.spy(m, "ping")
+
+    state = {'master': '127.0.0.2', 'quorum': False, 'term': 0}
+    m.heartbeats.handle(host, wire(sender.next(state)))
+    m.heartbeats.handle(host, wire(sender.next(state)))
+    m.heartbeats.handle(host, wire(sender.next(dict(state, quorum=True))))
+
+    assert spy.call_args_list == [
+        mocker.call(host, state), mocker.call(host, state),
+        mocker.call(host, dict(state, quorum=True))]
+    assert m.master is host
+    assert m.quorum
+    m.client.send.assert_not_called()
+
+
+def test_delta_clears_placement(mocker):
+    m = make_manager(mocker)
+    host = m.getHost("127.0.0.2")
+    sender = DeltaHeartbeats(make_manager(mocker))
+
+    state = {'master': None, 'quorum': False, 'term': 0}
+    m.heartbeats.handle(host, wire(sender.next(dict(state, priority=2, load=0.5))))
+    assert m._placement[host] == (2, 0.5)
+
+    # the load probe failed and the placement dropped out of the state
+    message = sender.next(state)
+    assert message.type == MessageType.DELTA
+    m.heartbeats.handle(host, wire(message))
+
+    assert m._placement[host] == (0, None)
+
+
+def test_delta_resets_eligibility(mocker):
+    m = make_manager(mocker)
+    host = m.getHost("127.0.0.2")
+    sender = DeltaHeartbeats(make_manager(mocker))
+
+    state = {'master': None, 'quorum': False, 'eligible': False, 'term': 0}
+    m.heartbeats.handle(host, wire(sender.next(state)))
+    m.heartbeats.handle(host, wire(sender.next({'master': None, 'quorum': True, 'term': 0})))
+
+    assert m.heartbeats.peers[host] == (2, {'master': None, 'quorum': True, 'term': 0})
+
+
+def test_gap_requests_digest(mocker):
+    m = make_manager(mocker)
+    host = m.getHost("127.0.0.2")
+    host.status = HostStatus.DOWN
+    sender = DeltaHeartbeats(make_manager(mocker))
+    spy = mocker.spy(m, "receive")
+
+    state = {'master': None, 'quorum': False, 'term': 0}
+    m.heartbeats.handle(host, wire(sender.next(state)))
+    # the delta to term 1 is lost
+    sender.next(dict(state, term=1))
+    m.heartbeats.handle(host, wire(sender.next(dict(state, term=2))))
+
+    assert spy.call_count == 1
+    assert host.status == HostStatus.UP
+    m.client.send.assert_called_once_with(host, mocker.ANY)
+    request = m.client.send.call_args.args[1]
+    assert request.type == MessageType.SYNC_REQUEST
+    assert request.data == {'seq': 1}
+    assert "pyquorum_heartbeat_resyncs_total" in m.metrics.render()
+
+    # the peer answers the request with its full state
+    sender.manager.heartbeats = sender
+    sender.handle(host, wire(request))
+    digest = sender.manager.client.send.call_args.args[1]
+    assert digest.type == MessageType.DIGEST
+
+    m.heartbeats.handle(host, wire(digest))
+    assert m.heartbeats.peers[host] == (3, dict(state, term=2))
+    assert m.term == 2
+
+
+def test_unknown_peer_beacon_requests_digest(mocker):
+    m = make_manager(mocker)
+    host = m.getHost("127.0.0.2")
+
+    m.heartbeats.handle(host, wire(Message(MessageType.BEACON, {'seq': 5})))
+
+    request = m.client.send.call_args.args[1]
+    assert request.type == MessageType.SYNC_REQUEST
+    assert request.data == {'seq': 0}
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+from pyquorum.inbox import Inbox, TokenBucket
+from pyquorum.message import Message, MessageType
+from pyquorum.metrics import Metrics
+
+__author__ = "Henry Spanka"
+__copyright__ = "Henry Spanka"
+__license__ = "mit"
+
+
+def ping(master, quorum=True):
+    return Message(MessageType.PING, {'master': master, 'quorum': quorum}).toBytes()
+
+
+def probe():
+    return Message(MessageType.PROBE, {'target': '127.0.0.3', 'seq': 1}).toBytes()
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_inbox(mocker, **kwargs):
+    metrics = Metrics()
+    inbox = Inbox(mocker.MagicMock(), metrics=metrics, **kwargs)
+    inbox.wakeup = mocker.MagicMock()
+
+    return inbox, metrics
+
+
+def test_token_bucket():
+    b = TokenBucket(10, 2, 0.0)
+
+    assert b.take(0.0)
+    assert b.take(0.0)
+    assert not b.take(0.0)
+    assert not b.take(0.05)
+    assert b.take(0.15)
+
+
+def test_pings_are_coalesced_per_peer(mocker):
+    inbox, metrics = make_inbox(mocker)
+
+    inbox.handle("127.0.0.2", ping(None, False))
+    inbox.handle("127.0.0.2", ping("127.0.0.1"))
+    inbox.handle("127.0.0.3", ping("127.0.0.1"))
+
+    assert inbox.depth() == 2
+    inbox.wakeup.assert_called_once()
+
+    assert inbox.drain() == 2
+    inbox.handler.handle.assert_has_calls([
+        mocker.call("127.0.0.2", ping("127.0.0.1")),
+        mocker.call("127.0.0.3", ping("127.0.0.1")),
+    ])
+    assert inbox.handler.handle.call_count == 2
+    assert inbox.depth() == 0
+    assert "pyquorum_packets_coalesced_total 1" in metrics.render()
+
+
+def test_other_messages_are_queued_in_order(mocker):
+    inbox, _ = make_inbox(mocker)
+
+    inbox.handle("127.0.0.2", probe())
+    inbox.handle("127.0.0.2", b"legacy")
+    inbox.handle("127.0.0.2", probe())
+
+    assert inbox.drain() == 3
+    assert [c.args[1] for c in inbox.handler.handle.call_args_list] == \
+        [probe(), b"legacy", probe()]
+
+
+def test_arrival_order_is_kept(mocker):
+    inbox, _ = make_inbox(mocker)
+
+    inbox.handle("127.0.0.2", probe())
+    inbox.handle("127.0.0.3", ping(None, False))
+    inbox.handle("127.0.0.2", b"legacy")
+    inbox.handle("127.0.0.3", ping("127.0.0.1"))
+
+    # the coalesced ping is handled after the messages that arrived before it
+    assert inbox.drain() == 3
+    assert [c.args[1] for c in inbox.handler.handle.call_args_list] == \
+        [probe(), b"legacy", ping("127.0.0.1")]
+
+
+def test_full_inbox_drops(mocker):
+    inbox, metrics = make_inbox(mocker, capacity=2)
+
+    for _ in range(3):
+        inbox.handle("127.0.0.2", probe())
+
+    # pings don't count against the capacity
+    inbox.handle("127.0.0.2", ping("127.0.0.1"))
+
+    assert inbox.depth() == 3
+    assert 'pyquorum_packets_dropped_total{reason="inbox_full"} 1' in metrics.render()
+
+
+def test_full_inbox_keeps_tokens(mocker):
+    inbox, metrics = make_inbox(mocker, capacity=1, rate=0, burst=2)
+
+    inbox.handle("127.0.0.2", probe())
+    inbox.handle("127.0.0.2", probe())
+    inbox.handle("127.0.0.2", probe())
+    assert 'pyquorum_packets_dropped_total{reason="inbox_full"} 2' in metrics.render()
+
+    # the packets dropped for the capacity didn't use up the bucket
+    inbox.handle("127.0.0.2", ping("127.0.0.1"))
+    assert inbox.depth() == 2
+    assert 'pyquorum_packets_dropped_total{reason="rate"} 0' in metrics.render()
+
+
+def test_rate_limit_per_source(mocker):
+    clock = Clock()
+    inbox, metrics = make_inbox(mocker, rate=1, burst=2, clock=clock)
+
+    for _ in range(3):
+        inbox.handle("127.0.0.2", probe())
+    inbox.handle("127.0.0.3", probe())
+
+    assert inbox.depth() == 3
+    assert 'pyquorum_packets_dropped_total{reason="rate"} 1' in metrics.render()
+
+    clock.now = 1.0
+    inbox.handle("127.0.0.2", probe())
+    assert inbox.depth() == 4
+
+
+def test_max_sources_evicts_least_recent(mocker):
+    inbox, metrics = make_inbox(mocker, rate=0, burst=2, maxSources=2)
+
+    inbox.handle("127.0.0.2", probe())
+    inbox.handle("127.0.0.3", probe())
+    inbox.handle("127.0.0.2", probe())
+
+    # a new source is still admitted and evicts the bucket of 127.0.0.3
+    inbox.handle("127.0.0.4", probe())
+    assert inbox.depth() == 4
+    assert list(inbox._buckets) == ["127.0.0.2", "127.0.0.4"]
+    assert "pyquorum_inbox_sources_evicted_total 1" in metrics.render()
+
+    # the bucket of 127.0.0.2 is kept and still empty
+    inbox.handle("127.0.0.2", probe())
+    assert inbox.depth() == 4
+
+
+def test_thread_drains(mocker):
+    handled = threading.Event()
+    handler = mocker.MagicMock()
+    handler.handle.side_effect = lambda ip, data: handled.set()
+
+    inbox = Inbox(handler, metrics=Metrics())
+    inbox.start()
+
+    inbox.handle("127.0.0.2", ping("127.0.0.1"))
+    assert handled.wait(5)
+
+    inbox.stop()
+    inbox.join(5)
+    assert not inbox.is_alive()
@@ -1,20 +1,35 @@
 # -*- coding: utf-8 -*-
 
+import json
+
 import pytest
 from pyquorum.manager import QuorumManager
 from pyquorum.host import Host, HostStatus
+from pyquorum.message import MessageType
+from pyquorum.runner import Runner
 
 __author__ = "Henry Spanka"
 __copyright__ = "Henry Spanka"
 __license__ = "mit"
 
 
+def without_prevote(m):
+    # the managers in these tests have no network to ask for pre-votes
+    m.preVote = False
+    return m
+
+
 def make_manager():
-    return QuorumManager(Host("127.0.0.1", 10000), {}, None, None)
+    return without_prevote(QuorumManager(Host("127.0.0.1", 10000), {}, None, Runner(None)))
 
 
 def make_manager_hosts():
-    return QuorumManager(Host("127.0.0.1", 10000), {Host("127.0.0.2", 10000), Host("127.0.0.3", 10000)}, None, None)
+    return without_prevote(QuorumManager(Host("127.0.0.1", 10000), {Host("127.0.0.2", 10000), Host("127.0.0.3", 10000)}, None, None))
+
+
+def make_follower_hosts():
+    # the local node ranks last, so it follows the master announced by its peers
+    return without_prevote(QuorumManager(Host("127.0.0.4", 10000), {Host("127.0.0.2", 10000), Host("127.0.0.3", 10000)}, None, None))
 
 
 def make_host():
@@ -35,7 +50,7 @@ def test_ping(mocker, caplog):
 
 
 def test_ping_master(mocker, caplog):
-    m = make_manager_hosts()
+    m = make_follower_hosts()
     host = m.getHost("127.0.0.2")
 
     m.ping(host, {'master': '127.0.0.2', 'quorum': False})
@@ -44,6 +59,22 @@ def test_ping_master(mocker, caplog):
     assert "Trying to join master 127.0.0.2" in caplog.text
 
 
+def test_lowest_takes_over_after_ping(mocker, caplog):
+    m = make_manager_hosts()
+    m.runner = Runner(None)
+    host = m.getHost("127.0.0.2")
+
+    # we rank before the announced master and propose ourselves right away
+    m.ping(host, {'master': '127.0.0.2', 'quorum': False})
+    assert "Trying to join master 127.0.0.2" in caplog.text
+    assert m.master is m.local
+    assert not m.quorum
+
+    m.ping(host, {'master': '127.0.0.1', 'quorum': False, 'term': 1})
+    assert m.quorum
+    assert "Elected myself as new master with 2 of 3 votes" in caplog.text
+
+
 def test_ping_master_quorum(mocker, caplog):
     m = make_manager_hosts()
     host = m.getHost("127.0.0.2")
@@ -58,7 +89,7 @@ def test_ping_master_quorum(mocker, caplog):
 
 
 def test_ping_master_no_quorum(mocker, caplog):
-    m = make_manager_hosts()
+    m = make_follower_hosts()
     host = m.getHost("127.0.0.2")
 
     m.master = host
@@ -108,13 +139,13 @@ def test_keepalive(mocker):
     m = make_manager_hosts()
 
     m.client = mocker.MagicMock()
-    m.client.send.return_value = True
+    m.client.sendMany.return_value = []
 
     m.sendKeepAlives()
 
-    for host in m.hosts:
-        m.client.send.assert_called()
-        punish.assert_not_called()
+    m.client.encode.assert_called_once()
+    m.client.sendMany.assert_called_once()
+    punish.assert_not_called()
 
 
 def test_keepalive_fail(mocker):
@@ -122,13 +153,12 @@ def test_keepalive_fail(mocker):
     m = make_manager_hosts()
 
     m.client = mocker.MagicMock()
-    m.client.send.return_value = False
+    m.client.sendMany.return_value = list(m.hosts)
 
     m.sendKeepAlives()
 
-    for host in m.hosts:
-        m.client.send.assert_called()
-        punish.assert_called()
+    m.client.sendMany.assert_called_once()
+    assert punish.call_count == len(m.hosts)
 
 
 def test_elect_master(mocker, caplog):
@@ -167,3 +197,561 @@ def test_elect_master_2votes(mocker, caplog):
     stub.assert_called_once()
 
     assert "Elected myself as new master with 2 of 3 votes" in caplog.text
+
+
+def test_get_host_by_address():
+    m = make_manager_hosts()
+
+    assert m.getHost("127.0.0.2", 10000).ip == "127.0.0.2"
+    with pytest.raises(Exception):
+        m.getHost("127.0.0.2", 10001)
+
+
+def test_alive_counters():
+    m = without_prevote(QuorumManager(Host("127.0.0.2", 10000), [Host("127.0.0.1", 10000),
+                                                                 Host("127.0.0.3", 10000)], None, None))
+    lower = m.getHost("127.0.0.1")
+    higher = m.getHost("127.0.0.3")
+
+    assert m.aliveCount() == 0
+    assert m.ranking == [lower, higher]
+
+    lower.unpunish()
+    higher.unpunish()
+    assert m.aliveCount() == 2
+    assert m._aliveLower == 1
+
+    lower.status = HostStatus.DOWN
+    assert m.aliveCount() == 1
+    assert m._aliveLower == 0
+    assert len(m.aliveHosts()) == m.aliveCount()
+
+
+def test_propose_lowest(mocker):
+    m = without_prevote(QuorumManager(Host("127.0.0.2", 10000), [Host("127.0.0.1", 10000),
+                                                                 Host("127.0.0.3", 10000)], None, None))
+    m.getHost("127.0.0.3").unpunish()
+
+    m.update()
+    assert m.master == m.local
+
+    m.master = None
+    m.getHost("127.0.0.1").unpunish()
+
+    m.update()
+    assert m.master is None
+
+
+def test_compare_ip():
+    assert QuorumManager.compareIp("10.0.0.2", "10.0.0.10")
+    assert not QuorumManager.compareIp("10.0.0.10", "10.0.0.2")
+    assert QuorumManager.compareIp("10.0.0.2", "localhost")
+
+
+def test_seeded_ranking():
+    hosts = [Host("127.0.0.{}".format(i), 10000) for i in range(2, 6)]
+    plain = QuorumManager(Host("127.0.0.1", 10000), hosts, None, None)
+    seeded = QuorumManager(Host("127.0.0.1", 10000), hosts, None, None, seed=7)
+
+    assert plain.ranking == hosts
+    assert [h.ip for h in seeded.ranking] == ["127.0.0.3", "127.0.0.5", "127.0.0.2", "127.0.0.4"]
+    assert seeded.addressKey("127.0.0.2") == \
+        QuorumManager(Host("127.0.0.2", 10000), [], None, None, seed=7).addressKey("127.0.0.2")
+
+
+def test_ping_does_not_join_down_master(caplog):
+    m = make_follower_hosts()
+    host = m.getHost("127.0.0.2")
+
+    # 127.0.0.2 still follows 127.0.0.3 which we consider down
+    m.ping(host, {'master': '127.0.0.3', 'quorum': True})
+
+    assert m.master is None
+    assert not m.quorum
+    assert "Trying to join master" not in caplog.text
+
+
+def test_ping_elects_without_tick(mocker, caplog):
+    m = QuorumManager(Host("127.0.0.1", 10000), {Host("127.0.0.2", 10000), Host("127.0.0.3", 10000)},
+                      mocker.MagicMock(), Runner(None))
+    m.client.sendMany.return_value = []
+
+    m.ping(m.getHost("127.0.0.2"), {'master': '127.0.0.1', 'quorum': False})
+
+    # asks for pre-votes before proposing itself
+    assert m.master is None
+    m.client.encode.assert_called_once()
+    request = m.client.encode.call_args[0][0]
+    assert request.type == MessageType.PREVOTE_REQUEST
+    assert request.data == {'term': 1}
+
+    m.preVoteResponse(m.getHost("127.0.0.2"), {'term': 1, 'current': 0, 'granted': True})
+
+    assert m.master is m.local
+    assert m.term == 1
+    assert m.quorum
+    assert "Elected myself as new master with 2 of 3 votes" in caplog.text
+    # the new master is announced right away
+    assert m.client.sendMany.call_count == 2
+    assert m.client.encode.call_args[0][0].type == MessageType.PING
+
+
+def test_master_watchdog(mocker):
+    from pyquorum.detector import PenaltyDetector
+
+    now = [0.0]
+    scheduler = mocker.MagicMock()
+    master = Host("127.0.0.2", 10000, PenaltyDetector(3, 1.0, lambda: now[0]))
+    m = QuorumManager(Host("127.0.0.4", 10000), {master, Host("127.0.0.3", 10000)}, None, None)
+    m.scheduler = scheduler
+
+    m.ping(master, {'master': '127.0.0.2', 'quorum': True})
+    assert m.master is master and m.quorum
+
+    delay, check = scheduler.callLater.call_args[0]
+    assert delay == 3.0
+
+    # a keepalive moved the deadline, the check is rescheduled
+    now[0] = 2.0
+    m.ping(master, {'master': '127.0.0.2', 'quorum': True})
+    now[0] = 3.0
+    check()
+    assert master.status == HostStatus.UP
+    assert scheduler.callLater.call_args[0][0] == 2.0
+
+    now[0] = 5.0
+    scheduler.callLater.call_args[0][1]()
+    assert master.status == HostStatus.DOWN
+    assert not m.quorum
+
+
+def test_update_only_touches_expired_hosts(mocker, caplog):
+    from pyquorum.detector import PenaltyDetector
+
+    now = [0.0]
+    hosts = [Host("127.0.0.{}".format(i), 10000, PenaltyDetector(3, 1.0, lambda: now[0]))
+             for i in (2, 3)]
+    m = without_prevote(QuorumManager(Host("127.0.0.4", 10000), hosts, None, None))
+    punish = mocker.spy(Host, 'punish')
+    deadline = mocker.spy(PenaltyDetector, 'deadline')
+
+    for host in hosts:
+        m.ping(host, {'master': None, 'quorum': False})
+
+    caplog.clear()
+    deadline.reset_mock()
+    now[0] = 2.0
+    m.ping(hosts[0], {'master': None, 'quorum': False})
+    m.update()
+
+    deadline.assert_not_called()
+    assert "127.0.0.2" not in caplog.text
+
+    # the deadline of the second host passed, the first one is watched until its new deadline
+    now[0] = 3.0
+    m.update()
+    assert hosts[0].status == HostStatus.UP
+    assert hosts[1].status == HostStatus.DOWN
+    assert deadline.call_count == 2
+
+    now[0] = 5.0
+    m.update()
+    assert hosts[0].status == HostStatus.DOWN
+    punish.assert_not_called()
+
+
+def test_hosts_without_deadline_are_punished():
+    m = make_manager_hosts()
+    host = m.getHost("127.0.0.2")
+
+    # no keepalive arrived, the detector doesn't know the deadline
+    host.status = HostStatus.UP
+    for _ in range(3):
+        m.update()
+
+    assert host.status == HostStatus.DOWN
+    assert host.penalty == 3
+
+
+def test_default_detector_counts_ticks():
+    m = make_manager_hosts()
+    host = m.getHost("127.0.0.2")
+
+    # a host without an explicit detector doesn't know the tick interval
+    m.ping(host, {'master': None, 'quorum': False})
+    assert host.detector.deadline() is None
+
+    m.update()
+    m.update()
+    assert host.status == HostStatus.UP
+
+    m.update()
+    assert host.status == HostStatus.DOWN
+
+
+def test_expiry_is_scheduled_at_earliest_deadline(mocker):
+    from pyquorum.detector import PenaltyDetector
+
+    now = [0.0]
+    scheduler = mocker.MagicMock()
+    hosts = [Host("127.0.0.{}".format(i), 10000, PenaltyDetector(3, 1.0, lambda: now[0]))
+             for i in (2, 3)]
+    m = without_prevote(QuorumManager(Host("127.0.0.4", 10000), hosts, None, None))
+    m.scheduler = scheduler
+
+    m.ping(hosts[0], {'master': None, 'quorum': False})
+    now[0] = 1.0
+    m.ping(hosts[1], {'master': None, 'quorum': False})
+
+    # the timer of the first deadline covers the second one
+    scheduler.callLater.assert_called_once()
+    assert scheduler.callLater.call_args[0][0] == 3.0
+
+    now[0] = 3.0
+    scheduler.callLater.call_args[0][1]()
+    assert hosts[0].status == HostStatus.DOWN
+    assert scheduler.callLater.call_args[0][0] == 1.0
+
+
+def test_resign(mocker, caplog):
+    m = QuorumManager(Host("127.0.0.1", 10000), {Host("127.0.0.2", 10000), Host("127.0.0.3", 10000)},
+                      mocker.MagicMock(), mocker.MagicMock())
+    m.client.sendMany.return_value = []
+    m.client.encode.side_effect = lambda message: message
+
+    m.ping(m.getHost("127.0.0.2"), {'master': '127.0.0.1', 'quorum': False})
+    m.preVoteResponse(m.getHost("127.0.0.2"), {'term': 1, 'current': 0, 'granted': True})
+    assert m.master is m.local and m.quorum
+
+    m.resign()
+
+    assert m.master is None and not m.quorum
+    message = m.client.sendMany.call_args[0][0]
+    assert message.data == {'master': None, 'quorum': False, 'term': 1, 'eligible': False}
+
+    # still voted for by a peer that didn't notice yet
+    m.ping(m.getHost("127.0.0.2"), {'master': '127.0.0.1', 'quorum': True})
+    assert m.master is None and not m.quorum
+
+    m.reinstate()
+    m.preVoteResponse(m.getHost("127.0.0.3"), {'term': 2, 'current': 1, 'granted': True})
+    assert m.master is m.local
+
+
+def test_handoff(mocker, caplog):
+    m = QuorumManager(Host("127.0.0.1", 10000), {Host("127.0.0.2", 10000), Host("127.0.0.3", 10000)},
+                      mocker.MagicMock(), mocker.MagicMock())
+    m.client.sendMany.return_value = []
+    m.client.encode.side_effect = lambda message: message
+
+    m.ping(m.getHost("127.0.0.2"), {'master': '127.0.0.1', 'quorum': False})
+    m.ping(m.getHost("127.0.0.3"), {'master': '127.0.0.1', 'quorum': False})
+    m.preVoteResponse(m.getHost("127.0.0.2"), {'term': 1, 'current': 0, 'granted': True})
+    assert m.master is m.local and m.quorum
+
+    m.handoff()
+
+    assert m.master is None and not m.quorum and not m.eligible
+    m.runner.stop.assert_called_once()
+    message = m.client.sendMany.call_args[0][0]
+    assert message.type == MessageType.RESIGN
+    assert message.data == {'term': 1, 'successor': '127.0.0.2'}
+    assert "Handing off leadership to 127.0.0.2" in caplog.text
+
+
+def test_follower_handoff_has_no_successor(mocker):
+    m = QuorumManager(Host("127.0.0.4", 10000), {Host("127.0.0.2", 10000)},
+                      mocker.MagicMock(), mocker.MagicMock())
+    m.client.encode.side_effect = lambda message: message
+
+    m.handoff()
+
+    assert m.client.sendMany.call_args[0][0].data == {'term': 0, 'successor': None}
+
+
+def test_resignation_of_master(caplog):
+    m = make_follower_hosts()
+    master = m.getHost("127.0.0.2")
+    successor = m.getHost("127.0.0.3")
+
+    m.ping(master, {'master': '127.0.0.2', 'quorum': True, 'term': 1})
+    m.ping(successor, {'master': '127.0.0.2', 'quorum': True, 'term': 1})
+    assert m.master is master and m.quorum
+
+    m.resignation(master, {'term': 1, 'successor': '127.0.0.3'})
+
+    assert master.status == HostStatus.DOWN
+    assert m.master is None and not m.quorum
+    assert "Host 127.0.0.2 is leaving the cluster" in caplog.text
+
+    # the successor is joined as soon as it proposes itself
+    m.ping(successor, {'master': '127.0.0.3', 'quorum': True, 'term': 2})
+    assert m.master is successor and m.quorum
+
+
+def test_nominated_successor_campaigns(mocker, caplog):
+    m = QuorumManager(Host("127.0.0.2", 10000), {Host("127.0.0.1", 10000), Host("127.0.0.3", 10000)},
+                      mocker.MagicMock(), mocker.MagicMock())
+    m.client.sendMany.return_value = []
+    m.client.encode.side_effect = lambda message: message
+    master = m.getHost("127.0.0.1")
+
+    m.ping(master, {'master': '127.0.0.1', 'quorum': True, 'term': 1})
+    m.ping(m.getHost("127.0.0.3"), {'master': '127.0.0.1', 'quorum': True, 'term': 1})
+    # a pre-vote of an earlier attempt is still outstanding
+    m._preVoteTerm = 5
+
+    m.resignation(master, {'term': 1, 'successor': '127.0.0.2'})
+
+    assert "Nominated as successor of 127.0.0.1" in caplog.text
+    message = m.client.sendMany.call_args[0][0]
+    assert message.type == MessageType.PREVOTE_REQUEST
+    assert message.data == {'term': 2}
+
+    m.preVoteResponse(m.getHost("127.0.0.3"), {'term': 2, 'current': 1, 'granted': True})
+    assert m.master is m.local and m.term == 2
+
+
+def test_isolated_node_requests_state(mocker):
+    m = QuorumManager(Host("127.0.0.4", 10000), {Host("127.0.0.2", 10000)},
+                      mocker.MagicMock(), mocker.MagicMock())
+    m.client.sendMany.return_value = []
+    m.client.encode.side_effect = lambda message: message
+
+    m.sendKeepAlives()
+    assert m.client.sendMany.call_args[0][0].type == MessageType.STATE_REQUEST
+
+    m.getHost("127.0.0.2").unpunish()
+    m.sendKeepAlives()
+    assert m.client.sendMany.call_args[0][0].type == MessageType.PING
+
+
+# message types understood by the version before the binary wire format
+LEGACY_TYPES = {MessageType.PING.value}
+
+
+def legacy_types(m):
+    return [json.loads(c.args[0])["type"] for c in m.client.sendMany.call_args_list]
+
+
+def make_legacy_manager(mocker):
+    m = QuorumManager(Host("127.0.0.1", 10000), {Host("127.0.0.2", 10000), Host("127.0.0.3", 10000)},
+                      mocker.MagicMock(), mocker.MagicMock())
+    m.legacy = True
+    m.client.sendMany.return_value = []
+    m.client.encode.side_effect = lambda message: bytes(message.toJson(), "utf-8")
+
+    return m
+
+
+def test_legacy_isolated_node_only_pings(mocker):
+    m = make_legacy_manager(mocker)
+
+    m.sendKeepAlives()
+    assert set(legacy_types(m)) <= LEGACY_TYPES
+
+
+def test_legacy_candidate_skips_prevote(mocker):
+    m = make_legacy_manager(mocker)
+
+    # the lowest node proposes itself without asking for pre-votes
+    m.getHost("127.0.0.2").unpunish()
+    m.update()
+
+    assert m.master is m.local
+    assert set(legacy_types(m)) <= LEGACY_TYPES
+
+
+def test_legacy_handoff_pings(mocker):
+    m = make_legacy_manager(mocker)
+
+    m.handoff()
+
+    assert legacy_types(m) == [MessageType.PING.value]
+    assert json.loads(json.loads(m.client.sendMany.call_args[0][0])["data"])["master"] is None
+
+
+def test_state_request_is_answered(mocker):
+    m = QuorumManager(Host("127.0.0.2", 10000), {Host("127.0.0.3", 10000), Host("127.0.0.4", 10000)},
+                      mocker.MagicMock(), mocker.MagicMock())
+    m.client.sendMany.return_value = []
+    m.preVote = False
+    newcomer = m.getHost("127.0.0.4")
+
+    m.ping(m.getHost("127.0.0.3"), {'master': '127.0.0.2', 'quorum': False})
+    assert m.master is m.local and m.quorum
+
+    m.stateRequest(newcomer, {'master': None, 'quorum': False, 'term': 0})
+
+    assert newcomer.status == HostStatus.UP
+    host, message = m.client.send.call_args[0]
+    assert host is newcomer
+    assert message.type == MessageType.PING
+    assert message.data == {'master': '127.0.0.2', 'quorum': True, 'term': 1}
+
+
+def test_higher_priority_wins(mocker):
+    m = make_follower_hosts()
+    m.client = mocker.MagicMock()
+    m.client.sendMany.return_value = []
+    lower = m.getHost("127.0.0.2")
+
+    m.ping(lower, {'master': None, 'quorum': False})
+    m.ping(m.getHost("127.0.0.3"), {'master': None, 'quorum': False})
+    assert m.master is None
+
+    # a higher priority beats the lower address
+    m.setPlacement(1, None)
+    assert m.master is None
+    m.evaluate()
+    assert m.master is m.local
+
+    assert m.successor() is lower
+    m.ping(lower, {'master': None, 'quorum': False, 'priority': 2, 'load': None})
+    assert m.successor() is lower
+    assert m._aliveLower == 1
+
+
+def test_lower_load_wins_in_steps(mocker):
+    m = make_follower_hosts()
+    lower = m.getHost("127.0.0.2")
+    m.ping(lower, {'master': None, 'quorum': False, 'priority': 0, 'load': 0.3})
+
+    m.setPlacement(0, 0.26)
+    assert lower in m._lower
+
+    # more than a step less loaded than the host with the lower address
+    m.setPlacement(0, 0.1)
+    assert lower not in m._lower
+    assert m._aliveLower == 0
+
+    m.ping(lower, {'master': None, 'quorum': False, 'priority': 0, 'load': 0.0})
+    assert lower in m._lower
+    assert m._aliveLower == 1
+
+
+def test_master_steps_down_for_higher_priority(mocker, caplog):
+    m = QuorumManager(Host("127.0.0.1", 10000), [Host("127.0.0.2", 10000), Host("127.0.0.3", 10000)],
+                      mocker.MagicMock(), mocker.MagicMock())
+    m.preVote = False
+    m.client.sendMany.return_value = []
+    preferred = m.getHost("127.0.0.3")
+
+    m.ping(m.getHost("127.0.0.2"), {'master': '127.0.0.1', 'quorum': False})
+    assert m.master is m.local and m.quorum
+
+    # a lower load doesn't move a working master
+    m.ping(preferred, {'master': '127.0.0.1', 'quorum': True, 'term': 1, 'priority': 0, 'load': 0.0})
+    m.setPlacement(0, 3.0)
+    m.update()
+    assert m.master is m.local and m.quorum
+
+    m.ping(preferred, {'master': '127.0.0.1', 'quorum': True, 'term': 1, 'priority': 1, 'load': 0.0})
+    m.update()
+
+    assert not m.quorum
+    assert m.master is None
+    assert "Stepping down for a node with a higher priority" in caplog.text
+
+    m.ping(preferred, {'master': '127.0.0.3', 'quorum': True, 'term': 2, 'priority': 1, 'load': 0.0})
+    assert m.master is preferred and m.quorum
+
+
+def test_update_samples_load(mocker):
+    m = make_manager_hosts()
+    m.probe = mocker.MagicMock()
+    m.probe.sample.return_value = 0.5
+
+    m.update()
+
+    assert m.load == 0.5
+    assert m.state()['load'] == 0.5
+    assert m.state()['priority'] == 0
+
+
+def test_master_steps_down(caplog):
+    m = make_manager_hosts()
+    master = m.getHost("127.0.0.2")
+    other = m.getHost("127.0.0.3")
+
+    m.ping(master, {'master': '127.0.0.2', 'quorum': True})
+    m.ping(other, {'master': '127.0.0.2', 'quorum': True})
+    assert m.master is master and m.quorum
+
+    m.ping(master, {'master': None, 'quorum': False, 'eligible': False})
+
+    assert "Master 127.0.0.2 stepped down" in caplog.text
+    assert "Host 127.0.0.2 resigned" in caplog.text
+    # 127.0.0.3 is now the lowest eligible host
+    m.ping(other, {'master': '127.0.0.3', 'quorum': True})
+    assert m.master is other and m.quorum
+
+
+def test_ineligible_lower_host_is_skipped():
+    m = without_prevote(QuorumManager(Host("127.0.0.3", 10000), {Host("127.0.0.1", 10000), Host("127.0.0.2", 10000)},
+                                      None, Runner(None)))
+
+    m.ping(m.getHost("127.0.0.2"), {'master': None, 'quorum': False})
+    assert m.master is None
+
+    m.ping(m.getHost("127.0.0.1"), {'master': None, 'quorum': False, 'eligible': False})
+    m.ping(m.getHost("127.0.0.2"), {'master': None, 'quorum': False, 'eligible': False})
+    assert m._aliveLower == 0
+    assert m.master is m.local
+
+    m.ping(m.getHost("127.0.0.1"), {'master': None, 'quorum': False})
+    assert m._aliveLower == 1
+
+
+def test_prevote_rejected_with_healthy_master(mocker):
+    m = make_manager_hosts()
+    m.client = mocker.MagicMock()
+    master = m.getHost("127.0.0.2")
+    rejoined = m.getHost("127.0.0.3")
+
+    m.ping(master, {'master': '127.0.0.2', 'quorum': True, 'term': 4})
+    m.preVoteRequest(rejoined, {'term': 5})
+
+    response = m.client.send.call_args[0][1]
+    assert response.type == MessageType.PREVOTE
+    assert response.data == {'term': 5, 'current': 4, 'granted': False}
+
+
+def test_prevote_granted_without_master(mocker):
+    m = make_manager_hosts()
+    m.client = mocker.MagicMock()
+    m.term = 4
+    candidate = m.getHost("127.0.0.2")
+
+    m.preVoteRequest(candidate, {'term': 5})
+    assert m.client.send.call_args[0][1].data['granted']
+
+    # a candidate that is behind is told the current term
+    m.preVoteRequest(candidate, {'term': 3})
+    assert m.client.send.call_args[0][1].data == {'term': 3, 'current': 4, 'granted': False}
+
+
+def test_stale_term_rejected():
+    m = make_manager_hosts()
+    master = m.getHost("127.0.0.2")
+    stale = m.getHost("127.0.0.3")
+
+    m.ping(master, {'master': '127.0.0.2', 'quorum': True, 'term': 4})
+    # a node that missed the last election still announces itself
+    m.ping(stale, {'master': '127.0.0.3', 'quorum': True, 'term': 2})
+
+    assert m.master is master and m.quorum
+    assert stale.status == HostStatus.UP
+
+
+def test_newer_term_replaces_master():
+    m = make_manager_hosts()
+    old = m.getHost("127.0.0.3")
+    new = m.getHost("127.0.0.2")
+
+    m.ping(old, {'master': '127.0.0.3', 'quorum': True, 'term': 4})
+    assert m.master is old and m.quorum
+
+    m.ping(new, {'master': '127.0.0.2', 'quorum': True, 'term': 5})
+    assert m.term == 5
+    assert m.master is new and m.quorum
@@ -40,3 +40,152 @@ def test_ping_message_from_json():
 
     assert m.type == MessageType.PING
     assert m.data == {'master': None, 'quorum': False}
+
+
+def test_ping_message_binary_roundtrip():
+    for data in [{'master': '127.0.0.1', 'quorum': False},
+                 {'master': '10.0.0.254', 'quorum': True},
+                 {'master': None, 'quorum': False}]:
+        frame = Message(MessageType.PING, data).toBytes()
+        m = Message.fromBytes(frame)
+
+        assert m.type == MessageType.PING
+        assert m.data == data
+
+
+def test_ping_message_binary_layout():
+    frame = Message(MessageType.PING, {
+                    'master': '127.0.0.1', 'quorum': True}).toBytes()
+
+    assert frame == bytes([0xA7, 1, 1, 0x03, 127, 0, 0, 1])
+
+
+def test_from_bytes_legacy_json():
+    data = Message(MessageType.PING, {
+                   'master': '127.0.0.1', 'quorum': True}).toJson()
+
+    m = Message.fromBytes(bytes(data, "utf-8"))
+    assert m.type == MessageType.PING
+    assert m.data == {'master': '127.0.0.1', 'quorum': True}
+
+    m = Message.fromBytes(data)
+    assert m.data == {'master': '127.0.0.1', 'quorum': True}
+
+
+def test_ping_message_hostname_master():
+    for master in ("localhost", "10.1"):
+        data = {'master': master, 'quorum': True, 'term': 2}
+        frame = Message(MessageType.PING, data).toBytes()
+
+        # doesn't fit the binary layout and is sent as json
+        assert frame[0] != 0xA7
+        assert Message.fromBytes(frame).data == data
+
+
+def test_out_of_range_fields_are_sent_as_json():
+    for kind, data in ((MessageType.PING, {'master': '127.0.0.1', 'quorum': True, 'term': 2 ** 32}),
+                       (MessageType.PING, {'master': None, 'quorum': False, 'term': 1,
+                                           'priority': 40000, 'load': 0.5}),
+                       (MessageType.BEACON, {'seq': -1})):
+        frame = Message(kind, data).toBytes()
+
+        assert frame[0] != 0xA7
+        assert Message.fromBytes(frame).data == data
+
+
+def test_from_bytes_unsupported_version():
+    with pytest.raises(ValueError):
+        Message.fromBytes(bytes([0xA7, 99, 1, 0, 0, 0, 0, 0]))
+
+
+def test_group_ping_binary_roundtrip():
+    data = [(1, {'master': '127.0.0.1', 'quorum': True, 'term': 7}),
+            (4294967295, {'master': None, 'quorum': False, 'term': 0})]
+    frame = Message(MessageType.GROUP_PING, data).toBytes()
+
+    assert len(frame) == 3 + 2 + 2 * 13
+
+    m = Message.fromBytes(frame)
+    assert m.type == MessageType.GROUP_PING
+    assert m.data == data
+
+
+def test_group_ping_truncated():
+    frame = Message(MessageType.GROUP_PING, [(1, {'master': None, 'quorum': False})]).toBytes()
+
+    with pytest.raises(ValueError):
+        Message.fromBytes(frame[:-1])
+
+
+def test_ping_message_ineligible():
+    data = {'master': None, 'quorum': False, 'eligible': False}
+    frame = Message(MessageType.PING, data).toBytes()
+
+    assert frame[3] == 0x04
+    assert Message.fromBytes(frame).data == data
+
+
+def test_ping_message_term():
+    data = {'master': '127.0.0.1', 'quorum': True, 'term': 258}
+    frame = Message(MessageType.PING, data).toBytes()
+
+    assert frame == bytes([0xA7, 1, 1, 0x03, 127, 0, 0, 1, 0, 0, 1, 2])
+    assert Message.fromBytes(frame).data == data
+    # nodes without terms ignore the trailing term
+    assert Message.fromBytes(frame[:8]).data == {'master': '127.0.0.1', 'quorum': True}
+
+
+def test_beacon_layout():
+    frame = Message(MessageType.BEACON, {'seq': 7}).toBytes()
+
+    assert frame == bytes([0xA7, 1, 8, 0, 0, 0, 7])
+    assert Message.fromBytes(frame).data == {'seq': 7}
+
+
+def test_delta_roundtrip():
+    for data in [{'seq': 3, 'term': 2},
+                 {'seq': 4, 'master': '127.0.0.1', 'quorum': True},
+                 {'seq': 5, 'master': None, 'quorum': False, 'eligible': False, 'term': 9}]:
+        m = Message.fromBytes(Message(MessageType.DELTA, data).toBytes())
+
+        assert m.type == MessageType.DELTA
+        assert m.data == data
+
+
+def test_digest_layout():
+    frame = Message(MessageType.DIGEST, {
+        'seq': 1, 'master': '127.0.0.1', 'quorum': True, 'term': 2}).toBytes()
+
+    assert frame == bytes([0xA7, 1, 10, 0, 0, 0, 1, 0x03, 0x03, 127, 0, 0, 1, 0, 0, 0, 2])
+
+
+def test_ping_placement_roundtrip():
+    data = {'master': None, 'quorum': False, 'term': 3, 'priority': -2, 'load': 0.37}
+    frame = Message(MessageType.PING, data).toBytes()
+
+    assert len(frame) == 3 + 9 + 4
+    assert Message.fromBytes(frame).data == data
+
+    data = dict(data, load=None)
+    assert Message.fromBytes(Message(MessageType.PING, data).toBytes()).data == data
+
+
+def test_ping_placement_load_is_clamped():
+    for load, expected in ((-1.5, 0.0), (1000.0, 655.34)):
+        data = {'master': None, 'quorum': False, 'term': 1, 'priority': 0, 'load': load}
+        m = Message.fromBytes(Message(MessageType.PING, data).toBytes())
+
+        assert m.data['load'] == expected
+
+
+def test_group_ping_without_placement():
+    frame = Message(MessageType.GROUP_PING, [
+        (1, {'master': None, 'quorum': False, 'term': 3, 'priority': 5, 'load': 0.5})]).toBytes()
+
+    assert Message.fromBytes(frame).data == [(1, {'master': None, 'quorum': False, 'term': 3})]
+
+
+def test_delta_placement_roundtrip():
+    data = {'seq': 2, 'priority': 1, 'load': 1.25}
+
+    assert Message.fromBytes(Message(MessageType.DELTA, data).toBytes()).data == data
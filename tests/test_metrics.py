@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+import urllib.request
+
+import pytest
+from pyquorum.host import Host
+from pyquorum.manager import QuorumManager
+from pyquorum.metrics import Histogram, Metrics, MetricsServer
+from pyquorum.receiver import MessageReceiver
+from pyquorum.runner import Runner
+
+__author__ = "Henry Spanka"
+__copyright__ = "Henry Spanka"
+__license__ = "mit"
+
+
+def test_histogram():
+    h = Histogram((0.1, 1.0))
+
+    h.observe(0.05)
+    h.observe(0.1)
+    h.observe(5)
+
+    assert h.counts == [2, 0, 1]
+    assert h.count == 3
+    assert h.sum == pytest.approx(5.15)
+
+
+def test_render():
+    m = Metrics()
+    m.counter("requests_total", "Requests", peer="10.0.0.2").inc(3)
+    m.gauge("up", "Up", lambda: 1)
+    m.histogram("latency_seconds", "Latency", (0.1, 1.0)).observe(0.5)
+
+    text = m.render()
+
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{peer="10.0.0.2"} 3' in text
+    assert "up 1" in text
+    assert 'latency_seconds_bucket{le="0.1"} 0' in text
+    assert 'latency_seconds_bucket{le="1.0"} 1' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 1' in text
+    assert "latency_seconds_count 1" in text
+
+
+def test_same_counter():
+    m = Metrics()
+    assert m.counter("a", "A", peer="x") is m.counter("a", "A", peer="x")
+    assert m.counter("a", "A", peer="x") is not m.counter("a", "A", peer="y")
+
+
+def test_server():
+    m = Metrics()
+    m.counter("requests_total", "Requests").inc()
+
+    server = MetricsServer("127.0.0.1", 0, m)
+    server.start()
+    port = server.httpd.server_address[1]
+
+    body = urllib.request.urlopen("http://127.0.0.1:{}/metrics".format(port)).read()
+    assert b"requests_total 1" in body
+
+    with pytest.raises(urllib.error.HTTPError):
+        urllib.request.urlopen("http://127.0.0.1:{}/".format(port))
+
+    server.stop()
+
+
+def test_manager_election_metrics():
+    m = Metrics()
+    now = [0.0]
+    manager = QuorumManager(Host("127.0.0.1", 10000), [Host("127.0.0.2", 10000),
+                                                       Host("127.0.0.3", 10000)], None, Runner(None), m)
+    manager.clock = lambda: now[0]
+    manager.preVote = False
+    host = manager.getHost("127.0.0.2")
+
+    # the election starts as soon as the majority is reachable
+    now[0] = 0.5
+    manager.ping(host, {'master': None, 'quorum': False})
+    assert manager.master == manager.local
+    assert not manager.quorum
+
+    now[0] = 1.5
+    manager.ping(host, {'master': '127.0.0.1', 'quorum': False})
+    assert manager.quorum
+
+    now[0] = 4.0
+    text = m.render()
+    assert 'pyquorum_election_duration_seconds_sum{node="127.0.0.1"} 1.0' in text
+    assert 'pyquorum_heartbeat_interarrival_seconds_sum{node="127.0.0.1",peer="127.0.0.2"} 1.0' in text
+    assert 'pyquorum_quorum{node="127.0.0.1"} 1' in text
+    assert 'pyquorum_quorum_seconds{node="127.0.0.1"} 2.5' in text
+
+
+def test_decode_errors(mocker, caplog):
+    m = Metrics()
+    manager = mocker.MagicMock()
+
+    r = MessageReceiver(manager, m)
+    r.handle("127.0.0.2", b"garbage")
+
+    manager.getHost.assert_not_called()
+    assert r.decodeErrors.value == 1
+    assert "Could not decode message from 127.0.0.2" in caplog.text
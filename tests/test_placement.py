@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+from pyquorum.placement import LoadProbe
+
+__author__ = "Henry Spanka"
+__copyright__ = "Henry Spanka"
+__license__ = "mit"
+
+
+def test_loadavg(mocker):
+    mocker.patch("os.getloadavg", return_value=(3.0, 2.0, 1.0))
+    mocker.patch("os.cpu_count", return_value=4)
+
+    assert LoadProbe("loadavg").sample() == 0.75
+
+
+def test_memory(mocker):
+    mocker.patch("builtins.open", mocker.mock_open(
+        read_data="MemTotal:       1000 kB\nMemFree:        100 kB\nMemAvailable:    250 kB\n"))
+
+    assert LoadProbe("memory").sample() == 0.75
+
+
+def test_command():
+    assert LoadProbe("command", "echo 1.5").sample() == 1.5
+
+
+def test_command_failure(caplog):
+    assert LoadProbe("command", "echo nan-ish; exit 1").sample() is None
+    assert LoadProbe("command", "echo busy").sample() is None
+    assert "Could not sample the command load" in caplog.text
+
+
+def test_invalid_metric():
+    with pytest.raises(ValueError):
+        LoadProbe("cpu")
+
+    with pytest.raises(ValueError):
+        LoadProbe("command")
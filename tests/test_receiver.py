@@ -38,3 +38,55 @@ def test_invalid_receiver(mocker, caplog):
     m.ping.assert_not_called()
 
     assert "Could not handle message from 127.0.0.2" in caplog.text
+
+
+def test_receiver_heartbeats(mocker):
+    host = Host("127.0.0.2", 10000)
+    m = mocker.MagicMock()
+    m.getHost.return_value = host
+
+    r = MessageReceiver(m)
+    message = Message(MessageType.BEACON, {'seq': 1})
+    r.handle("127.0.0.2", message.toBytes())
+
+    m.heartbeats.handle.assert_called_once_with(host, mocker.ANY)
+    assert m.heartbeats.handle.call_args.args[1].data == {'seq': 1}
+    m.membership.handle.assert_not_called()
+
+
+def test_receiver_config(mocker):
+    host = Host("127.0.0.2", 10000)
+    m = mocker.MagicMock()
+    m.getHost.return_value = host
+
+    r = MessageReceiver(m)
+    r.handle("127.0.0.2", Message(MessageType.CONFIG_ACK, {
+        'term': 1, 'version': 2, 'members': ["127.0.0.2:10000"], 'old': None}).toBytes())
+
+    m.reconfig.handle.assert_called_once_with(host, mocker.ANY)
+    assert m.reconfig.handle.call_args.args[1].type == MessageType.CONFIG_ACK
+    m.membership.handle.assert_not_called()
+
+
+def test_receiver_resign(mocker):
+    host = Host("127.0.0.2", 10000)
+    m = mocker.MagicMock()
+    m.getHost.return_value = host
+
+    r = MessageReceiver(m)
+    r.handle("127.0.0.2", Message(MessageType.RESIGN, {'term': 1, 'successor': None}).toBytes())
+
+    m.resignation.assert_called_once_with(host, {'term': 1, 'successor': None})
+
+
+def test_receiver_state_request(mocker):
+    host = Host("127.0.0.2", 10000)
+    m = mocker.MagicMock()
+    m.getHost.return_value = host
+
+    r = MessageReceiver(m)
+    r.handle("127.0.0.2", Message(MessageType.STATE_REQUEST, {
+             'master': None, 'quorum': False, 'term': 3}).toBytes())
+
+    m.stateRequest.assert_called_once_with(host, {'master': None, 'quorum': False, 'term': 3})
+    m.ping.assert_not_called()
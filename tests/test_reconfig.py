@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+
+from pyquorum.host import Host, HostStatus
+from pyquorum.manager import QuorumManager
+from pyquorum.message import Message, MessageType
+from pyquorum.reconfig import Reconfiguration
+from pyquorum.state import StateFile
+
+__author__ = "Henry Spanka"
+__copyright__ = "Henry Spanka"
+__license__ = "mit"
+
+
+def make_manager(mocker, ip="127.0.0.1", peers=("127.0.0.2", "127.0.0.3")):
+    m = QuorumManager(Host(ip, 10000), [Host(peer, 10000) for peer in peers],
+                      mocker.MagicMock(), mocker.MagicMock())
+    m.preVote = False
+    m.reconfig = Reconfiguration(m, lambda ip, port: Host(ip, port))
+
+    for host in m.hosts:
+        host.unpunish()
+
+    return m
+
+
+def make_master(mocker):
+    m = make_manager(mocker)
+    m.master = m.local
+    m.quorum = True
+
+    return m
+
+
+def sent(m, kind):
+    # messages broadcast with sendMany are encoded first
+    messages = [c.args[0] for c in m.client.encode.call_args_list] \
+        + [c.args[1] for c in m.client.send.call_args_list]
+
+    return [message.data for message in messages if message.type == kind]
+
+
+def ack(m, ip):
+    m.reconfig.handle(m.getHost(ip), m.reconfig._message(MessageType.CONFIG_ACK))
+
+
+def test_add_and_remove_hosts(mocker):
+    m = make_manager(mocker)
+    host = Host("127.0.0.0", 10000)
+    host.unpunish()
+
+    m.addHost(host)
+    assert m.getHost("127.0.0.0") is host
+    assert m.ranking[0] is host
+    assert m.aliveCount() == 3
+    assert m._aliveLower == 1
+    assert m._majority == 2
+
+    m.removeHost(host)
+    assert host not in m.hosts
+    assert host.listeners == []
+    assert m.aliveCount() == 2
+    assert m._aliveLower == 0
+    assert m._majority == 1
+
+
+def test_joint_majority(mocker):
+    m = make_manager(mocker)
+    old = set(m.hosts)
+    new = old | {Host("127.0.0.4", 10000), Host("127.0.0.5", 10000)}
+
+    m.getHost("127.0.0.3").status = HostStatus.DOWN
+    assert m.hasMajority()
+
+    # 2 of 3 old members but only 2 of 5 new members
+    m.setJoint([(old, True), (new, True)])
+    assert not m.hasMajority()
+    assert m.hasMajority(new - {m.getHost("127.0.0.2")})
+
+    m.setJoint(None)
+    assert m.hasMajority()
+
+
+def test_add_member(mocker):
+    m = make_master(mocker)
+
+    result = m.reconfig.change(add=["127.0.0.4"])
+    assert result["ok"]
+    assert result["old"] == ["127.0.0.1:10000", "127.0.0.2:10000", "127.0.0.3:10000"]
+    assert m.getHost("127.0.0.4", 10000).status == HostStatus.DOWN
+    assert sent(m, MessageType.CONFIG)[-1]["version"] == 1
+
+    # 2 of 3 old but only 2 of 4 new members
+    ack(m, "127.0.0.2")
+    assert m.reconfig.old is not None
+
+    ack(m, "127.0.0.3")
+    assert m.reconfig.old is None
+    assert m.reconfig.version == 2
+    assert m.reconfig.members == ["127.0.0.1:10000", "127.0.0.2:10000", "127.0.0.3:10000",
+                                  "127.0.0.4:10000"]
+    assert sent(m, MessageType.CONFIG)[-1] == {
+        'term': 0, 'version': 2, 'members': m.reconfig.members, 'old': None}
+    assert m._majority == 2
+    assert m.quorum
+
+
+def test_remove_member(mocker, caplog):
+    m = make_master(mocker)
+    removed = m.getHost("127.0.0.3")
+
+    m.reconfig.change(remove=["127.0.0.3:10000"])
+    ack(m, "127.0.0.2")
+
+    assert m.reconfig.version == 2
+    assert removed not in m.hosts
+    assert m.ranking == [m.getHost("127.0.0.2")]
+    assert "Removing host 127.0.0.3" in caplog.text
+
+    # the removed node is told a few more times
+    ack(m, "127.0.0.2")
+    m.client.reset_mock()
+    m.reconfig.tick()
+    m.reconfig.tick()
+    m.reconfig.tick()
+    assert [c.args[1] for c in m.client.sendMany.call_args_list] == [[removed], [removed]]
+
+
+def test_lagging_members_receive_config(mocker):
+    m = make_master(mocker)
+    m.reconfig.change(add=["127.0.0.4"])
+    ack(m, "127.0.0.2")
+
+    m.client.reset_mock()
+    m.reconfig.tick()
+    assert m.client.sendMany.call_args.args[1] == [m.getHost("127.0.0.3")]
+
+    # a member that was down may have restarted with an older configuration
+    ack(m, "127.0.0.3")
+    m.getHost("127.0.0.3").status = HostStatus.DOWN
+    m.getHost("127.0.0.3").unpunish()
+    m.client.reset_mock()
+    m.reconfig.tick()
+    assert m.getHost("127.0.0.3") in m.client.sendMany.call_args.args[1]
+
+
+def test_master_cant_remove_itself(mocker):
+    m = make_master(mocker)
+
+    result = m.reconfig.change(remove=["127.0.0.1"])
+    assert not result["ok"]
+    assert "hand the leadership off" in result["error"]
+
+
+def test_one_change_at_a_time(mocker):
+    m = make_master(mocker)
+    m.reconfig.change(add=["127.0.0.4"])
+
+    result = m.reconfig.change(add=["127.0.0.5"])
+    assert not result["ok"]
+    assert result["error"] == "A membership change is in progress"
+
+
+def test_change_is_forwarded_to_master(mocker):
+    m = make_manager(mocker, "127.0.0.2", ("127.0.0.1", "127.0.0.3"))
+    m.master = m.getHost("127.0.0.1")
+    m.quorum = True
+
+    assert m.reconfig.change(add=["127.0.0.4"]) == {'ok': True, 'forwarded': "127.0.0.1"}
+    assert sent(m, MessageType.CONFIG_REQUEST) == [{'add': ["127.0.0.4:10000"], 'remove': []}]
+
+    m.master = None
+    m.quorum = False
+    assert not m.reconfig.change(add=["127.0.0.4"])["ok"]
+
+
+def test_master_proposes_requested_change(mocker):
+    m = make_master(mocker)
+
+    m.reconfig.handle(m.getHost("127.0.0.2"), Message(MessageType.CONFIG_REQUEST, {
+        'add': ["127.0.0.4:10000"], 'remove': []}))
+    assert m.reconfig.old is not None
+
+
+def test_follower_adopts_config(mocker):
+    m = make_manager(mocker, "127.0.0.2", ("127.0.0.1", "127.0.0.3"))
+    master = m.getHost("127.0.0.1")
+    members = ["127.0.0.1:10000", "127.0.0.2:10000", "127.0.0.3:10000", "127.0.0.4:10000"]
+
+    m.reconfig.handle(master, Message(MessageType.CONFIG, {
+        'term': 1, 'version': 1, 'members': members, 'old': members[:3]}))
+    assert m.reconfig.key() == (1, 1)
+    assert m.getHost("127.0.0.4") in m.hosts
+    assert m._joint is not None
+    assert sent(m, MessageType.CONFIG_ACK)[-1]["version"] == 1
+
+    # an older configuration is not adopted but acknowledged with the current one
+    m.reconfig.handle(master, Message(MessageType.CONFIG, {
+        'term': 0, 'version': 5, 'members': members[:3], 'old': None}))
+    assert m.reconfig.key() == (1, 1)
+    assert sent(m, MessageType.CONFIG_ACK)[-1]["version"] == 1
+
+
+def test_master_learns_newer_config(mocker):
+    m = make_master(mocker)
+    members = ["127.0.0.1:10000", "127.0.0.2:10000", "127.0.0.3:10000", "127.0.0.4:10000"]
+
+    m.reconfig.handle(m.getHost("127.0.0.2"), Message(MessageType.CONFIG_ACK, {
+        'term': 1, 'version': 1, 'members': members, 'old': members[:3]}))
+    assert m.reconfig.old == members[:3]
+
+    # the change is completed by the new master
+    ack(m, "127.0.0.3")
+    assert m.reconfig.old is None
+    assert m.reconfig.version == 2
+
+
+def test_removed_node_leaves_election(mocker, caplog):
+    m = make_manager(mocker, "127.0.0.3", ("127.0.0.1", "127.0.0.2"))
+    m.master = m.getHost("127.0.0.1")
+    m.haveQuorum()
+
+    m.reconfig.handle(m.master, Message(MessageType.CONFIG, {
+        'term': 1, 'version': 2, 'members': ["127.0.0.1:10000", "127.0.0.2:10000"], 'old': None}))
+
+    assert "Removed from the cluster" in caplog.text
+    assert not m.eligible
+    assert m.hosts == []
+    assert not m.quorum
+    assert m.master is None
+
+
+def test_state_file_follows_members(mocker, tmp_path):
+    m = make_master(mocker)
+    path = str(tmp_path / "state")
+    m.stateFile = old = StateFile(path, ["127.0.0.2:10000", "127.0.0.3:10000"])
+
+    m.reconfig.change(add=["127.0.0.4"])
+
+    assert m.stateFile is not old
+    assert m.stateFile.count == 3
+    assert m.stateFile.read().peers == [True, True, False]
+    m.stateFile.close()
+    old.close()
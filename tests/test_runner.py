@@ -1,7 +1,10 @@
 # -*- coding: utf-8 -*-
 
+import signal
+import time
+
 import pytest
-from pyquorum.runner import Runner
+from pyquorum.runner import Runner, StandbyRunner
 
 __author__ = "Henry Spanka"
 __copyright__ = "Henry Spanka"
@@ -29,3 +32,113 @@ def test_script_runner_not_exists():
     assert r.running == False
     r.stop()
     assert r.running == False
+
+
+def test_runner_args(mocker):
+    popen = mocker.patch('subprocess.Popen')
+
+    r = Runner("./test_runner.sh", ["orders-0"])
+    assert r.run() == True
+    popen.assert_called_once_with(["./test_runner.sh", "orders-0"], env=None)
+
+
+def test_runner_env(mocker):
+    popen = mocker.patch('subprocess.Popen')
+
+    r = Runner("./test_runner.sh")
+    r.run({'PYQUORUM_FENCING_TOKEN': "7"})
+
+    env = popen.call_args[1]['env']
+    assert env['PYQUORUM_FENCING_TOKEN'] == "7"
+    assert 'PATH' in env
+
+
+def test_standby_runner_signals(mocker):
+    popen = mocker.patch('subprocess.Popen')
+    process = popen.return_value
+    process.poll.return_value = None
+
+    r = StandbyRunner("./test_runner.sh")
+    assert r.prepare() == True
+    assert popen.call_args[1]['env']['PYQUORUM_STANDBY'] == "1"
+    assert r.running == False
+
+    # the standby is already running
+    assert r.prepare() == True
+    popen.assert_called_once()
+
+    assert r.run() == True
+    process.send_signal.assert_called_once_with(signal.SIGUSR1)
+    assert r.running == True
+
+    r.stop()
+    process.send_signal.assert_called_with(signal.SIGUSR2)
+    process.terminate.assert_not_called()
+    assert r.running == False
+
+    r.close()
+    process.terminate.assert_called_once()
+
+
+def test_standby_runner_pipe(mocker):
+    popen = mocker.patch('subprocess.Popen')
+    process = popen.return_value
+    process.poll.return_value = None
+
+    r = StandbyRunner("./test_runner.sh", pipe=True)
+    r.prepare()
+    r.run({'PYQUORUM_FENCING_TOKEN': "7"})
+    r.stop()
+
+    assert [c[0][0] for c in process.stdin.write.call_args_list] == [
+        b"promote PYQUORUM_FENCING_TOKEN=7\n", b"demote\n"]
+    process.send_signal.assert_not_called()
+
+
+def test_standby_runner_starts_active(mocker):
+    popen = mocker.patch('subprocess.Popen')
+    process = popen.return_value
+    # the standby process exited
+    process.poll.return_value = 1
+
+    r = StandbyRunner("./test_runner.sh")
+    r.p = process
+
+    assert r.run() == True
+    assert popen.call_args[1]['env']['PYQUORUM_STANDBY'] == "0"
+    process.send_signal.assert_not_called()
+
+
+def test_standby_runner_promotes_process(tmp_path):
+    state = tmp_path / "state"
+    script = tmp_path / "standby.sh"
+    script.write_text("#!/bin/sh\n"
+                      "trap 'echo active > {0}' USR1\n"
+                      "trap 'echo standby > {0}' USR2\n"
+                      "echo $PYQUORUM_STANDBY > {0}\n"
+                      "while true; do sleep 0.01; done\n".format(state))
+    script.chmod(0o755)
+
+    r = StandbyRunner(str(script))
+    try:
+        assert r.prepare() == True
+        assert wait_for(state, "1")
+
+        r.run()
+        assert wait_for(state, "active")
+
+        r.stop()
+        assert wait_for(state, "standby")
+        assert r.p.poll() is None
+    finally:
+        r.close()
+
+
+def wait_for(path, content, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if path.exists() and path.read_text().strip() == content:
+            return True
+        time.sleep(0.01)
+
+    return False
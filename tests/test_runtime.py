@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import socket
+
+import pytest
+from pyquorum.runtime import AsyncRuntime, DatagramHandlerProtocol
+
+__author__ = "Henry Spanka"
+__copyright__ = "Henry Spanka"
+__license__ = "mit"
+
+
+def free_port():
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def test_protocol(mocker, caplog):
+    h = mocker.MagicMock()
+    p = DatagramHandlerProtocol(h)
+
+    p.datagram_received(b"test", ("127.0.0.2", 10000))
+    h.handle.assert_called_once_with("127.0.0.2", b"test")
+
+    p.datagram_received(b"", ("127.0.0.2", 10000))
+    h.handle.assert_called_once()
+    assert "Received invalid data" in caplog.text
+
+
+def test_protocol_ignores_own_datagrams(mocker):
+    h = mocker.MagicMock()
+    p = DatagramHandlerProtocol(h, "127.0.0.1")
+
+    p.datagram_received(b"own", ("127.0.0.1", 10000))
+    p.datagram_received(b"test", ("127.0.0.2", 10000))
+    h.handle.assert_called_once_with("127.0.0.2", b"test")
+
+
+def test_runtime_rounds(mocker):
+    managers = [mocker.MagicMock(), mocker.MagicMock()]
+
+    r = AsyncRuntime(interval=0.01)
+    for m in managers:
+        r.add(m, mocker.MagicMock(), "127.0.0.1", free_port())
+
+    asyncio.run(r.serve(rounds=2))
+
+    for m in managers:
+        assert m.sendKeepAlives.call_count == 3
+        assert m.update.call_count == 2
+    assert r.transports == []
+
+
+def test_runtime_receive(mocker):
+    h = mocker.MagicMock()
+    port = free_port()
+
+    r = AsyncRuntime(interval=0.05)
+    r.add(mocker.MagicMock(), h, "127.0.0.1", port)
+
+    async def scenario():
+        task = asyncio.ensure_future(r.serve(rounds=2))
+        await asyncio.sleep(0.01)
+
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        s.sendto(b"test", ("127.0.0.1", port))
+        s.close()
+
+        await task
+
+    asyncio.run(scenario())
+
+    h.handle.assert_called_once_with("127.0.0.1", b"test")
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+from pyquorum.scheduler import Scheduler
+
+__author__ = "Henry Spanka"
+__copyright__ = "Henry Spanka"
+__license__ = "mit"
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_run_pending_order():
+    clock = Clock()
+    s = Scheduler(clock)
+    calls = []
+
+    s.callLater(2.0, lambda: calls.append("b"))
+    s.callLater(1.0, lambda: calls.append("a"))
+    s.callLater(3.0, lambda: calls.append("c"))
+
+    assert s.runPending() == 1.0
+    assert calls == []
+
+    clock.now = 2.0
+    assert s.runPending() == 3.0
+    assert calls == ["a", "b"]
+
+
+def test_cancel():
+    clock = Clock()
+    s = Scheduler(clock)
+    calls = []
+
+    timer = s.callLater(1.0, lambda: calls.append("a"))
+    timer.cancel()
+
+    clock.now = 1.0
+    assert s.runPending() is None
+    assert calls == []
+
+
+def test_every_does_not_drift():
+    clock = Clock()
+    s = Scheduler(clock)
+    calls = []
+
+    def callback():
+        calls.append(clock.now)
+        # the callback takes some time
+        clock.now += 0.3
+
+    s.every(1.0, callback, 1.0)
+
+    for now in (1.0, 2.0, 3.0):
+        clock.now = now
+        s.runPending()
+
+    assert calls == [1.0, 2.0, 3.0]
+    assert s.runPending() == 4.0
+
+
+def test_failing_callback(caplog):
+    clock = Clock()
+    s = Scheduler(clock)
+    calls = []
+
+    def fail():
+        raise RuntimeError("boom")
+
+    s.callLater(0.0, fail)
+    s.callLater(0.0, lambda: calls.append("a"))
+    s.runPending()
+
+    assert calls == ["a"]
+    assert "Scheduled callback failed" in caplog.text
+
+
+def test_run_wakes_up_for_new_timer():
+    s = Scheduler()
+    done = threading.Event()
+
+    thread = threading.Thread(target=s.run)
+    thread.start()
+
+    s.callLater(0.01, done.set)
+    assert done.wait(5)
+
+    s.stop()
+    thread.join(5)
+    assert not thread.is_alive()
+
+
+def test_every_survives_exceptions():
+    clock = Clock()
+    s = Scheduler(clock)
+    calls = []
+
+    def callback():
+        calls.append(clock.now)
+        raise RuntimeError("callback failed")
+
+    s.every(1.0, callback)
+
+    for now in (0.0, 1.0, 2.0):
+        clock.now = now
+        s.runPending()
+
+    assert calls == [0.0, 1.0, 2.0]
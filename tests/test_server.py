@@ -1,21 +1,148 @@
 # -*- coding: utf-8 -*-
 
+import socket
+import time
+
 import pytest
+from pyquorum.metrics import Metrics
 from pyquorum.udpserver import UdpServer
+from pyquorum import mmsg
 
 __author__ = "Henry Spanka"
 __copyright__ = "Henry Spanka"
 __license__ = "mit"
 
 
-def test_server(mocker, caplog):
+def free_port():
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def send_later(port, payloads, mocker):
+    """Sends the payloads as soon as the server socket is bound"""
+    bind = socket.socket.bind
+
+    def bound(sock, addr):
+        bind(sock, addr)
+        c = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        for payload in payloads:
+            c.sendto(payload, ("127.0.0.1", port))
+        c.close()
+
+    mocker.patch("socket.socket.bind", bound)
+
+
+@pytest.fixture(params=[True, False])
+def recvmmsg(request, mocker):
+    if request.param and not mmsg.RECVMMSG_AVAILABLE:
+        pytest.skip("recvmmsg is not available")
+    mocker.patch("pyquorum.mmsg.RECVMMSG_AVAILABLE", request.param)
+
+
+def test_server(mocker, recvmmsg):
     h = mocker.MagicMock()
+    port = free_port()
+    send_later(port, [b"test"], mocker)
+
+    s = UdpServer("127.0.0.1", port, h)
+    s.listen(False)
+
+    h.handle.assert_called_once_with("127.0.0.1", b"test")
+
+
+def test_server_batch(mocker, recvmmsg):
+    h = mocker.MagicMock()
+    port = free_port()
+    send_later(port, [bytes([i]) * 10 for i in range(1, 6)], mocker)
+
+    s = UdpServer("127.0.0.1", port, h, rcvbuf=65536)
+    s.listen(False)
+
+    assert [c.args[1] for c in h.handle.call_args_list] == [
+        bytes([i]) * 10 for i in range(1, 6)]
+
+
+def test_server_counts_unknown_sources(mocker):
+    metrics = Metrics()
+    s = UdpServer("127.0.0.1", free_port(), mocker.MagicMock(), metrics=metrics,
+                  peers=["127.0.0.2"])
+
+    s._count("127.0.0.2")
+    for i in range(3, 10):
+        s._count("127.0.0.{}".format(i))
+
+    rendered = metrics.render()
+    assert 'pyquorum_packets_received_total{peer="127.0.0.2"} 1' in rendered
+    assert 'pyquorum_packets_received_total{peer="unknown"} 7' in rendered
+    assert "127.0.0.3" not in rendered
+
+
+def test_server_large_datagram(mocker, recvmmsg):
+    h = mocker.MagicMock()
+    port = free_port()
+    send_later(port, [b"x" * 4000], mocker)
+
+    s = UdpServer("127.0.0.1", port, h)
+    s.listen(False)
+
+    h.handle.assert_called_once_with("127.0.0.1", b"x" * 4000)
+
+
+def test_server_truncated(mocker, caplog, recvmmsg):
+    h = mocker.MagicMock()
+    metrics = Metrics()
+    port = free_port()
+    send_later(port, [b"x" * 200, b"y" * 100], mocker)
+
+    s = UdpServer("127.0.0.1", port, h, maxDatagram=100, metrics=metrics)
+    s.listen(False)
+
+    # a datagram that fills the buffer exactly is not truncated
+    h.handle.assert_called_once_with("127.0.0.1", b"y" * 100)
+    assert "Dropped truncated datagram" in caplog.text
+    assert 'pyquorum_packets_dropped_total{reason="truncated"} 1' in metrics.render()
+
+
+def test_server_multicast(mocker):
+    h = mocker.MagicMock()
+    port = free_port()
+
+    s = UdpServer("127.0.0.1", port, h, group="239.255.42.99")
+    s.start()
+
+    def sender(ip):
+        c = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        c.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton("127.0.0.1"))
+        c.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        c.bind((ip, 0))
+        return c
+
+    own, peer = sender("127.0.0.1"), sender("127.0.0.2")
+
+    # the group is joined in the background, send until the datagrams arrive
+    deadline = time.monotonic() + 5
+    while not h.handle.called and s.is_alive() and time.monotonic() < deadline:
+        # looped back datagrams of the node itself are ignored
+        own.sendto(b"own", ("239.255.42.99", port))
+        peer.sendto(b"test", ("239.255.42.99", port))
+        time.sleep(0.05)
+
+    own.close()
+    peer.close()
+
+    if not h.handle.called:
+        pytest.skip("multicast is not available")
+
+    assert {c.args for c in h.handle.call_args_list} == {("127.0.0.2", b"test")}
+
 
-    sock = mocker.patch("socket.socket.recvfrom")
-    sock.return_value = (bytes("test", "utf-8"), ("127.0.0.2", 10000))
+def test_server_multicast_unavailable(mocker, caplog):
+    mocker.patch("pyquorum.udpserver.multicastSocket", side_effect=OSError("no route"))
 
-    s = UdpServer("127.0.0.1", 10000, h)
+    s = UdpServer("127.0.0.1", free_port(), mocker.MagicMock(), group="239.255.42.99")
     s.listen(False)
 
-    sock.assert_called_once()
-    h.handle.assert_called_once()
+    assert "Could not join multicast group 239.255.42.99" in caplog.text
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+from pyquorum.simulation import Simulation, VirtualClock
+
+__author__ = "Henry Spanka"
+__copyright__ = "Henry Spanka"
+__license__ = "mit"
+
+
+def elect(simulation, timeout=60):
+    assert simulation.runUntil(lambda: simulation.leader is not None, timeout)
+    return simulation.leader
+
+
+def test_virtual_clock():
+    c = VirtualClock()
+    assert c() == 0.0
+    c.now = 5.0
+    assert c() == 5.0
+
+
+def test_elects_lowest_address():
+    s = Simulation(5, seed=1)
+
+    assert elect(s) == "10.0.0.1"
+    assert s.report()['timeToQuorum'] < 5
+
+
+def test_failover():
+    s = Simulation(5, seed=1)
+    leader = elect(s)
+
+    s.crash(leader)
+    assert s.runUntil(lambda: s.leader not in (None, leader), 60)
+
+    report = s.report()
+    assert len(report['failovers']) == 1
+    assert report['failovers'][0] < 10
+
+
+def test_deterministic():
+    reports = []
+    for _ in range(2):
+        s = Simulation(7, seed=42, loss=0.1)
+        s.run(30)
+        reports.append(s.report())
+
+    assert reports[0] == reports[1]
+
+
+def test_minority_partition_has_no_leader():
+    s = Simulation(5, seed=3)
+    leader = elect(s)
+
+    s.network.partition(s.ips[:2], s.ips[2:])
+    s.run(30)
+
+    assert s.leader is not None
+    assert s.leader in s.ips[2:]
+    for ip in s.ips[:2]:
+        assert not s.nodes[ip].manager.quorum
+
+    s.network.heal()
+    s.run(30)
+    assert s.leader is not None
+
+
+@pytest.mark.parametrize("options", [{'swim': True, 'loss': 0.05},
+                                     {'detector': 'phi', 'interval': 0.2}])
+def test_failover_variants(options):
+    s = Simulation(9, seed=5, **options)
+    leader = elect(s, 120)
+
+    s.crash(leader)
+    assert s.runUntil(lambda: s.leader not in (None, leader), 120)
+
+
+def test_large_cluster():
+    s = Simulation(50, seed=7)
+
+    elect(s)
+    assert s.network.delivered > 0
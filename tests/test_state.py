@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+import struct
+
+import pytest
+from pyquorum.host import Host, HostStatus
+from pyquorum.manager import QuorumManager
+from pyquorum.runner import Runner
+from pyquorum.state import LOCAL, NO_MASTER, NodeState, StateFile
+
+__author__ = "Henry Spanka"
+__copyright__ = "Henry Spanka"
+__license__ = "mit"
+
+MEMBERS = ["127.0.0.2:10000", "127.0.0.3:10000"]
+
+
+def make_manager(local="127.0.0.4"):
+    m = QuorumManager(Host(local, 10000), [Host("127.0.0.2", 10000), Host("127.0.0.3", 10000)],
+                      None, Runner(None))
+    m.preVote = False
+
+    return m
+
+
+def test_roundtrip(tmp_path):
+    f = StateFile(str(tmp_path / "state"), MEMBERS, clock=lambda: 100.0)
+    assert f.read() is None
+
+    f.write(NodeState(7, 1, True, [True, False]))
+    f.close()
+
+    state = StateFile(str(tmp_path / "state"), MEMBERS).read()
+    assert state.term == 7
+    assert state.master == 1
+    assert state.quorum
+    assert state.peers == [True, False]
+    assert state.savedAt == 100.0
+
+
+def test_touch(tmp_path):
+    now = [100.0]
+    f = StateFile(str(tmp_path / "state"), MEMBERS, clock=lambda: now[0])
+    f.write(NodeState(1, NO_MASTER, False, [False, False]))
+
+    now[0] = 200.0
+    f.touch()
+
+    assert f.read().savedAt == 200.0
+
+
+def test_other_members(tmp_path):
+    f = StateFile(str(tmp_path / "state"), MEMBERS)
+    f.write(NodeState(1, NO_MASTER, False, [False, False]))
+    f.close()
+
+    assert StateFile(str(tmp_path / "state"), ["127.0.0.2:10000", "127.0.0.5:10000"]).read() is None
+
+
+def test_torn_update(tmp_path, caplog):
+    f = StateFile(str(tmp_path / "state"), MEMBERS)
+    f.write(NodeState(1, NO_MASTER, False, [False, False]))
+
+    # a writer that crashed in the middle of an update leaves the sequence odd
+    struct.pack_into("!I", f.map, 8, 3)
+    assert f.read() is None
+    assert "inconsistent" in caplog.text
+
+    f.write(NodeState(2, NO_MASTER, False, [False, False]))
+    assert f.read().term == 2
+
+
+def test_manager_persists(tmp_path):
+    m = make_manager()
+    m.stateFile = StateFile(str(tmp_path / "state"), MEMBERS)
+    master = m.getHost("127.0.0.2")
+
+    m.ping(master, {'master': '127.0.0.2', 'quorum': True, 'term': 5})
+
+    state = m.stateFile.read()
+    assert state.master == 0
+    assert state.quorum
+    assert state.term == 5
+    assert state.peers == [True, False]
+
+
+def test_restore_follower(tmp_path):
+    m = make_manager()
+    m.restore(NodeState(3, 0, True, [True, True]))
+
+    assert m.master is m.getHost("127.0.0.2")
+    assert m.quorum
+    assert m.term == 3
+    assert m.getHost("127.0.0.3").status == HostStatus.UP
+
+
+def test_restore_master_starts_election():
+    m = make_manager("127.0.0.1")
+    m.restore(NodeState(3, LOCAL, True, [True, False]))
+
+    # proposes itself again for a new term but needs the votes of the other nodes
+    assert m.master is m.local
+    assert m.term == 4
+    assert not m.quorum
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+import struct
+
+import pytest
+from pyquorum.host import Host
+from pyquorum.manager import QuorumManager
+from pyquorum.status import StatusPage, StatusReader
+
+__author__ = "Henry Spanka"
+__copyright__ = "Henry Spanka"
+__license__ = "mit"
+
+
+def test_write_read(tmp_path):
+    path = str(tmp_path / "status")
+    page = StatusPage(path, clock=lambda: 100.0)
+    reader = StatusReader(path)
+
+    status = reader.read()
+    assert status.master is None
+    assert not status.leader
+
+    page.write(7, "10.0.0.1", True, True)
+
+    status = reader.read()
+    assert status.term == 7
+    assert status.master == "10.0.0.1"
+    assert status.quorum
+    assert status.leader
+    assert status.updatedAt == 100.0
+
+    page.close()
+    assert reader.read().master is None
+    reader.close()
+
+
+def test_read_during_update(tmp_path):
+    path = str(tmp_path / "status")
+    page = StatusPage(path)
+    reader = StatusReader(path)
+
+    # the writer is in the middle of an update
+    struct.pack_into("!Q", page.map, 8, 3)
+    assert reader.read(retries=3) is None
+
+
+def test_manager_publishes(mocker, tmp_path):
+    path = str(tmp_path / "status")
+    runner = mocker.MagicMock()
+    runner.running = False
+    m = QuorumManager(Host("127.0.0.1", 10000), [Host("127.0.0.2", 10000)], None, runner)
+    m.preVote = False
+    m.statusPage = StatusPage(path)
+    reader = StatusReader(path)
+
+    m.ping(m.getHost("127.0.0.2"), {'master': '127.0.0.1', 'quorum': False, 'term': 3})
+
+    status = reader.read()
+    assert status.leader and status.term == 4
+    runner.run.assert_called_once_with(
+        {'PYQUORUM_FENCING_TOKEN': "4", 'PYQUORUM_MASTER': "127.0.0.1"})
+
+    m.lostQuorum()
+    assert not reader.read().leader
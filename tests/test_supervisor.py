@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+import pytest
+from pyquorum.runner import Runner, StandbyRunner
+from pyquorum.supervisor import Supervisor
+
+__author__ = "Henry Spanka"
+__copyright__ = "Henry Spanka"
+__license__ = "mit"
+
+
+def make_script(tmp_path, body):
+    script = tmp_path / "script.sh"
+    script.write_text("#!/bin/sh\n" + body)
+    script.chmod(0o755)
+
+    return str(script)
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+
+    return False
+
+
+def test_reaps_stopped_process(tmp_path):
+    s = Supervisor(Runner(make_script(tmp_path, "while true; do sleep 0.01; done\n")))
+
+    assert s.run() == True
+    process = s.runner.p
+    s.stop()
+
+    assert wait_until(lambda: process.returncode is not None)
+    assert s.running == False
+    assert list(s.crashes) == []
+
+
+def test_kills_after_grace(tmp_path, caplog):
+    script = make_script(tmp_path, "trap '' TERM\nwhile true; do sleep 0.01; done\n")
+    s = Supervisor(Runner(script), grace=0.1)
+
+    s.run()
+    process = s.runner.p
+    # give the script time to ignore SIGTERM
+    time.sleep(0.1)
+    s.stop()
+
+    assert wait_until(lambda: process.returncode is not None)
+    assert process.returncode == -9
+    assert "killing it" in caplog.text
+
+
+def test_restarts_crashed_script(tmp_path, caplog):
+    s = Supervisor(Runner(make_script(tmp_path, "exit 3\n")), backoff=0.01, maxRestarts=10)
+
+    s.run()
+    first = s.runner.p
+
+    assert wait_until(lambda: len(s.crashes) >= 2)
+    assert s.runner.p is not first
+    assert s.running == True
+    assert "Script exited with code 3 while master" in caplog.text
+
+    s.stop()
+
+
+def test_gives_up_and_recovers(tmp_path):
+    events = []
+    s = Supervisor(Runner(make_script(tmp_path, "exit 1\n")), backoff=0.01, maxRestarts=2,
+                   window=0.5)
+    s.onGiveUp = lambda: events.append("resign")
+    s.onRecover = lambda: events.append("reinstate")
+
+    s.run()
+
+    assert wait_until(lambda: events == ["resign"])
+    assert s.gaveUp
+    assert s.running == False
+
+    assert wait_until(lambda: events == ["resign", "reinstate"])
+    assert not s.gaveUp
+
+
+def test_restarts_after_giving_up_while_master(tmp_path):
+    state = tmp_path / "started"
+    script = make_script(tmp_path, "echo x >> {}\nexit 1\n".format(state))
+    s = Supervisor(Runner(script), backoff=0.01, maxRestarts=2, window=0.5)
+
+    s.run()
+
+    assert wait_until(lambda: s.gaveUp)
+    assert s.running == False
+    started = len(state.read_text().split())
+
+    # without --resign-on-crash the node stays master and starts the script again
+    assert wait_until(lambda: not s.gaveUp and s.running and
+                      len(state.read_text().split()) > started)
+
+    s.stop()
+
+
+def test_no_restart_after_resigning(tmp_path):
+    state = tmp_path / "started"
+    script = make_script(tmp_path, "echo x >> {}\nexit 1\n".format(state))
+    s = Supervisor(Runner(script), backoff=0.01, maxRestarts=2, window=0.2)
+    recovered = []
+    s.onGiveUp = s.stop
+    s.onRecover = lambda: recovered.append(True)
+
+    s.run()
+
+    assert wait_until(lambda: recovered == [True])
+    time.sleep(0.05)
+    assert len(state.read_text().split()) == 3
+    assert s.running == False
+
+
+def test_restarts_crashed_standby(tmp_path):
+    state = tmp_path / "started"
+    script = make_script(tmp_path, "echo x >> {}\nexit 1\n".format(state))
+    s = Supervisor(StandbyRunner(script), backoff=0.01, maxRestarts=10)
+
+    s.prepare()
+
+    assert wait_until(lambda: state.exists() and len(state.read_text().split()) >= 2)
+    assert s.running == False
+
+    s.close()
+
+
+@pytest.mark.parametrize("runner", [Runner, StandbyRunner])
+def test_close_kills_after_grace(tmp_path, caplog, runner):
+    script = make_script(tmp_path, "trap '' TERM\nwhile true; do sleep 0.01; done\n")
+    s = Supervisor(runner(script), grace=0.1)
+
+    s.run()
+    process = s.runner.p
+    # give the script time to ignore SIGTERM
+    time.sleep(0.1)
+    s.close()
+
+    # the process is reaped before close returns
+    assert process.returncode == -9
+    assert "killing it" in caplog.text
+
+
+def test_close_does_not_restart(tmp_path):
+    s = Supervisor(StandbyRunner(make_script(tmp_path, "while true; do sleep 0.01; done\n")),
+                   backoff=0.01)
+
+    s.prepare()
+    process = s.runner.p
+    s.close()
+
+    assert wait_until(lambda: process.returncode is not None)
+    time.sleep(0.05)
+    assert list(s.crashes) == []
+    assert s.runner.p is None
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+import pytest
+from pyquorum.host import Host, HostStatus
+from pyquorum.manager import QuorumManager
+from pyquorum.message import Message, MessageType
+from pyquorum.receiver import MessageReceiver
+from pyquorum.swim import MemberState, SwimMembership
+
+__author__ = "Henry Spanka"
+__copyright__ = "Henry Spanka"
+__license__ = "mit"
+
+
+class Network(object):
+    def __init__(self):
+        self.receivers = {}
+        self.queue = []
+        self.blocked = set()
+
+    def client(self, ip):
+        network = self
+
+        class Client(object):
+            def send(self, host, message):
+                network.queue.append((ip, host.ip, message.toBytes()))
+                return True
+
+        return Client()
+
+    def deliver(self):
+        while self.queue:
+            src, dst, data = self.queue.pop(0)
+            if (src, dst) not in self.blocked:
+                self.receivers[dst].handle(src, data)
+
+
+def make_cluster(n=3):
+    network = Network()
+    ips = ["10.0.0.{}".format(i) for i in range(1, n + 1)]
+    managers = []
+
+    for i, ip in enumerate(ips):
+        m = QuorumManager(Host(ip, 10000), [Host(o, 10000) for o in ips if o != ip],
+                          network.client(ip), None)
+        m.membership = SwimMembership(m, rng=random.Random(i))
+        network.receivers[ip] = MessageReceiver(m)
+        managers.append(m)
+
+    return network, managers
+
+
+def run(network, managers, periods):
+    for _ in range(periods):
+        for m in managers:
+            m.sendKeepAlives()
+        network.deliver()
+
+
+def test_probe_marks_hosts_up():
+    network, managers = make_cluster()
+
+    run(network, managers, 3)
+
+    for m in managers:
+        assert m.aliveCount() == 2
+
+
+def test_failed_host_is_declared_dead(mocker):
+    network, managers = make_cluster()
+    run(network, managers, 3)
+
+    down = mocker.spy(managers[0], 'down')
+
+    # 10.0.0.3 crashes
+    network.receivers["10.0.0.3"] = mocker.MagicMock()
+    run(network, managers[:2], 12)
+
+    assert managers[0].getHost("10.0.0.3").status == HostStatus.DOWN
+    assert managers[1].getHost("10.0.0.3").status == HostStatus.DOWN
+    assert managers[0].getHost("10.0.0.2").status == HostStatus.UP
+    assert managers[1].getHost("10.0.0.1").status == HostStatus.UP
+    down.assert_called_once_with(managers[0].getHost("10.0.0.3"))
+
+
+def test_indirect_probe_keeps_host_alive():
+    network, managers = make_cluster()
+    run(network, managers, 3)
+
+    # 10.0.0.1 and 10.0.0.3 can't talk to each other directly
+    network.blocked = {("10.0.0.1", "10.0.0.3"), ("10.0.0.3", "10.0.0.1")}
+    run(network, managers, 12)
+
+    assert managers[0].getHost("10.0.0.3").status == HostStatus.UP
+    assert managers[2].getHost("10.0.0.1").status == HostStatus.UP
+
+
+def test_refute_suspicion():
+    network, managers = make_cluster()
+    swim = managers[0].membership
+
+    swim._merge([["10.0.0.1", MemberState.SUSPECT.value, 0]])
+
+    assert swim.incarnation == 1
+    assert swim.updates["10.0.0.1"][0] == MemberState.ALIVE
+
+
+def test_receiver_dispatches_membership_messages(mocker):
+    m = mocker.MagicMock()
+    host = Host("10.0.0.2", 10000)
+    m.getHost.return_value = host
+
+    message = Message(MessageType.ACK, {'seq': 1, 'inc': 0, 'master': None,
+                                        'quorum': False, 'updates': []})
+    MessageReceiver(m).handle("10.0.0.2", message.toBytes())
+
+    m.membership.handle.assert_called_once()
+    assert m.membership.handle.call_args.args[1].data == message.data